@@ -0,0 +1 @@
+# Lets the tests import the game package from the repository root
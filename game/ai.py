@@ -9,92 +9,428 @@ get the deck value as close as it
 can to 99
 """
 
-from player import Player
-from util import printIfDebug
+from .player import Player
+from .deck import Card, valueMask, playableMask, MAX_TRUE_VALUE
+from .util import printIfDebug
+
+from itertools import combinations_with_replacement
+
+
+# -- Decision table -- #
+# getHeuristicMove only depends on the values of the cards in hand
+# and the total, so its answers are worked out once per profile and
+# shared by every AI playing it (AI.maskDecision) and everything that
+# asks for a move from a list of card values (tableMove). There is one
+# cache, AIProfile.decisions, mapping (mask of values held, important
+# card count, total bucket, max total) to (card value, selected value),
+# or to None if no move is possible
+_TABLE_AIS = {}  # Scratch AI per profile key, for tableMove
+
+
+def totalBucket(current_total, max_total, small_threshold=90):
+    """totalBucket: Totals low enough that every card can be played
+    (and too low for small cards to be played) all lead to the same
+    decisions, they share the lowest bucket
+    @param small_threshold: The profile's small_threshold"""
+    return max(current_total, min(max_total - MAX_TRUE_VALUE, small_threshold))
+
+
+def selectedValue(value, current_total, max_total):
+    """selectedValue: The value a card is played as. A 10 is played as
+    -10 when +10 doesn't fit, every other card as its own value"""
+    if value == 10 and current_total + 10 > max_total:
+        return -10
+    return value
+
+
+def _tableAI(profile):
+    """_tableAI: The scratch AI tableMove asks for a profile's moves"""
+    try:
+        return _TABLE_AIS[profile.key()]
+    except KeyError:
+        scratch = _TABLE_AIS[profile.key()] = AI("table", 0, profile=profile)
+        return scratch
+
+
+def buildDecisionTable(max_total=99, hand_size=3, profile=None):
+    """buildDecisionTable: Fills the profile's decisions for max_total
+    with every possible hand of hand_size cards, so they can be shared
+    (for example with worker processes) without being filled lazily.
+    Returns the decisions
+    @param profile: AIProfile, DEFAULT_PROFILE if None"""
+    scratch = _tableAI(profile or DEFAULT_PROFILE)
+    low = totalBucket(0, max_total, scratch.small_threshold)
+    for values in combinations_with_replacement(range(1, 14), hand_size):
+        mask = valueMask(values)
+        important_count = sum(1 for value in values if scratch.important_mask >> value & 1)
+        for total in range(low, max_total + 1):
+            scratch.maskDecision(mask, important_count, total, max_total)
+    return scratch.profile.decisions
+
+
+def tableMove(values, current_total, max_total, profile=None):
+    """tableMove: The AI's move for a hand of card values, without an AI
+    object. Returns (card value, selected value), or None if no move
+    is possible
+    @param values: Card values in the hand
+    @param current_total: The current game total
+    @param max_total: Total cannot go over this number
+    @param profile: AIProfile, DEFAULT_PROFILE if None"""
+    scratch = _tableAI(profile or DEFAULT_PROFILE)
+    important_mask = scratch.important_mask
+    return scratch.maskDecision(valueMask(values), sum(1 for value in values if important_mask >> value & 1),
+                                current_total, max_total)
+
+
+def verifyDecisionTable(max_total=99, hand_size=3, profile=None):
+    """verifyDecisionTable: Checks the profile's decisions for every
+    possible hand of hand_size cards against getHeuristicMove. Returns
+    the number of mismatches
+    @param profile: AIProfile, DEFAULT_PROFILE if None"""
+    profile = profile or DEFAULT_PROFILE
+    scratch = AI("verify", 0, profile=profile)
+    mismatches = 0
+    for values in combinations_with_replacement(range(1, 14), hand_size):
+        scratch.cards.removeAllCards()
+        for value in values:
+            scratch.cards.addCard(Card(value, "clubs"))
+        for total in range(max_total + 1):
+            if tableMove(values, total, max_total, profile) != scratch._heuristicDecision(total, max_total):
+                mismatches += 1
+    return mismatches
+
+
+# -- Profiles -- #
+# Branches of the AI's strategy, in the default order it tries them:
+# the first branch that finds a move decides it
+BRANCHES = ("useless", "ninety_nine", "small", "plus_10", "king", "ten", "valuable", "any")
+PROFILE_GROUPS = ("useless_cards", "possibly_useful", "small_cards", "last_ditch_effort",
+                  "most_valuable", "plus_10")  # Card value groups of a profile
+
+
+class AIProfile(object):
+    """Constructor: The parameters of the AI's strategy. The defaults are
+    the hand written strategy, tune.py searches for better ones
+    @param name: Name of the profile
+    @param order: Order the branches are tried in, a permutation of BRANCHES
+    @param small_threshold: Small cards are played above this total
+    @param ninety_nine_count: A 9 is played when exactly this many important
+       cards (last ditch effort and most valuable) are held
+    The card value groups (PROFILE_GROUPS) are given as lists of values"""
+    def __init__(self, name="default", useless_cards=(5, 6, 7, 8), possibly_useful=(1, 2, 3, 11, 12),
+                 small_cards=(1, 2, 3), last_ditch_effort=(9, 13, 10), most_valuable=(4,), plus_10=(11, 12),
+                 order=BRANCHES, small_threshold=90, ninety_nine_count=3):
+        self.name = name
+        self.useless_cards = list(useless_cards)  # No strategic value
+        self.possibly_useful = list(possibly_useful)  # Some strategic value later on
+        self.small_cards = list(small_cards)  # To play when total > small_threshold
+        self.last_ditch_effort = list(last_ditch_effort)  # Worth 0 or subtract, to skip turn
+        self.most_valuable = list(most_valuable)  # Preserve till the end
+        self.plus_10 = list(plus_10)  # Adds 10 to the total
+        self.order = tuple(order)
+        self.small_threshold = small_threshold
+        self.ninety_nine_count = ninety_nine_count
+        self.decisions = {}  # Moves worked out by AI.maskDecision, shared by every AI playing this profile
+
+        if sorted(self.order) != sorted(BRANCHES):
+            raise ValueError("order must be a permutation of {}".format(", ".join(BRANCHES)))
+        for group in PROFILE_GROUPS:
+            if any(not 1 <= value <= 13 for value in getattr(self, group)):
+                raise ValueError("{} has card values outside 1-13".format(group))
+
+    def key(self):
+        """key: The parameters as a hashable tuple, equal for profiles that
+        play exactly the same (the name is left out)"""
+        return tuple(tuple(sorted(set(getattr(self, group)))) for group in PROFILE_GROUPS) + \
+            (self.order, self.small_threshold, self.ninety_nine_count)
+
+    def asDict(self):
+        """asDict: The profile as plain data (for json.dump)"""
+        data = {"name": self.name}
+        for group in PROFILE_GROUPS:
+            data[group] = sorted(set(getattr(self, group)))
+        data["order"] = list(self.order)
+        data["small_threshold"] = self.small_threshold
+        data["ninety_nine_count"] = self.ninety_nine_count
+        return data
+
+    @classmethod
+    def fromDict(cls, data):
+        """fromDict: A profile from asDict's data. Missing parameters
+        keep their defaults"""
+        return cls(**data)
+
+    def __eq__(self, other):
+        return isinstance(other, AIProfile) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "AIProfile({})".format(", ".join("{}={!r}".format(k, v) for k, v in self.asDict().items()))
+
+
+DEFAULT_PROFILE = AIProfile()
+
+
+def saveProfiles(path, profiles, fitness=None):
+    """saveProfiles: Writes profiles to a JSON file that loadProfiles
+    (and the arena's --profiles) can read back
+    @param profiles: List of AIProfile objects
+    @param fitness: Optional list of dicts of extra data (e.g. win rate),
+       one per profile, saved next to it"""
+    import json
+    entries = []
+    for i, profile in enumerate(profiles):
+        entry = {"profile": profile.asDict()}
+        if fitness is not None:
+            entry.update(fitness[i])
+        entries.append(entry)
+    with open(path, "w") as f:
+        json.dump({"profiles": entries}, f, indent=2)
+
+
+def loadProfiles(path):
+    """loadProfiles: The AIProfile objects saved in a JSON file by saveProfiles"""
+    import json
+    with open(path) as f:
+        return [AIProfile.fromDict(entry["profile"]) for entry in json.load(f)["profiles"]]
 
 
 class AI(Player):
     """Constructor: Creates an AI
     @param name: Name of the AI, usually AI<Some number>
-    @param tokens: Number of tokens it starts off with"""
-    def __init__(self, name, tokens):
+    @param tokens: Number of tokens it starts off with
+    @param verify: Check every table move against getHeuristicMove
+    @param profile: AIProfile to play with, DEFAULT_PROFILE if None"""
+    def __init__(self, name, tokens, verify=False, profile=None):
         Player.__init__(self, name, tokens)
+        self.verify = verify
+        if profile is None:
+            profile = DEFAULT_PROFILE
+        self.profile = profile
 
         # Game logic
-        self.useless_cards = [5, 6, 7, 8]  # No strategic value
-        self.possibly_useful = [1, 2, 3, 11, 12]  # Some strategic value later on
-        self.small_cards = [1, 2, 3]  # To play when total > 90
-        self.last_ditch_effort = [9, 13, 10]  # Worth 0 or subtract, to skip turn
-        self.most_valuable = [4]  # Preserve till the end
-        self.plus_10 = [11, 12]  # Adds 10 to the total
+        self.useless_cards = profile.useless_cards  # No strategic value
+        self.possibly_useful = profile.possibly_useful  # Some strategic value later on
+        self.small_cards = profile.small_cards  # To play when total > small_threshold
+        self.last_ditch_effort = profile.last_ditch_effort  # Worth 0 or subtract, to skip turn
+        self.most_valuable = profile.most_valuable  # Preserve till the end
+        self.plus_10 = profile.plus_10  # Adds 10 to the total
         self.important = self.last_ditch_effort + self.most_valuable
+        self.small_threshold = profile.small_threshold
+        self.ninety_nine_count = profile.ninety_nine_count
+
+        # The same categories as masks of card values, for maskDecision
+        self.useless_mask = valueMask(self.useless_cards)
+        self.small_mask = valueMask(self.small_cards)
+        self.plus_10_mask = valueMask(self.plus_10)
+        self.most_valuable_mask = valueMask(self.most_valuable)
+        self.important_mask = valueMask(self.important)
+        self._branches = [getattr(self, "_" + branch) for branch in profile.order]
+        self._decisions = profile.decisions
 
     def getMove(self, current_total, max_total):
         """getMove: Returns an index from its own cards to play and the value
-        to play in an array format [index, value]
+        to play in an array format [index, value]. Same move as
+        getHeuristicMove, worked out from the values held in the hand
+        so it takes the same time however many cards are held
+
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        if current_total > max_total:
+            return self.getHeuristicMove(current_total, max_total)
+
+        cards = self.cards
+        important_count = cards.countOf(self.important_mask)
+        try:  # maskDecision's cache, looked up here as it is hit almost every time
+            move = self._decisions[(cards.mask, important_count,
+                                    max(current_total, min(max_total - MAX_TRUE_VALUE, self.small_threshold)),
+                                    max_total)]  # totalBucket, inlined
+        except KeyError:
+            move = self.maskDecision(cards.mask, important_count, current_total, max_total)
+        if move is None:
+            move = [-1, 0]
+        else:
+            move = [cards.indexOf(move[0]), move[1]]
+        if self.verify:
+            expected = self.getHeuristicMove(current_total, max_total)
+            assert move == expected, "Mask decision gave {}, expected {}".format(move, expected)
+        return move
+
+    def maskDecision(self, mask, important_count, current_total, max_total):
+        """maskDecision: getHeuristicMove from the mask of card values
+        held and the number of important cards. Returns (card value,
+        selected value), or None if no move is possible. The branches
+        are tried in the profile's order, and the answer is kept in the
+        profile's decisions: totals too low for any card to be stopped
+        by it (or for small cards to be played) all decide the same,
+        so they share one entry
+
+        @param mask: Mask of the card values in hand (see deck.valueMask)
+        @param important_count: Number of cards in hand that are important
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        key = (mask, important_count, totalBucket(current_total, max_total, self.small_threshold), max_total)
+        try:
+            return self._decisions[key]
+        except KeyError:
+            move = self._decisions[key] = self._branchDecision(mask, important_count, current_total, max_total)
+            return move
+
+    def _branchDecision(self, mask, important_count, current_total, max_total):
+        """_branchDecision: maskDecision worked out by trying the branches"""
+        playable = mask & playableMask(current_total, max_total)
+        for branch in self._branches:
+            move = branch(mask, playable, important_count, current_total, max_total)
+            if move is not None:
+                return move
+        return None
+
+    # -- Branches of maskDecision -- #
+    # Each takes (mask, playable mask, important count, total, max total)
+    # and returns (card value, selected value), or None to pass on
+    def _useless(self, mask, playable, important_count, current_total, max_total):
+        # Eliminate least useful cards first, largest first
+        choice = playable & self.useless_mask
+        if choice:
+            value = choice.bit_length() - 1
+            return (value, selectedValue(value, current_total, max_total))
+        return None
+
+    def _ninety_nine(self, mask, playable, important_count, current_total, max_total):
+        # Play a 9 with the other high value cards
+        if important_count == self.ninety_nine_count and mask & (1 << 9):
+            return (9, 9)
+        return None
+
+    def _small(self, mask, playable, important_count, current_total, max_total):
+        # Small cards when the total is high
+        if current_total > self.small_threshold:
+            choice = playable & self.small_mask
+            if choice:
+                value = choice.bit_length() - 1
+                return (value, selectedValue(value, current_total, max_total))
+        return None
+
+    def _plus_10(self, mask, playable, important_count, current_total, max_total):
+        # Jack or queen
+        choice = playable & self.plus_10_mask
+        if choice:
+            value = choice.bit_length() - 1
+            return (value, selectedValue(value, current_total, max_total))
+        return None
+
+    def _king(self, mask, playable, important_count, current_total, max_total):
+        if playable & (1 << 13):
+            return (13, 13)
+        return None
+
+    def _ten(self, mask, playable, important_count, current_total, max_total):
+        # 10, + or - 10
+        if mask & (1 << 10):
+            return (10, selectedValue(10, current_total, max_total))
+        return None
+
+    def _valuable(self, mask, playable, important_count, current_total, max_total):
+        choice = playable & self.most_valuable_mask
+        if choice:
+            value = choice.bit_length() - 1
+            return (value, selectedValue(value, current_total, max_total))
+        return None
+
+    def _any(self, mask, playable, important_count, current_total, max_total):
+        # Any card that can be played. A 10 always can, as -10 if +10 doesn't fit
+        if playable:
+            value = playable.bit_length() - 1
+            return (value, selectedValue(value, current_total, max_total))
+        return None
+
+    def _heuristicDecision(self, current_total, max_total):
+        """_heuristicDecision: getHeuristicMove as a decision table entry"""
+        index, value = self.getHeuristicMove(current_total, max_total)
+        if index == -1:
+            return None
+        return (self.cards[index].value, value)
+
+    def getHeuristicMove(self, current_total, max_total):
+        """getHeuristicMove: The AI's strategy. Returns an index from its own
+        cards to play and the value to play in an array format [index, value].
+        The branches are tried in the profile's order
 
         @param current_total: The current game total
         @param max_total: Total cannot go over this number"""
 
         current_hand = [str(x) for x in self.cards]
 
-        # Eliminate least useful cards first
-        card_to_play = self.getValidCards(lambda x: x in self.useless_cards,
-                                          current_total, max_total)
-        if len(card_to_play) > 0:  # Return largest card
-            card_to_play = max(card_to_play)
-            printIfDebug("Eliminating useless card: {}. Current hand: {}".format(card_to_play, current_hand))
-            return [self.getIndexFromValue(card_to_play.value), card_to_play.value]
-
-        # Ultimate strategy: Play a 9 if you have at
-        # least 2 other high value cards
-        if len(list(filter(lambda x: x.value in self.important, self.cards))) == 3 and 9 in [x.value for x in
-                                                                                             self.cards]:
-            printIfDebug("Attempting to go for 99 strategy: Current hand {}".format(current_hand))
-            return [self.getIndexFromValue(9), 9]
-
-        # Consider using an Ace, 2 or 3 if score > 90
-        if current_total > 90:
-            card_to_play = self.getValidCards(lambda x: x in self.small_cards, current_total, max_total)
-            if len(card_to_play) > 0:  # Return largest card
-                card_to_play = max(card_to_play)
-                printIfDebug("Playing small card: {}. Current hand: {}".format(card_to_play, current_hand))
-                return [self.getIndexFromValue(card_to_play.value), card_to_play.value]
-
-        # Consider using jack or queen
-        card_to_play = self.getValidCards(lambda x: x in self.plus_10, current_total, max_total)
-        if len(card_to_play) > 0:
-            card_to_play = max(card_to_play)
-            printIfDebug("Playing +10: {}. Current hand: {}".format(card_to_play, current_hand))
-            return [self.getIndexFromValue(card_to_play.value), card_to_play.value]
-
-        # Consider king
-        card_to_play = self.getValidCards(lambda x: x == 13, current_total, max_total)
-        if len(card_to_play) > 0:
-            printIfDebug("Skipping turn: {}. Current hand: {}".format(max(card_to_play), current_hand))
-            return [self.getIndexFromValue(13), 13]
-
-        # Consider using 10 (+ or - 10)
-        if self.getIndexFromValue(10) != -1:
-            print("Playing 10. Current hand: {}".format(current_hand))
-            if current_total + 10 <= max_total:
-                return [self.getIndexFromValue(10), 10]
-            else:
-                return [self.getIndexFromValue(10), -10]
-
-        # Consider valuable cards
-        card_to_play = self.getValidCards(lambda x: x in self.most_valuable, current_total, max_total)
-        if len(card_to_play) > 0:
-            card_to_play = max(card_to_play)
-            printIfDebug("Playing valuable card: {}. Current hand: {}".format(card_to_play, current_hand))
-            return [self.getIndexFromValue(card_to_play.value), card_to_play.value]
-
-        # Check all cards to see if you can play one
-        card_to_play = self.getValidCards(lambda x: True, current_total, max_total)
-        if len(card_to_play) > 0:
-            card_to_play = max(card_to_play)
-            printIfDebug("Playing any card: {}. Current hand: {}".format(card_to_play, current_hand))
-            return [self.getIndexFromValue(card_to_play.value), card_to_play.value]
+        for branch in self.profile.order:
+            if branch == "useless":
+                # Eliminate least useful cards first
+                card_to_play = self.getValidCards(lambda x: x in self.useless_cards,
+                                                  current_total, max_total)
+                if len(card_to_play) > 0:  # Return largest card
+                    card_to_play = max(card_to_play)
+                    printIfDebug("Eliminating useless card: {}. Current hand: {}".format(card_to_play, current_hand))
+                    return [self.getIndexFromValue(card_to_play.value),
+                            selectedValue(card_to_play.value, current_total, max_total)]
+
+            elif branch == "ninety_nine":
+                # Ultimate strategy: Play a 9 if you have enough
+                # other high value cards
+                if len(list(filter(lambda x: x.value in self.important, self.cards))) == self.ninety_nine_count \
+                        and 9 in [x.value for x in self.cards]:
+                    printIfDebug("Attempting to go for 99 strategy: Current hand {}".format(current_hand))
+                    return [self.getIndexFromValue(9), 9]
+
+            elif branch == "small":
+                # Consider using an Ace, 2 or 3 if score > 90
+                if current_total > self.small_threshold:
+                    card_to_play = self.getValidCards(lambda x: x in self.small_cards, current_total, max_total)
+                    if len(card_to_play) > 0:  # Return largest card
+                        card_to_play = max(card_to_play)
+                        printIfDebug("Playing small card: {}. Current hand: {}".format(card_to_play, current_hand))
+                        return [self.getIndexFromValue(card_to_play.value),
+                                selectedValue(card_to_play.value, current_total, max_total)]
+
+            elif branch == "plus_10":
+                # Consider using jack or queen
+                card_to_play = self.getValidCards(lambda x: x in self.plus_10, current_total, max_total)
+                if len(card_to_play) > 0:
+                    card_to_play = max(card_to_play)
+                    printIfDebug("Playing +10: {}. Current hand: {}".format(card_to_play, current_hand))
+                    return [self.getIndexFromValue(card_to_play.value),
+                            selectedValue(card_to_play.value, current_total, max_total)]
+
+            elif branch == "king":
+                # Consider king
+                card_to_play = self.getValidCards(lambda x: x == 13, current_total, max_total)
+                if len(card_to_play) > 0:
+                    printIfDebug("Skipping turn: {}. Current hand: {}".format(max(card_to_play), current_hand))
+                    return [self.getIndexFromValue(13), 13]
+
+            elif branch == "ten":
+                # Consider using 10 (+ or - 10)
+                if self.getIndexFromValue(10) != -1:
+                    printIfDebug("Playing 10. Current hand: {}".format(current_hand))
+                    return [self.getIndexFromValue(10), selectedValue(10, current_total, max_total)]
+
+            elif branch == "valuable":
+                # Consider valuable cards
+                card_to_play = self.getValidCards(lambda x: x in self.most_valuable, current_total, max_total)
+                if len(card_to_play) > 0:
+                    card_to_play = max(card_to_play)
+                    printIfDebug("Playing valuable card: {}. Current hand: {}".format(card_to_play, current_hand))
+                    return [self.getIndexFromValue(card_to_play.value),
+                            selectedValue(card_to_play.value, current_total, max_total)]
+
+            elif branch == "any":
+                # Check all cards to see if you can play one
+                card_to_play = self.getValidCards(lambda x: True, current_total, max_total)
+                if len(card_to_play) > 0:
+                    card_to_play = max(card_to_play)
+                    printIfDebug("Playing any card: {}. Current hand: {}".format(card_to_play, current_hand))
+                    return [self.getIndexFromValue(card_to_play.value),
+                            selectedValue(card_to_play.value, current_total, max_total)]
 
         # Appears no valid moves can be made
         return [-1, 0]
@@ -115,10 +451,7 @@ class AI(Player):
     def getIndexFromValue(self, value):
         """indexFromValue: Given a value of a card, return index in hand
         @param value: value of card to find"""
-        for i in range(len(self.cards)):
-            if self.cards[i].value == value:
-                return i
-        return -1
+        return self.cards.indexOf(value)
 
     def getType(self):
         """Returns type of player"""
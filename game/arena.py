@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+arena.py
+
+Ranks AI strategies against each other. Matches are
+played on worker processes and every result updates
+the entrants' Glicko ratings (Elo with an uncertainty,
+RD, for each rating) as soon as it comes in. New
+matches go to the entrants whose rating is least
+certain, so games are only spent where the ranking
+is still unclear.
+
+A match plays the same deal once per seat rotation:
+every entrant gets every position in the shuffled
+turn order, which cancels out the seat advantage.
+
+Usage: python -m game.arena MATCHES [--players N] [--schedule swiss|roundrobin] [--workers W]
+                                     [--profiles FILE]
+"""
+
+from .simulate import playGame, gameSeed
+from .rng import DealRNG
+from .game import Game
+from .ai import AI, loadProfiles
+from .mcts import MCTSAI
+from .counting import CountingAI
+from .expectimax import ExpectimaxAI
+from .config import ARENA_INITIAL_RATING, ARENA_INITIAL_RD, ARENA_MIN_RD
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import queue
+import random
+
+
+GLICKO_Q = math.log(10) / 400
+
+
+class Entrant(object):
+    """Constructor: A strategy entered in the arena
+    @param name: Unique name of the entrant
+    @param player_class: Player subclass, called as player_class(name=, tokens=, **kwargs)
+    @param kwargs: Extra arguments for player_class (e.g. MCTS budgets)"""
+    def __init__(self, name, player_class=AI, **kwargs):
+        self.name = name
+        self.player_class = player_class
+        self.kwargs = kwargs
+
+    def makePlayer(self, tokens):
+        """makePlayer: Creates a new Player for one game"""
+        return self.player_class(name=self.name, tokens=tokens, **self.kwargs)
+
+
+class Rating(object):
+    """Constructor: Glicko rating of an entrant
+    @param rating: Rating, on the Elo scale
+    @param rd: Rating deviation, how uncertain the rating is"""
+    def __init__(self, rating=ARENA_INITIAL_RATING, rd=ARENA_INITIAL_RD):
+        self.rating = rating
+        self.rd = rd
+        self.games = 0
+        self.score = 0.0  # Pairwise wins, draws count half
+
+    def g(self):
+        """g: Glicko weight of a game against this rating"""
+        return 1 / math.sqrt(1 + 3 * (GLICKO_Q * self.rd) ** 2 / math.pi ** 2)
+
+    def expected(self, other):
+        """expected: Expected score against other"""
+        return 1 / (1 + 10 ** (-other.g() * (self.rating - other.rating) / 400))
+
+
+def updateRatings(ratings, outcomes):
+    """updateRatings: Glicko update of every entrant in a match. Everyone
+    is updated from the ratings before the match
+    @param ratings: Dict of name -> Rating
+    @param outcomes: List of (name, opponent name, score) with score 1, 0.5 or 0"""
+    by_name = {}
+    for name, opponent, score in outcomes:
+        by_name.setdefault(name, []).append((opponent, score))
+
+    updates = {}
+    for name, games in by_name.items():
+        rating = ratings[name]
+        variance_inv = 0.0
+        delta = 0.0
+        for opponent, score in games:
+            other = ratings[opponent]
+            g = other.g()
+            e = rating.expected(other)
+            variance_inv += GLICKO_Q ** 2 * g * g * e * (1 - e)
+            delta += g * (score - e)
+        precision = 1 / rating.rd ** 2 + variance_inv
+        updates[name] = (rating.rating + GLICKO_Q / precision * delta,
+                         max(math.sqrt(1 / precision), ARENA_MIN_RD),
+                         sum(score for _, score in games), len(games))
+
+    for name, (new_rating, new_rd, score, games) in updates.items():
+        rating = ratings[name]
+        rating.rating, rating.rd = new_rating, new_rd
+        rating.score += score
+        rating.games += games
+
+
+def finishOrder(game_result, names):
+    """finishOrder: Groups of names from first to last place. The winner
+    is first, the other players are ranked by how long they lasted.
+    In a stopped game everyone still in shares first place
+    @param game_result: GameResult of the game
+    @param names: Names of the players, by seat"""
+    eliminated = [names[seat] for seat in reversed(game_result.eliminations)]
+    alive = [name for name in names if name not in eliminated]
+    return [alive] + [[name] for name in eliminated]
+
+
+def pairwiseOutcomes(order):
+    """pairwiseOutcomes: Turns a finish order into (name, opponent, score)
+    results, one for each pair of players in each direction"""
+    outcomes = []
+    for i, group in enumerate(order):
+        for name in group:
+            for j, other_group in enumerate(order):
+                for opponent in other_group:
+                    if opponent != name:
+                        score = 0.5 if i == j else (1.0 if i < j else 0.0)
+                        outcomes.append((name, opponent, score))
+    return outcomes
+
+
+def playMatch(match):
+    """playMatch: Plays one match, the same deal once per seat rotation.
+    Returns the match's finish orders. Runs inside a worker process
+    @param match: Tuple (seed, index, entrants)"""
+    seed, index, entrants = match
+    orders = []
+    for rotation in range(len(entrants)):
+        # Same seed, so the deck and the turn order shuffle are the same,
+        # only who sits where changes
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(gameSeed(seed, index)))
+        seated = entrants[rotation:] + entrants[:rotation]
+        game.startGame(players=[entrant.makePlayer(game.INITAL_TOKEN) for entrant in seated])
+        names = [player.name for player in game.PLAYERS]
+        orders.append(finishOrder(playGame(game), names))
+    return orders
+
+
+class Arena(object):
+    """Constructor: Creates an arena
+    @param entrants: List of Entrant objects, with unique names
+    @param n_players: Entrants per match
+    @param seed: Seed of the deals. None picks a random seed
+    @param schedule: "swiss" to pair the least certain entrant with
+       the closest ratings, "roundrobin" to cycle through every table
+    @param workers: Worker processes. Defaults to one per CPU core"""
+    def __init__(self, entrants, n_players=2, seed=None, schedule="swiss", workers=None):
+        if len(set(entrant.name for entrant in entrants)) != len(entrants):
+            raise ValueError("Entrant names must be unique")
+        if n_players > len(entrants):
+            raise ValueError("Not enough entrants for {} players".format(n_players))
+        if schedule not in ["swiss", "roundrobin"]:
+            raise ValueError("Unknown schedule {}".format(schedule))
+
+        self.entrants = {entrant.name: entrant for entrant in entrants}
+        self.n_players = n_players
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.schedule = schedule
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+
+        self.ratings = {entrant.name: Rating() for entrant in entrants}
+        self.in_flight = {entrant.name: 0 for entrant in entrants}  # Matches being played
+        self.matches = 0  # Matches scheduled so far, also the next match's deal number
+        self.played = 0  # Matches with results in the ratings
+        self.tables = itertools.cycle(itertools.combinations(sorted(self.entrants), n_players))
+
+    def nextMatch(self):
+        """nextMatch: Picks the names playing the next match"""
+        if self.schedule == "roundrobin":
+            return list(next(self.tables))
+
+        # Entrants already playing count as a bit more certain, so the
+        # matches in flight at once are spread out
+        def uncertainty(name):
+            return self.ratings[name].rd / (1 + self.in_flight[name])
+
+        focus = max(sorted(self.ratings), key=uncertainty)
+        rating = self.ratings[focus].rating
+        others = sorted((name for name in self.ratings if name != focus),
+                        key=lambda name: abs(self.ratings[name].rating - rating) - uncertainty(name))
+        return [focus] + others[:self.n_players - 1]
+
+    def scheduleMatch(self):
+        """scheduleMatch: Builds the next match to play"""
+        names = self.nextMatch()
+        for name in names:
+            self.in_flight[name] += 1
+        match = (self.seed, self.matches, [self.entrants[name] for name in names])
+        self.matches += 1
+        return names, match
+
+    def addResult(self, names, orders):
+        """addResult: Updates the ratings with a played match"""
+        for name in names:
+            self.in_flight[name] -= 1
+        self.played += 1
+        for order in orders:
+            updateRatings(self.ratings, pairwiseOutcomes(order))
+
+    def isSettled(self, target_rd):
+        """isSettled: Is every rating at least as certain as target_rd?"""
+        return target_rd is not None and all(rating.rd <= target_rd for rating in self.ratings.values())
+
+    def run(self, max_matches, target_rd=None):
+        """run: Plays matches until max_matches have been played or every
+        rating's RD is at most target_rd. Returns the standings
+        @param max_matches: Most matches to play
+        @param target_rd: Stop once every RD is this low, None to play them all"""
+        if self.workers <= 1:
+            for _ in range(max_matches):
+                if self.isSettled(target_rd):
+                    break
+                names, match = self.scheduleMatch()
+                self.addResult(names, playMatch(match))
+            return self.standings()
+
+        done = queue.Queue()
+        pending = 0
+        played = 0
+        with multiprocessing.Pool(self.workers) as pool:
+            while played < max_matches:
+                # Keep every worker busy, plus one match queued each
+                while pending < self.workers * 2 and played + pending < max_matches \
+                        and not self.isSettled(target_rd):
+                    names, match = self.scheduleMatch()
+                    pool.apply_async(playMatch, (match,),
+                                     callback=lambda orders, names=names: done.put((names, orders)),
+                                     error_callback=lambda error: done.put((None, error)))
+                    pending += 1
+                if pending == 0:
+                    break
+                names, orders = done.get()
+                if names is None:
+                    raise orders
+                pending -= 1
+                played += 1
+                self.addResult(names, orders)
+        return self.standings()
+
+    def standings(self):
+        """standings: List of (name, Rating) from best to worst"""
+        return sorted(self.ratings.items(), key=lambda item: -item[1].rating)
+
+    def __str__(self):
+        rows = "\n".join(
+            "      {:>2}. {:<16} {:7.1f} ± {:5.1f}   games: {:<6} score: {:.3f}".format(
+                place + 1, name, rating.rating, 2 * rating.rd, rating.games,
+                rating.score / rating.games if rating.games else 0.0)
+            for place, (name, rating) in enumerate(self.standings()))
+        return """
+            -- Arena Standings --
+        Matches played:     {}
+        Players per match:  {}
+{}
+        """.format(self.played, self.n_players, rows)
+
+
+def defaultEntrants():
+    """defaultEntrants: The normal AI, the card counting AI, the expectimax
+    AI and search AIs with a few budgets"""
+    return [
+        Entrant("AI"),
+        Entrant("Counting", CountingAI),
+        Entrant("Expectimax", ExpectimaxAI),
+        Entrant("MCTS-50", MCTSAI, max_iterations=50),
+        Entrant("MCTS-200", MCTSAI, max_iterations=200),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate AI strategies against each other")
+    parser.add_argument("matches", type=int, help="Most matches to play")
+    parser.add_argument("--players", type=int, default=2, help="Entrants per match")
+    parser.add_argument("--schedule", choices=["swiss", "roundrobin"], default="swiss")
+    parser.add_argument("--target-rd", type=float, default=None, help="Stop once every RD is this low")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the deals")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--profiles", default=None, help="Also enter the AI profiles saved in this file (tune.py)")
+    args = parser.parse_args()
+
+    entrants = defaultEntrants()
+    if args.profiles is not None:
+        entrants.extend(Entrant(profile.name, AI, profile=profile) for profile in loadProfiles(args.profiles))
+    arena = Arena(entrants, args.players, args.seed, args.schedule, args.workers)
+    arena.run(args.matches, args.target_rd)
+    print(arena)
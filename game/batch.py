@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+batch.py
+
+Vectorized lockstep engine. Plays a whole batch of
+independent all-AI games at once, with every part of the
+game state (totals, hands, turn order, tokens, decks)
+held in NumPy arrays. Each step advances every game by one
+turn, applying the rules of Game.playTurn and the heuristics
+of AI.getMove as masked array operations (the AI's moves are
+worked out once for every hand and total, then looked up).
+Finished games are replaced by new ones so the batch stays full.
+
+Every seat plays an ai.AIProfile, so tune.py can play its
+candidates here. Deals are keyed by (seed, game number, round,
+shuffle) with SplitMix64 (see rng.py), so a game is dealt the
+same cards whatever the batch size and whoever plays it.
+
+Needs numpy, which the rest of the game does not.
+"""
+
+from .game import Game
+from .tournament import TournamentReport
+from .simulate import GameResult
+from .config import DEFAULT_NUM_PLAYERS, NUM_DECKS, SIM_MAX_TURNS
+from .ai import DEFAULT_PROFILE
+from .rng import gameKey, GAMMA
+from . import deck
+
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("game.batch needs numpy. Install it with: pip install numpy")
+
+
+BATCH_SIZE = 4096  # Games advanced together
+
+# Tables indexed by card value
+TRUE_VALUES = np.array(deck.TRUE_VALUES, dtype=np.int64)
+ADD_VALUES = np.array([0] + [10 if v in [11, 12] else deck.TRUE_VALUES[v]
+                             for v in range(1, deck.NUM_VALUES + 1)], dtype=np.int64)
+# Every card in the shoe, by value
+SHOE = np.array(deck.CARD_VALUES * NUM_DECKS, dtype=np.int8)
+
+_GAMMA = np.uint64(GAMMA)
+
+
+def _mix64(x):
+    """_mix64: rng.mix64 on an array of uint64 (products wrap round)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _valueMask(values):
+    """_valueMask: Boolean table, True for the card values given"""
+    mask = np.zeros(deck.NUM_VALUES + 1, dtype=bool)
+    mask[values] = True
+    return mask
+
+
+class BatchResults(object):
+    """Constructor: Results of n_games games played by a BatchEngine,
+    stored as arrays indexed by game number
+    @param n_games: Number of games
+    @param n_players: Number of players per game"""
+    def __init__(self, n_games, n_players):
+        self.n_players = n_players
+        self.winner_seat = np.full(n_games, -1, dtype=np.int16)  # -1 if the game was stopped
+        self.turns = np.zeros(n_games, dtype=np.int32)
+        self.redistributions = np.zeros(n_games, dtype=np.int32)
+        self.eliminations = np.full((n_games, n_players), -1, dtype=np.int16)  # Seats, in order
+
+    def __len__(self):
+        return len(self.turns)
+
+    def toGameResults(self):
+        """toGameResults: The results as a list of GameResult objects"""
+        results = []
+        for i in range(len(self)):
+            seat = int(self.winner_seat[i])
+            results.append(GameResult(
+                "AI{}".format(seat + 1) if seat >= 0 else None, seat if seat >= 0 else None,
+                int(self.turns[i]), [int(s) for s in self.eliminations[i] if s >= 0],
+                int(self.redistributions[i])))
+        return results
+
+    def toReport(self):
+        """toReport: Summarizes the results in a TournamentReport"""
+        report = TournamentReport(self.n_players)
+        if len(self) == 0:
+            return report
+        finished = self.winner_seat >= 0
+        report.games = len(self)
+        report.unfinished = int(len(self) - finished.sum())
+        report.wins = [int(x) for x in np.bincount(self.winner_seat[finished], minlength=self.n_players)]
+        eliminated = self.eliminations[self.eliminations >= 0]
+        report.eliminations = [int(x) for x in np.bincount(eliminated, minlength=self.n_players)]
+        turns = self.turns.astype(np.int64)
+        report.turns_total = int(turns.sum())
+        report.turns_squared = int((turns * turns).sum())
+        report.turns_min = int(turns.min())
+        report.turns_max = int(turns.max())
+        report.redistributions = int(self.redistributions.sum())
+        return report
+
+
+class BatchEngine(object):
+    """Constructor: Creates an engine playing batch_size games at a time
+    @param n_players: Number of players per game, all of them AIs
+    @param batch_size: Number of games advanced together
+    @param seed: Seed of the run. Game g is dealt from rng.gameKey(seed, g),
+       so results don't depend on the batch size. None picks a random seed
+    @param max_turns: Games are stopped with no winner after this many turns
+    @param profiles: The ai.AIProfile of each seat, a single profile for
+       every seat, or None for DEFAULT_PROFILE
+    @param rotate: Move the profiles round the seats, one seat per game:
+       in game g, seat s plays profiles[(s - g) % n_players]"""
+    def __init__(self, n_players=DEFAULT_NUM_PLAYERS, batch_size=BATCH_SIZE, seed=None,
+                 max_turns=SIM_MAX_TURNS, profiles=None, rotate=False):
+        rules = Game(verbose=False)
+
+        self.n_players = n_players
+        self.batch_size = batch_size
+        self.max_turns = max_turns
+        self.seed = seed if seed is not None else random.getrandbits(64)
+
+        self.MAX = rules.MAX
+        self.INITAL_TOKEN = rules.INITAL_TOKEN
+        self.HAND_SIZE = rules.HAND_SIZE
+        self.SHOE_SIZE = len(SHOE)
+
+        # Each distinct profile's moves are compiled once, seats index them
+        if profiles is None:
+            profiles = DEFAULT_PROFILE
+        if not isinstance(profiles, (list, tuple)):
+            profiles = [profiles] * n_players
+        if len(profiles) != n_players:
+            raise ValueError("Expected {} profiles, one per seat, got {}".format(n_players, len(profiles)))
+        self.profiles = list(dict.fromkeys(profiles))
+        self.seat_profiles = np.array([self.profiles.index(profile) for profile in profiles], dtype=np.int64)
+        self.rotate = rotate
+        self._compileMoves()
+
+        # -- Game state, one row per game -- #
+        B, P, H, C = batch_size, n_players, self.HAND_SIZE, self.SHOE_SIZE
+        self.hands = np.zeros((B, P, H), dtype=np.int8)  # Card values in each hand
+        self.deck = np.zeros((B, C), dtype=np.int8)  # Cards deck_pos..deck_len-1 are the deck
+        self.deck_pos = np.zeros(B, dtype=np.int64)
+        self.deck_len = np.zeros(B, dtype=np.int64)
+        self.pile = np.zeros((B, C), dtype=np.int8)  # Cards 0..pile_len-1 are the pile
+        self.pile_len = np.zeros(B, dtype=np.int64)
+        self.alive = np.zeros((B, P), dtype=bool)
+        self.tokens = np.zeros((B, P), dtype=np.int64)
+        self.turn = np.zeros(B, dtype=np.int64)  # Position of the current player (GameState.turn)
+        self.turn_inc = np.ones(B, dtype=np.int64)  # Direction of play (SeatRing.direction)
+        self.total = np.zeros(B, dtype=np.int64)  # Game.TOTAL
+
+        # -- Stats -- #
+        self.turns = np.zeros(B, dtype=np.int64)
+        self.redistributions = np.zeros(B, dtype=np.int64)
+        self.eliminated = np.zeros(B, dtype=np.int64)
+        self.eliminations = np.full((B, P), -1, dtype=np.int16)
+
+        self.game_index = np.full(B, -1, dtype=np.int64)  # Game number played by each row
+        self.game_key = np.zeros(B, dtype=np.uint64)  # rng.gameKey of each row's game
+        self.shuffles = np.zeros(B, dtype=np.uint64)  # Shuffles so far in the current round
+        self.profile = np.zeros((B, P), dtype=np.int64)  # Index in profiles of each seat's profile
+        self.active = np.zeros(B, dtype=bool)
+
+    def run(self, n_games, start=0):
+        """run: Plays games start..start+n_games-1 and returns their
+        BatchResults, indexed from 0
+        @param n_games: Number of games to play
+        @param start: Number of the first game"""
+        results = BatchResults(n_games, self.n_players)
+        self.active[:] = False
+        next_game = min(n_games, self.batch_size)
+        self._newGames(np.arange(next_game), start + np.arange(next_game))
+
+        while self.active.any():
+            rows = np.flatnonzero(self.active)
+            self.step(rows)
+
+            n_alive = self.n_players - self.eliminated[rows]
+            done = rows[(n_alive == 1) | (self.turns[rows] >= self.max_turns)]
+            if len(done) == 0:
+                continue
+
+            games = self.game_index[done] - start
+            won = self.alive[done].sum(axis=1) == 1
+            results.winner_seat[games] = np.where(won, self.alive[done].argmax(axis=1), -1)
+            results.turns[games] = self.turns[done]
+            results.redistributions[games] = self.redistributions[done]
+            results.eliminations[games] = self.eliminations[done]
+
+            # Refill the finished rows with new games
+            refill = min(len(done), n_games - next_game)
+            self.active[done[refill:]] = False
+            if refill > 0:
+                self._newGames(done[:refill], start + np.arange(next_game, next_game + refill))
+                next_game += refill
+        return results
+
+    def step(self, rows):
+        """step: Advances the games in rows by one turn: the current
+        player of each game makes the AI's move, or if it can't,
+        loses a token and the cards are redistributed
+        @param rows: Indices of the games to advance"""
+        alive = self.alive[rows]
+        n_alive = self.n_players - self.eliminated[rows]
+        # The current player is the (turn % players left)'th player still in
+        position = self.turn[rows] % n_alive
+        seat = (alive.cumsum(axis=1) > position[:, None]).argmax(axis=1)
+
+        hands = self.hands[rows, seat].astype(np.int64)
+        move = self.moves[self.profile[rows, seat], hands @ self.hand_radix, self.total[rows]]
+        slot, selected = move // 32, move % 32 - 10
+        ok = slot < self.HAND_SIZE
+        value = np.take_along_axis(hands, np.minimum(slot, self.HAND_SIZE - 1)[:, None], axis=1)[:, 0]
+        self._play(rows[ok], seat[ok], slot[ok], value[ok], selected[ok], n_alive[ok])
+        self._handleNoMoves(rows[~ok], seat[~ok])
+
+    def _compileMoves(self):
+        """_compileMoves: Runs getMoves once for every profile, possible
+        hand and total (totals never go below 0 in AI only games) and keeps
+        the results in a table, indexed by [profile, hand code, total]. A
+        move is stored as slot * 32 + selected value + 10, with slot =
+        HAND_SIZE if no move is possible"""
+        radix = deck.NUM_VALUES + 1
+        self.hand_radix = radix ** np.arange(self.HAND_SIZE - 1, -1, -1)
+        codes = np.arange(radix ** self.HAND_SIZE)
+        hands = (codes[:, None] // self.hand_radix) % radix
+        totals = np.arange(self.MAX + 1)
+
+        all_hands = np.repeat(hands, len(totals), axis=0)
+        all_totals = np.tile(totals, len(hands))
+        self.moves = np.zeros((len(self.profiles), len(hands), len(totals)), dtype=np.int16)
+        for i, profile in enumerate(self.profiles):
+            slot, value, selected, ok = self.getMoves(np.maximum(all_hands, 1), all_totals, profile)
+            slot = np.where(ok, slot, self.HAND_SIZE)
+            self.moves[i] = (slot * 32 + selected + 10).reshape(len(hands), len(totals))
+
+    def getMoves(self, hands, totals, profile=DEFAULT_PROFILE):
+        """getMoves: AI.getMove for many hands at once. Returns arrays
+        (slot, value, selected_value, ok), ok is False where no move is possible
+        @param hands: Card values, one hand per row
+        @param totals: Game total for each hand
+        @param profile: AIProfile of the AI"""
+        n = len(totals)
+        hands = hands.astype(np.int64)
+        playable = TRUE_VALUES[hands] + totals[:, None] <= self.MAX
+        value = np.zeros(n, dtype=np.int64)
+        decided = np.zeros(n, dtype=bool)
+
+        def consider(mask):
+            """Picks the largest card allowed by mask for undecided hands"""
+            best = np.where(mask, hands, 0).max(axis=1)
+            use = ~decided & (best > 0)
+            value[use] = best[use]
+            decided[use] = True
+
+        # The branches of AI.getMove, in the profile's order
+        for branch in profile.order:
+            if branch == "useless":
+                consider(_valueMask(profile.useless_cards)[hands] & playable)
+            elif branch == "ninety_nine":
+                important = _valueMask(profile.last_ditch_effort + profile.most_valuable)
+                go_for_99 = (important[hands].sum(axis=1) == profile.ninety_nine_count) & (hands == 9).any(axis=1)
+                consider(go_for_99[:, None] & (hands == 9))
+            elif branch == "small":
+                consider((totals > profile.small_threshold)[:, None] & _valueMask(profile.small_cards)[hands] &
+                         playable)
+            elif branch == "plus_10":
+                consider(_valueMask(profile.plus_10)[hands] & playable)
+            elif branch == "king":
+                consider((hands == 13) & playable)
+            elif branch == "ten":
+                consider(hands == 10)
+            elif branch == "valuable":
+                consider(_valueMask(profile.most_valuable)[hands] & playable)
+            else:
+                consider(playable)
+
+        slot = (hands == value[:, None]).argmax(axis=1)
+        selected = np.where((value == 10) & (totals + 10 > self.MAX), -10, value)
+        return slot, value, selected, decided
+
+    def _play(self, rows, seat, slot, value, selected, n_alive):
+        """_play: Game.playTurn for moves that are known to be valid"""
+        more_than_2 = n_alive > 2
+
+        turn_inc = np.where((value == 4) & more_than_2, -self.turn_inc[rows], self.turn_inc[rows])
+        turn = self.turn[rows] + np.where((value == 3) & more_than_2, turn_inc, 0)  # Skip
+        to_add = np.where((value == 1) | (value == 10), selected, ADD_VALUES[value])
+        self.total[rows] = np.where(value == 9, self.MAX, self.total[rows]) + to_add
+        self.turn[rows] = turn + turn_inc
+        self.turn_inc[rows] = turn_inc
+
+        # Card goes to the pile, the player draws a new one
+        self.pile[rows, self.pile_len[rows]] = value
+        self.pile_len[rows] += 1
+        drawn = self.deck[rows, self.deck_pos[rows]]
+        self.deck_pos[rows] += 1
+
+        hands = self.hands[rows, seat]
+        keep = np.arange(self.HAND_SIZE - 1)
+        keep = keep + (keep >= slot[:, None])
+        hands[:, :-1] = np.take_along_axis(hands, keep, axis=1)
+        hands[:, -1] = drawn
+        self.hands[rows, seat] = hands
+        self.turns[rows] += 1
+
+        # Game.checkDeckSize
+        empty = rows[self.deck_pos[rows] == self.deck_len[rows]]
+        if len(empty):
+            self._reshufflePile(empty)
+
+    def _handleNoMoves(self, rows, seat):
+        """_handleNoMoves: Game.handleNoMoves"""
+        if len(rows) == 0:
+            return
+        self.tokens[rows, seat] -= 1
+        dead = self.tokens[rows, seat] == 0
+        if dead.any():
+            killed, killed_seat = rows[dead], seat[dead]
+            # The turn passes to the next seat, now at the same position
+            self.turn[killed] = self.turn[killed] % (self.n_players - self.eliminated[killed]) - 1
+            self.alive[killed, killed_seat] = False
+            self.eliminations[killed, self.eliminated[killed]] = killed_seat
+            self.eliminated[killed] += 1
+        self.redistributions[rows] += 1  # The new round's number, for its deal
+        self._deal(rows)
+        self.turn[rows] += 1
+
+    def _newGames(self, rows, games):
+        """_newGames: Starts new games in rows
+        @param rows: Rows to reuse
+        @param games: Game number of each new game"""
+        self.game_index[rows] = games
+        self.game_key[rows] = [gameKey(self.seed, int(game)) for game in games]
+        if self.rotate:
+            seats = np.arange(self.n_players)
+            self.profile[rows] = self.seat_profiles[(seats[None, :] - games[:, None]) % self.n_players]
+        else:
+            self.profile[rows] = self.seat_profiles
+        self.active[rows] = True
+        self.alive[rows] = True
+        self.tokens[rows] = self.INITAL_TOKEN
+        self.turn[rows] = 0
+        self.turn_inc[rows] = 1
+        self.total[rows] = 0
+        self.turns[rows] = 0
+        self.redistributions[rows] = 0
+        self.eliminated[rows] = 0
+        self.eliminations[rows] = -1
+        self._deal(rows)
+
+    def _shuffleKeys(self, rows):
+        """_shuffleKeys: One random sort key per card slot for the next
+        shuffle of each row, from its game key, round and shuffle number
+        (rng.roundKey, worked out on arrays)"""
+        rounds = self.redistributions[rows].astype(np.uint64)
+        round_keys = _mix64(self.game_key[rows] ^ _mix64((rounds + np.uint64(1)) * _GAMMA))
+        counters = self.shuffles[rows, None] * np.uint64(self.SHOE_SIZE) + \
+            np.arange(1, self.SHOE_SIZE + 1, dtype=np.uint64)
+        self.shuffles[rows] += np.uint64(1)
+        return _mix64(round_keys[:, None] + counters * _GAMMA)
+
+    def _deal(self, rows):
+        """_deal: Shuffles every card into the deck and deals
+        HAND_SIZE cards to each player still in (Game.redistributeCards)"""
+        n, H = len(rows), self.HAND_SIZE
+        self.shuffles[rows] = 0
+        order = self._shuffleKeys(rows).argsort(axis=1)
+        shoe = SHOE[order]
+        self.deck[rows] = shoe
+
+        alive = self.alive[rows]
+        rank = alive.cumsum(axis=1) - 1  # Position of each player in the dealing order
+        positions = (rank[:, :, None] * H + np.arange(H)).clip(0).reshape(n, -1)
+        hands = np.take_along_axis(shoe, positions, axis=1).reshape(n, self.n_players, H)
+        self.hands[rows] = np.where(alive[:, :, None], hands, 0)
+
+        self.deck_pos[rows] = alive.sum(axis=1) * H
+        self.deck_len[rows] = self.SHOE_SIZE
+        self.pile_len[rows] = 0
+
+    def _reshufflePile(self, rows):
+        """_reshufflePile: Puts the pile back into the empty deck and shuffles it"""
+        keys = self._shuffleKeys(rows)
+        pile_len = self.pile_len[rows]
+        keys[np.arange(self.SHOE_SIZE) >= pile_len[:, None]] = np.iinfo(np.uint64).max  # Empty slots sort last
+        self.deck[rows] = np.take_along_axis(self.pile[rows], keys.argsort(axis=1), axis=1)
+        self.deck_pos[rows] = 0
+        self.deck_len[rows] = pile_len
+        self.pile_len[rows] = 0
+
+
+def simulateBatch(n_games, n_players=DEFAULT_NUM_PLAYERS, seed=None, batch_size=BATCH_SIZE, profiles=None,
+                  rotate=False, start=0):
+    """simulateBatch: Plays n_games all-AI games with the vectorized
+    engine and returns their BatchResults
+    @param n_games: Number of games to play
+    @param start: Number of the first game, so a run can be split up
+    @param n_players: Number of players per game
+    @param seed: Seed of the run
+    @param batch_size: Number of games advanced together
+    @param profiles: AIProfile of each seat, see BatchEngine
+    @param rotate: Move the profiles round the seats, see BatchEngine"""
+    return BatchEngine(n_players, min(batch_size, max(n_games, 1)), seed, profiles=profiles,
+                       rotate=rotate).run(n_games, start)
@@ -0,0 +1,474 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+bench.py
+
+Benchmarks of the engine's hot paths: playing a turn,
+the AI's move, the deck, dealing and whole headless
+games, at several player counts and deck sizes.
+
+Results are written as JSON, with the environment
+they were measured in, so they can be kept as a
+baseline. compare checks new results against a
+baseline and flags every benchmark that got slower
+by more than BENCH_THRESHOLD.
+
+It also times importing the engine in a fresh
+interpreter: imports checks that it stays within
+IMPORT_TIME_BUDGET and that the console modules
+are not loaded with it.
+
+gc counts the garbage collections a long headless
+simulation triggers, per 1000 games, to keep an eye
+on how much the engine allocates.
+
+Usage: python -m game.bench run [--output FILE] [--quick] [--filter TEXT]
+       python -m game.bench compare BASELINE [RESULTS] [--threshold T]
+       python -m game.bench imports [--budget SECONDS]
+       python -m game.bench gc [--games N] [--players N]
+"""
+
+from .game import Game
+from .ai import AI
+from .deck import Card, Deck, NUM_VALUES
+from .simulate import playGame, simulate
+from .config import BENCH_REPEATS, BENCH_MIN_TIME, BENCH_THRESHOLD, IMPORT_TIME_BUDGET, DECK_SIZE, SUITS
+
+import argparse
+import datetime
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+PLAYER_COUNTS = [2, 4, 8]
+DECK_COUNTS = [1, 2, 4]
+HAND_SIZES = [3, 10, 30]  # AI.getMove hands, the bigger ones only happen with several decks
+SEED = 99  # Every benchmark plays the same deals each run
+IMPORT_MODULES = ["game.game", "game.simulate", "game.tournament"]  # Timed by the import benchmarks
+LAZY_MODULES = ["game.human", "game.command", "game.renderer"]  # Console only, the engine must not load them
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Directory holding the game package
+
+
+# -- Setup -- #
+def makeGame(n_players, n_decks, seed=SEED):
+    """makeGame: A started headless game of AIs
+    @param n_players: Number of players
+    @param n_decks: Decks shuffled together into the shoe"""
+    game = Game(verbose=False, rng=random.Random(seed))
+    game.NUM_DECKS = n_decks
+    game.startGame(players=[AI("AI{}".format(i + 1), game.INITAL_TOKEN) for i in range(n_players)])
+    return game
+
+
+def makeDeck(n_decks):
+    """makeDeck: A full shoe of n_decks decks"""
+    deck = Deck(DECK_SIZE * n_decks)
+    for _ in range(n_decks):
+        for value in range(1, NUM_VALUES + 1):
+            for suit in SUITS:
+                deck.addCard(Card(value, suit))
+    return deck
+
+
+# -- Benchmarks -- #
+# Each benchmark function takes its parameters and returns a function
+# run(loops) that does the work loops times and returns (seconds, ops):
+# the time spent in the code being measured (setup is left out) and the
+# number of operations it did
+def benchShuffle(decks):
+    """Deck.shuffle of a full shoe"""
+    deck = makeDeck(decks)
+    rng = random.Random(SEED)
+
+    def run(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            deck.shuffle(rng)
+        return time.perf_counter() - start, loops
+    return run
+
+
+def benchRemoveTopCard(decks):
+    """Deck.removeTopCard, drawing every card of a full shoe"""
+    cards = list(makeDeck(decks))
+    deck = Deck(len(cards))
+
+    def run(loops):
+        seconds = 0.0
+        for _ in range(loops):
+            for card in cards:
+                deck.addCard(card)
+            remove = deck.removeTopCard
+            start = time.perf_counter()
+            for _ in range(len(cards)):
+                remove()
+            seconds += time.perf_counter() - start
+        return seconds, loops * len(cards)
+    return run
+
+
+def benchGenerateDeck(decks):
+    """Game.generateDeck"""
+    game = Game(verbose=False)
+    game.NUM_DECKS = decks
+
+    def run(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            game.generateDeck()
+        return time.perf_counter() - start, loops
+    return run
+
+
+def benchRedistributeCards(players, decks):
+    """Game.redistributeCards at the start of a game"""
+    game = makeGame(players, decks)
+
+    def run(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            game.redistributeCards()
+        return time.perf_counter() - start, loops
+    return run
+
+
+def benchPlayTurn(players, decks):
+    """Game.playTurn (including failed moves and handleNoMoves) over
+    whole games. Only the engine is timed, not the AI's moves. Every
+    run plays the same games"""
+    def run(loops):
+        seconds = 0.0
+        seed = SEED
+        game = makeGame(players, decks, seed)
+        for _ in range(loops):
+            if game.isGameOver():
+                seed += 1
+                game = makeGame(players, decks, seed)
+            move = game.getCurrentPlayer().getMove(game.TOTAL, game.MAX)
+            start = time.perf_counter()
+            if not game.playTurn(move[0], move[1]):
+                game.handleNoMoves()
+            seconds += time.perf_counter() - start
+        return seconds, loops
+    return run
+
+
+def benchGetMove(hand_size):
+    """AI.getMove over random hands at every total from 0 to 99"""
+    rng = random.Random(SEED)
+    shoe = list(makeDeck(max(1, hand_size * 4 // DECK_SIZE + 1)))
+    cases = []
+    for i in range(500):
+        ai = AI("AI", 3)
+        for card in rng.sample(shoe, hand_size):
+            ai.cards.addCard(card)
+        cases.append((ai, i % 100))
+
+    def run(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for ai, total in cases:
+                ai.getMove(total, 99)
+        return time.perf_counter() - start, loops * len(cases)
+    return run
+
+
+def benchGame(players, decks):
+    """A whole headless game of AIs, from dealing to the winner. Every
+    run plays the same games"""
+    def run(loops):
+        seconds = 0.0
+        for seed in range(SEED, SEED + loops):
+            start = time.perf_counter()
+            playGame(makeGame(players, decks, seed))
+            seconds += time.perf_counter() - start
+        return seconds, loops
+    return run
+
+
+def importProbe(module):
+    """importProbe: Imports module in a fresh interpreter started in
+    another working directory. Returns (seconds the import took, names
+    of the game modules it loaded)"""
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import {}\n"
+            "print(time.perf_counter() - start)\n"
+            "print(' '.join(name for name in sys.modules if name.split('.')[0] == 'game'))").format(module)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(path for path in (PACKAGE_ROOT, env.get("PYTHONPATH")) if path)
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=tempfile.gettempdir(), env=env,
+                                     universal_newlines=True).split("\n")
+    return float(output[0]), output[1].split()
+
+
+def benchImport(module):
+    """Importing a module of the engine in a fresh interpreter"""
+    def run(loops):
+        return sum(importProbe(module)[0] for _ in range(loops)), loops
+    return run
+
+
+def benchmarks():
+    """benchmarks: Every benchmark to run, as a list of
+    (name, params, function returning run(loops))"""
+    cases = [("import", {"module": module}, lambda m=module: benchImport(m)) for module in IMPORT_MODULES]
+    for decks in DECK_COUNTS:
+        cases.append(("deck.shuffle", {"decks": decks}, lambda d=decks: benchShuffle(d)))
+        cases.append(("deck.removeTopCard", {"decks": decks}, lambda d=decks: benchRemoveTopCard(d)))
+        cases.append(("game.generateDeck", {"decks": decks}, lambda d=decks: benchGenerateDeck(d)))
+    for hand_size in HAND_SIZES:
+        cases.append(("ai.getMove", {"hand_size": hand_size}, lambda h=hand_size: benchGetMove(h)))
+    for decks in DECK_COUNTS:
+        for players in PLAYER_COUNTS:
+            if players * 3 > DECK_SIZE * decks:
+                continue
+            params = {"players": players, "decks": decks}
+            cases.append(("game.redistributeCards", params, lambda p=players, d=decks: benchRedistributeCards(p, d)))
+            cases.append(("game.playTurn", params, lambda p=players, d=decks: benchPlayTurn(p, d)))
+            cases.append(("game.headless", params, lambda p=players, d=decks: benchGame(p, d)))
+    return cases
+
+
+def benchKey(name, params):
+    """benchKey: Name of a benchmark with its parameters, e.g.
+    game.playTurn[decks=1,players=4]"""
+    return "{}[{}]".format(name, ",".join("{}={}".format(k, params[k]) for k in sorted(params)))
+
+
+# -- Running -- #
+def measure(run, repeats=BENCH_REPEATS, min_time=BENCH_MIN_TIME, loops=None):
+    """measure: Times run(loops). Unless loops is given, the number of
+    loops is doubled until one call takes min_time / 10, then set so a
+    call takes about min_time. Returns (loops, seconds per op of each repeat)"""
+    if loops is None:
+        loops = 1
+        while True:
+            seconds, ops = run(loops)
+            if seconds >= min_time / 10 or loops >= 1 << 24:
+                break
+            loops *= 2
+        loops = max(1, int(loops * min_time / max(seconds, 1e-9)))
+    times = []
+    for _ in range(repeats):
+        seconds, ops = run(loops)
+        times.append(seconds / ops)
+    return loops, times
+
+
+def environment():
+    """environment: Where the results were measured"""
+    info = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "numpy": importlib.util.find_spec("numpy") is not None,
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    try:
+        info["commit"] = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                                 universal_newlines=True).strip()
+        info["dirty"] = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                                stderr=subprocess.DEVNULL, universal_newlines=True).strip() != ""
+    except (OSError, subprocess.CalledProcessError):
+        info["commit"] = None
+    return info
+
+
+def runBenchmarks(repeats=BENCH_REPEATS, min_time=BENCH_MIN_TIME, only=None, loops=None, out=sys.stdout):
+    """runBenchmarks: Runs the benchmarks and returns the results as a
+    dict that can be saved with json.dump
+
+    @param repeats: Number of times each benchmark is timed
+    @param min_time: Seconds each timing takes at least
+    @param only: Only run benchmarks whose name contains this text
+    @param loops: Optional dict of loops to run by benchmark key, e.g. a
+       baseline's, so both time exactly the same work (the same games)
+    @param out: Progress is printed here, None for no output"""
+    results = {"environment": environment(), "repeats": repeats, "min_time": min_time, "benchmarks": {}}
+    for name, params, setup in benchmarks():
+        if only is not None and only not in name:
+            continue
+        key = benchKey(name, params)
+        n_loops, times = measure(setup(), repeats, min_time, (loops or {}).get(key))
+        results["benchmarks"][key] = {
+            "name": name,
+            "params": params,
+            "unit": "s/op",
+            "loops": n_loops,
+            "times": times,
+            "best": min(times),
+            "median": statistics.median(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        }
+        if out is not None:
+            out.write("{:<45} {:>12}  (+-{:.1f}%)\n".format(key, formatTime(min(times)),
+                                                          100 * results["benchmarks"][key]["stdev"] /
+                                                          statistics.mean(times)))
+            out.flush()
+    return results
+
+
+def formatTime(seconds):
+    """formatTime: A time per op in the most readable unit"""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "{:.2f} {}".format(seconds / scale, unit)
+    return "{:.0f} ns".format(seconds / 1e-9)
+
+
+# -- Comparing -- #
+def compareResults(baseline, results, threshold=BENCH_THRESHOLD):
+    """compareResults: Compares results against a baseline. The best time
+    of each benchmark is compared, it is the least affected by other work
+    on the machine. Returns a list of (key, baseline time, new time,
+    ratio, verdict), verdict is "regression", "faster" or "same"
+
+    @param baseline: Results (from runBenchmarks) to compare against
+    @param results: New results
+    @param threshold: Slower by more than this fraction is a regression"""
+    rows = []
+    for key, new in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(key)
+        if old is None:
+            continue
+        ratio = new["best"] / old["best"]
+        if ratio > 1 + threshold:
+            verdict = "regression"
+        elif ratio < 1 / (1 + threshold):
+            verdict = "faster"
+        else:
+            verdict = "same"
+        rows.append((key, old["best"], new["best"], ratio, verdict))
+    return rows
+
+
+def environmentChanges(baseline, results):
+    """environmentChanges: Environment fields that differ between two
+    runs (other than the time and the commit), their times may not be
+    comparable"""
+    ignored = ("time", "commit", "dirty")
+    old, new = baseline["environment"], results["environment"]
+    return [key for key in sorted(set(old) | set(new))
+            if key not in ignored and old.get(key) != new.get(key)]
+
+
+def printComparison(rows, changes=(), out=sys.stdout):
+    """printComparison: Prints compareResults as a table"""
+    for key in changes:
+        out.write("WARNING: {} differs from the baseline\n".format(key))
+    for key, old, new, ratio, verdict in rows:
+        out.write("{:<45} {:>12} -> {:>12}  {:+6.1f}%  {}\n".format(
+            key, formatTime(old), formatTime(new), 100 * (ratio - 1), verdict.upper() if verdict != "same" else ""))
+    regressions = sum(1 for row in rows if row[4] == "regression")
+    out.write("{} benchmarks compared, {} regressions\n".format(len(rows), regressions))
+
+
+def checkImports(budget=IMPORT_TIME_BUDGET, runs=5, out=sys.stdout):
+    """checkImports: Checks that importing game.simulate in a fresh
+    interpreter (best of runs) takes less than budget seconds, and that
+    no module of the engine loads the console modules. Returns a list of
+    the problems found, empty if there are none"""
+    problems = []
+    for module in IMPORT_MODULES:
+        probes = [importProbe(module) for _ in range(runs)]
+        seconds = min(probe[0] for probe in probes)
+        loaded = [name for name in LAZY_MODULES if name in probes[0][1]]
+        out.write("{:<20} {:>10}  {} game modules loaded\n".format(module, formatTime(seconds), len(probes[0][1])))
+        if loaded:
+            problems.append("importing {} loads {}".format(module, ", ".join(loaded)))
+        if module == "game.simulate" and seconds > budget:
+            problems.append("importing {} took {}, the budget is {}".format(
+                module, formatTime(seconds), formatTime(budget)))
+    for problem in problems:
+        out.write("FAILED: {}\n".format(problem))
+    return problems
+
+
+def gcPressure(n_games=2000, n_players=4, seed=SEED, out=sys.stdout):
+    """gcPressure: Plays a headless simulation and returns the garbage
+    collections of each generation it triggered per 1000 games
+    @param n_games: Number of games to play
+    @param n_players: Number of players per game"""
+    gc.collect()
+    before = [generation["collections"] for generation in gc.get_stats()]
+    start = time.perf_counter()
+    simulate(n_games, n_players, seed)
+    elapsed = time.perf_counter() - start
+    after = [generation["collections"] for generation in gc.get_stats()]
+    per_1000 = [1000 * (a - b) / n_games for a, b in zip(after, before)]
+    if out is not None:
+        out.write("{} games of {} players in {:.2f} s\n".format(n_games, n_players, elapsed))
+        out.write("GC collections per 1000 games: {}\n".format(
+            ", ".join("gen{} {:.1f}".format(i, n) for i, n in enumerate(per_1000))))
+    return per_1000
+
+
+def loadResults(path):
+    """loadResults: Reads results saved by run --output"""
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the engine, the AI and the deck")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--output", "-o", default=None, help="Write the results to this JSON file")
+    run_parser.add_argument("--quick", action="store_true", help="Fewer, shorter timings (noisier)")
+    run_parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+
+    compare_parser = commands.add_parser("compare", help="Compare results against a baseline")
+    compare_parser.add_argument("baseline", help="Baseline results (JSON)")
+    compare_parser.add_argument("results", nargs="?", default=None,
+                                help="Results to compare (JSON). Runs the benchmarks if not given")
+    compare_parser.add_argument("--threshold", type=float, default=BENCH_THRESHOLD,
+                                help="Slowdown that counts as a regression (0.1 = 10%%)")
+    compare_parser.add_argument("--quick", action="store_true", help="Fewer, shorter timings (noisier)")
+    compare_parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+
+    imports_parser = commands.add_parser("imports", help="Check the engine's import time and lazy imports")
+    imports_parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET,
+                                help="Seconds importing game.simulate may take")
+
+    gc_parser = commands.add_parser("gc", help="Count the garbage collections of a long simulation")
+    gc_parser.add_argument("--games", type=int, default=2000, help="Number of games to play")
+    gc_parser.add_argument("--players", type=int, default=4, help="Number of players per game")
+    args = parser.parse_args()
+
+    if args.command == "imports":
+        sys.exit(1 if checkImports(args.budget) else 0)
+    if args.command == "gc":
+        gcPressure(args.games, args.players)
+        sys.exit(0)
+
+    repeats, min_time = (3, BENCH_MIN_TIME / 4) if args.quick else (BENCH_REPEATS, BENCH_MIN_TIME)
+    if args.command == "run":
+        results = runBenchmarks(repeats, min_time, args.filter)
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        baseline = loadResults(args.baseline)
+        if args.results is not None:
+            results = loadResults(args.results)
+        else:
+            results = runBenchmarks(repeats, min_time, args.filter,
+                                    {key: bench["loops"] for key, bench in baseline["benchmarks"].items()})
+        rows = compareResults(baseline, results, args.threshold)
+        printComparison(rows, environmentChanges(baseline, results))
+        sys.exit(1 if any(row[4] == "regression" for row in rows) else 0)
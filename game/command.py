@@ -7,7 +7,7 @@ command.py
 Commands to type into the terminal
 """
 
-from util import printIfDebug
+from .util import printIfDebug
 
 commands = []
 
@@ -35,10 +35,7 @@ def executeCommand(user_input):
     for command in commands:
         if command.name == cmd_name:
             try:
-                if len(args) == 1:
-                    command.run()
-                elif len(args) > 1: # Sorry only supports 1 arg commands
-                    command.run(args[1])
+                command.run(*args[1:])
                 return True
             except Exception as e:
                 printIfDebug(e)
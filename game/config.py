@@ -27,14 +27,81 @@ SUIT_MAP = {  # Maps suit to unicode character
 
 
 DECK_SIZE = 52  # Size of the deck
+NUM_DECKS = 1  # Number of decks shuffled together into the shoe
 SUIT_SIZE = len(SUITS)  # Cards per suit
 DEFAULT_NUM_PLAYERS = 4  # Default number of players
 
 # Cards that don't follow the "add the value" rule
 SPECIAL_CARDS = [3, 4, 10, 9, 11, 12, 13, 1]
 
+# Simulated games are stopped (with no winner) after this many turns.
+# Some deals loop forever, e.g. two players trading 4s
+SIM_MAX_TURNS = 10000
+
+# Search AI (mcts.py) budget per move. It stops at whichever
+# limit is reached first
+MCTS_TIME_BUDGET = 0.05  # Seconds
+MCTS_MAX_ITERATIONS = 5000
+
+# Arena (arena.py) Glicko ratings. RD is how uncertain a rating is,
+# it never drops below ARENA_MIN_RD so ratings can still move
+ARENA_INITIAL_RATING = 1500
+ARENA_INITIAL_RD = 350
+ARENA_MIN_RD = 30
+
+# Streaming statistics (stats.py). A run stops once every confidence
+# interval asked for is narrow enough, but never before STATS_MIN_GAMES
+# games: intervals from a handful of games can't be trusted
+STATS_CONFIDENCE = 0.95
+STATS_MIN_GAMES = 200
+STATS_QUANTILES = [0.5, 0.9, 0.99]  # Game length quantiles that are tracked
+
+# AI tuning (tune.py). Every candidate profile plays the same TUNE_GAMES
+# deals against default AIs, the TUNE_ELITES best of a generation of
+# TUNE_POPULATION profiles survive into the next
+TUNE_GAMES = 2000
+TUNE_POPULATION = 16
+TUNE_ELITES = 4
+TUNE_GENERATIONS = 10
+TUNE_SHARD_SIZE = 250  # Games per unit of work handed to a worker
+TUNE_BATCH_SHARD_SIZE = 2000  # The same when the batch engine plays them (batch.py, needs numpy)
+
+# Card counting AI (counting.py). It only leaves the normal strategy
+# for a move at least this likely to leave the next player stuck
+COUNTING_MIN_PROBABILITY = 0.2
+
+# Expectimax AI (expectimax.py). It searches one ply deeper at a time
+# until EXPECTIMAX_TIME_BUDGET runs out. Its transposition table keeps
+# at most EXPECTIMAX_TABLE_SIZE positions, least recently used go first
+EXPECTIMAX_TIME_BUDGET = 0.05  # Seconds
+EXPECTIMAX_MAX_DEPTH = 12  # Plies
+EXPECTIMAX_TABLE_SIZE = 100000  # About 35 MB
+
+# Game server (server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 9999
+SERVER_MOVE_TIMEOUT = 30  # Seconds a remote player has to make a move
+SERVER_AI_THREADS = 4  # Threads computing AI moves
+SERVER_BACKLOG = 4096  # Connections waiting to be accepted. Load tests connect thousands at once
+
+# Benchmarks (bench.py). Each benchmark is timed BENCH_REPEATS times,
+# each time for at least BENCH_MIN_TIME seconds. compare flags a
+# benchmark that got slower than the baseline by more than BENCH_THRESHOLD
+BENCH_REPEATS = 5
+BENCH_MIN_TIME = 0.2  # Seconds
+BENCH_THRESHOLD = 0.10  # 10%
+
+# Importing the engine (game.simulate, what worker processes load) in a
+# fresh interpreter must take less than this. Checked by bench.py imports
+IMPORT_TIME_BUDGET = 0.05  # Seconds
+
+# Count game events and time moves in games started from the
+# console (see metrics.py). Shown by the stats command
+COLLECT_METRICS = True
+
 CHAR_DELAY = 0.04  # Delay between printing characters
 AI_TURN_DELAY = 2  # Delay between AI moves
+RENDERER_MAX_QUEUED = 100  # Events the paced renderer holds before it drops them
 
 TITLE = """
     _   ___            __                    _          
@@ -47,7 +114,10 @@ TITLE = """
 :::::::::::::::::::: - HELP - ::::::::::::::::::::
 Type a command to execute it
 
-start [player_num=4] : Start a new game, optionally with n players
+start [player_num=4] [record_file] : Start a new game, optionally with n players
+                       and recording it to record_file
+stats                : View the current game's stats
+metrics [file]       : Print (or save to file) the current game's metrics as JSON
 help [command]       : View help, optionally for a specific command 
 rules                : View game rules 
 quit                 : Quit the current game 
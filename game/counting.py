@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+counting.py
+
+A card counting AI. It keeps a running count of the
+cards played to the pile since it was last emptied,
+fed one card at a time by the game's CardPlayed events
+(the pile is never rescanned), so working out which
+cards are still unseen costs the same at the start of
+a game as after thousands of turns.
+
+The cards it hasn't seen (not on the pile, not in its
+own hand) are in the deck or the other players' hands.
+Treating an opponent's hand as a random draw from them
+gives the probability (hypergeometric) that the
+opponent has nothing that fits under the total, and
+is forced out, after each move it could make.
+"""
+
+from .ai import AI
+from .events import Sink, CardPlayed
+from .deck import NUM_VALUES, PLAYABLE_BY_ROOM, MAX_TRUE_VALUE
+from .state import ADD_VALUES
+from .config import SUIT_SIZE, COUNTING_MIN_PROBABILITY
+
+
+class CardCounter(Sink):
+    """Constructor: Counts the cards played to a game's pile and
+    subscribes itself to the game's events. The count is reset whenever
+    the pile is emptied: when the cards are redistributed and when the
+    pile is shuffled back into the deck. Both are noticed in O(1), from
+    the game's redistribution count and from the pile object (the pile
+    and the deck swap places), before each card is counted
+    @param game: The Game, started or not"""
+    def __init__(self, game):
+        self.game = game
+        self.played = [0] * (NUM_VALUES + 1)  # Cards on the pile by value
+        self.pile = game.PILE
+        self.round = game.REDISTRIBUTIONS
+        game.EVENTS.subscribe(self)
+
+    def handle(self, event):
+        if event.__class__ is CardPlayed:
+            self.sync()
+            self.played[event.card.value] += 1
+
+    def sync(self):
+        """sync: Resets the count if the pile was emptied since the last card"""
+        if self.game.REDISTRIBUTIONS != self.round or self.game.PILE is not self.pile:
+            for value in range(NUM_VALUES + 1):
+                self.played[value] = 0
+            self.pile = self.game.PILE
+            self.round = self.game.REDISTRIBUTIONS
+
+    def unseen(self, hand):
+        """unseen: Cards of each value that are neither on the pile nor in
+        hand, a list indexed by value. O(values)
+        @param hand: The counting player's Hand"""
+        self.sync()
+        per_value = self.game.NUM_DECKS * SUIT_SIZE
+        counts = hand.counts
+        return [0] + [per_value - self.played[value] - counts[value] for value in range(1, NUM_VALUES + 1)]
+
+    def stuckProbability(self, unseen, total, max_total, hand_size):
+        """stuckProbability: Probability that a hand of hand_size cards
+        drawn from the unseen cards has no card that can be played at
+        total, i.e. that a player holding it is forced out
+        @param unseen: See unseen
+        @param total: The total the player has to play on
+        @param max_total: Total cannot go over this number
+        @param hand_size: Cards in the player's hand"""
+        room = max_total - total
+        if room >= MAX_TRUE_VALUE:
+            return 0.0
+        playable = PLAYABLE_BY_ROOM[room] if room >= 0 else 0
+        cards = stuck = 0
+        for value in range(1, NUM_VALUES + 1):
+            cards += unseen[value]
+            if not playable & (1 << value):
+                stuck += unseen[value]
+        # Hypergeometric: every card drawn is one of the stuck ones
+        probability = 1.0
+        for i in range(hand_size):
+            if cards - i <= 0:
+                return 0.0
+            probability *= max(stuck - i, 0) / (cards - i)
+        return probability
+
+
+def resultingTotal(value, selected_value, total, max_total):
+    """resultingTotal: The total after playing a card, as Game.playTurn
+    works it out (jacks and queens add 10)
+    @param value: Card value
+    @param selected_value: Value chosen for aces and 10s"""
+    if value == 9:
+        return max_total
+    if value in (1, 10):
+        return total + selected_value
+    return total + ADD_VALUES[value]
+
+
+class CountingAI(AI):
+    """Constructor: Creates a card counting AI. It plays like the AI,
+    unless a move is likely enough to leave the next player with nothing
+    to play, then it plays the likeliest of those. Only cards the AI
+    doesn't keep (not important ones) are played that way: spending a 9
+    or a 4 on it loses more games than it wins
+    @param name: Name of the AI
+    @param tokens: Number of tokens it starts off with
+    @param min_probability: Smallest chance of forcing the next player
+       out that is worth leaving the AI's strategy for
+    @param profile: AIProfile of the strategy it falls back on"""
+    def __init__(self, name, tokens, min_probability=COUNTING_MIN_PROBABILITY, profile=None):
+        AI.__init__(self, name, tokens, profile=profile)
+        self.min_probability = min_probability
+        self.counter = None
+
+    def joinGame(self, game):
+        """joinGame: Starts counting the game's cards"""
+        AI.joinGame(self, game)
+        self.counter = CardCounter(game)
+
+    def getMove(self, current_total, max_total):
+        """getMove: The move most likely to force the next player out, if
+        that is likely enough, otherwise the AI's move. Returns [index, value].
+        Takes O(values) whatever the length of the game
+
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        move = AI.getMove(self, current_total, max_total)
+        if self.counter is None or move[0] == -1 or current_total > max_total:
+            return move
+
+        unseen = self.counter.unseen(self.cards)
+        hand_size = self.game.HAND_SIZE
+        counts = self.cards.counts
+
+        # The AI's move wins ties, other moves have to do better
+        best = None
+        best_probability = max(self.min_probability, self.counter.stuckProbability(
+            unseen, resultingTotal(self.cards[move[0]].value, move[1], current_total, max_total),
+            max_total, hand_size))
+        for value in range(1, NUM_VALUES + 1):
+            if not counts[value] or self.important_mask & (1 << value):
+                continue
+            for selected_value in ((1, 11) if value == 1 else (10, -10) if value == 10 else (value,)):
+                total = resultingTotal(value, selected_value, current_total, max_total)
+                if total > max_total:
+                    continue
+                probability = self.counter.stuckProbability(unseen, total, max_total, hand_size)
+                # Between other moves, ties go to the cheaper card so important cards are kept
+                if probability > best_probability or (best is not None and probability == best_probability and
+                                                      self._cost(value) < self._cost(best[0])):
+                    best, best_probability = (value, selected_value), probability
+
+        if best is None:
+            return move
+        return [self.cards.indexOf(best[0]), best[1]]
+
+    def _cost(self, value):
+        """Order cards are given up in when moves are equally good"""
+        return (1 if self.important_mask & (1 << value) else 0, value)
+
+    def getType(self):
+        """Returns type of player"""
+        return "counting"
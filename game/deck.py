@@ -8,65 +8,137 @@ The Card and Deck class, handles keeping track of
 the cards and deck function.
 """
 
-import config
+from . import config
 import random
 
 
+# -- Integer card encoding -- #
+# Every card can be stored as a small int, its card id:
+#     card_id = (value - 1) * SUIT_SIZE + suit index
+# which is 0..51 for the standard deck. Everything the game needs
+# to know about a card is precomputed in the tables below, so
+# simulations can work with plain ints instead of Card objects.
+
+NUM_VALUES = int(config.DECK_SIZE / config.SUIT_SIZE)  # Card values are 1..NUM_VALUES
+
+# What a card does when played
+EFFECT_ADD = 0  # Adds its value
+EFFECT_ACE = 1  # +1 or +11
+EFFECT_SKIP = 2  # +3, skips the next player
+EFFECT_REVERSE = 3  # +0, reverses turn order
+EFFECT_SET_99 = 4  # Sets the total to 99
+EFFECT_PLUS_MINUS_10 = 5  # +10 or -10
+EFFECT_PLUS_10 = 6  # Jack and queen
+EFFECT_PASS = 7  # King, +0
+
+_EFFECTS = {1: EFFECT_ACE, 3: EFFECT_SKIP, 4: EFFECT_REVERSE, 9: EFFECT_SET_99,
+            10: EFFECT_PLUS_MINUS_10, 11: EFFECT_PLUS_10, 12: EFFECT_PLUS_10, 13: EFFECT_PASS}
+
+
+def encodeCard(value, suit):
+    """encodeCard: Returns the card id of a card
+    @param value: A number 1-13 representing the card value
+    @param suit: A lowercase string representing the card suit"""
+    return (value - 1) * config.SUIT_SIZE + config.SUITS.index(suit)
+
+
+def cardValue(card_id):
+    """cardValue: Returns the value (1-13) of a card id"""
+    return card_id // config.SUIT_SIZE + 1
+
+
+def cardSuit(card_id):
+    """cardSuit: Returns the suit of a card id"""
+    return config.SUITS[card_id % config.SUIT_SIZE]
+
+
+def _name(value, suit):
+    if value < 11:
+        return "{} of {}".format(value, suit)
+    return "{} of {}".format(config.CARD_MAP[value], suit)
+
+
+def _prettyName(value, suit):
+    if value < 11:
+        return "{}{}".format(value, config.SUIT_MAP[suit])
+    return "{}{}".format("JQK"[value - 11], config.SUIT_MAP[suit])
+
+
+def _description(value):
+    if value == 4:
+        return "(+0) Reverses turn order (Unless there are only 2 players)"
+    if value == 3:
+        return "(+3) Skips next player's turn (Unless there are only 2 players)"
+    if value == 10:
+        return "(+10 or -10) Choose value"
+    if value == 1:
+        return "(+1 or +11) Choose value"
+    if value == 9:
+        return "Sets the total to 99 regardless of previous value"
+    if value in [11, 12]:
+        return "(+10)"
+    if value == 13:
+        return "(+0) Skip your turn"
+    return "(+{})".format(value)
+
+
+# Tables indexed by card value (index 0 is unused)
+TRUE_VALUES = [0] + [0 if v in [4, 10, 9, 13] else v for v in range(1, NUM_VALUES + 1)]
+IS_SPECIAL = [False] + [v in config.SPECIAL_CARDS for v in range(1, NUM_VALUES + 1)]
+EFFECTS = [EFFECT_ADD] + [_EFFECTS.get(v, EFFECT_ADD) for v in range(1, NUM_VALUES + 1)]
+DESCRIPTIONS = [""] + [_description(v) for v in range(1, NUM_VALUES + 1)]
+
+# Tables indexed by card id. The extra last entry is used
+# by cards that are not part of the deck
+UNKNOWN_CARD = config.DECK_SIZE
+CARD_VALUES = [cardValue(i) for i in range(config.DECK_SIZE)]
+CARD_NAMES = [_name(cardValue(i), cardSuit(i)) for i in range(config.DECK_SIZE)] + ["Unknown card."]
+CARD_PRETTY_NAMES = [_prettyName(cardValue(i), cardSuit(i)) for i in range(config.DECK_SIZE)] + ["--"]
+_CARD_IDS = dict(((cardValue(i), cardSuit(i)), i) for i in range(config.DECK_SIZE))
+
+
 class Card(object):
     """Constructor: Creates a card object
     @param value: A number 1-13 representing the card value
     @param suit: A lowercase string representing the card suit"""
+    __slots__ = ("value", "suit", "id")
+
     def __init__(self, value, suit):
         self.value = value
         self.suit = suit
+        self.id = _CARD_IDS.get((value, suit), UNKNOWN_CARD)
+
+    @classmethod
+    def fromId(cls, card_id):
+        """fromId: Creates the Card for a card id"""
+        return cls(cardValue(card_id), cardSuit(card_id))
 
     def getName(self):
         """getName: Returns the name of the card
         Example: King of spades"""
-        if self.value < 11:
-            return "{} of {}".format(self.value, self.suit)
-        elif self.value < 14:
-            return "{} of {}".format(config.CARD_MAP[self.value], self.suit)
-        return "Unknown card."
+        return CARD_NAMES[self.id]
 
     def prettyName(self):
         """prettyName: Pretty prints the name
         with unicode suit symbols"""
-        if self.value < 11:
-            return "{}{}".format(self.value, config.SUIT_MAP[self.suit])
-        elif self.value < 14:
-            return "{}{}".format("JQK"[self.value - 11], config.SUIT_MAP[self.suit])
-        return "--"
+        return CARD_PRETTY_NAMES[self.id]
 
     def isSpecial(self):
         """isSpecial: Does the card do anything special?"""
-        return self.value in config.SPECIAL_CARDS
+        return IS_SPECIAL[self.value]
 
     def getTrueValue(self):
         """Returns the true "value" it represents
         Some cards that can add <= 0 value return 0"""
-        if self.value in [4, 10, 9, 13]:
-            return 0
-        return self.value
+        return TRUE_VALUES[self.value]
+
+    def getEffect(self):
+        """Returns what the card does when played (one of the EFFECT_ constants)"""
+        return EFFECTS[self.value]
 
     def getDescription(self):
         """Returns a description of the card"""
-
-        if self.value == 4:
-            return "(+0) Reverses turn order (Unless there are only 2 players)"
-        if self.value == 3:
-            return "(+3) Skips next player's turn (Unless there are only 2 players)"
-        if self.value == 10:
-            return "(+10 or -10) Choose value"
-        if self.value == 1:
-            return "(+1 or +11) Choose value"
-        if self.value == 9:
-            return "Sets the total to 99 regardless of previous value"
-        if self.value in [11, 12]:
-            return "(+10)"
-        if self.value == 13:
-            return "(+0) Skip your turn"
-        return "(+{})".format(self.value)
+        return DESCRIPTIONS[self.value]
 
     # str(card) should return the pretty name
     # rather than the long string name
@@ -91,33 +163,298 @@ class Card(object):
 
 
 class Deck(object):
-    """Constructor: Creates an empty deck"""
-    def __init__(self):
-        self.cards = []
+    """Constructor: Creates an empty deck. Cards are kept in a fixed
+    array used as a ring buffer, with the top card at the head index,
+    so drawing from the top and adding to the bottom are both O(1)
+    @param capacity: Number of card slots to start with. The deck
+       grows by itself if it runs out of slots"""
+    def __init__(self, capacity=config.DECK_SIZE * config.NUM_DECKS):
+        self._slots = [None] * max(capacity, 1)
+        self._head = 0  # Index of the top card in _slots
+        self._size = 0  # Number of cards in the deck
 
-    def shuffle(self):
-        """Shuffles the cards in place"""
-        random.shuffle(self.cards)
+    def shuffle(self, rng=random):
+        """Shuffles the cards in place (Fisher-Yates)
+        @param rng: Random number generator to shuffle with. Only its
+           random method is used, floats in [0, 1)"""
+        if self._head + self._size > len(self._slots):
+            self._unwrap()
+        slots = self._slots
+        head = self._head
+        rand = rng.random
+        for i in range(self._size - 1, 0, -1):
+            j = int(rand() * (i + 1))
+            slots[head + i], slots[head + j] = slots[head + j], slots[head + i]
 
     def removeTopCard(self):
         """Removes and returns top card
         IndexError if there are no cards"""
-        return self.cards.pop(0)
+        if self._size == 0:
+            raise IndexError("removeTopCard from an empty deck")
+        card = self._slots[self._head]
+        self._head += 1
+        if self._head == len(self._slots):
+            self._head = 0
+        self._size -= 1
+        return card
+
+    def removeCard(self, index):
+        """Removes and returns the card at index, the cards
+        after it move up by one. IndexError if there is no such card
+        @param index: Index of the card, 0 is the top card"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("deck index out of range")
+        slots = self._slots
+        capacity = len(slots)
+        position = (self._head + index) % capacity
+        card = slots[position]
+        for _ in range(self._size - index - 1):
+            following = position + 1 if position + 1 < capacity else 0
+            slots[position] = slots[following]
+            position = following
+        self._size -= 1
+        return card
 
     def addCard(self, card):
         """Adds a new card to the bottom of the deck
         @param card: A Card object"""
-        self.cards.append(card)
+        if self._size == len(self._slots):
+            self._grow()
+        position = self._head + self._size
+        if position >= len(self._slots):
+            position -= len(self._slots)
+        self._slots[position] = card
+        self._size += 1
+
+    def takeAllCards(self, other):
+        """Moves every card of another deck to the bottom
+        of this deck, leaving the other deck empty
+        @param other: A Deck object"""
+        while len(other):
+            self.addCard(other.removeTopCard())
+        other.removeAllCards()
 
     def removeAllCards(self):
-        """Clears the deck of all cards"""
-        self.cards = []
+        """Clears the deck of all cards (the slots are kept for reuse)"""
+        self._head = 0
+        self._size = 0
+
+    def fill(self, cards):
+        """Replaces the deck's cards with cards, in order (the first is
+        the top card). The existing slots are overwritten in place, so
+        nothing is allocated once the deck has enough slots
+        @param cards: A list or tuple of Card objects"""
+        n = len(cards)
+        if n > len(self._slots):
+            self._slots.extend([None] * (n - len(self._slots)))
+        self._slots[0:n] = cards
+        self._head = 0
+        self._size = n
+
+    def _unwrap(self):
+        """Moves the cards so they are stored in one contiguous run"""
+        self._slots = [self[i] for i in range(self._size)] + [None] * (len(self._slots) - self._size)
+        self._head = 0
+
+    def _grow(self):
+        """Doubles the number of card slots"""
+        capacity = len(self._slots)
+        self._unwrap()
+        self._slots.extend([None] * capacity)
 
     # Returns how many cards are the deck
     def __len__(self):
-        return len(self.cards)
+        return self._size
 
     # For getting a card by index, for example
     # deck[0] should return the first card
     def __getitem__(self, key):
-        return self.cards[key]
\ No newline at end of file
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(self._size))]
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError("deck index out of range")
+        position = self._head + key
+        if position >= len(self._slots):
+            position -= len(self._slots)
+        return self._slots[position]
+
+    def __iter__(self):
+        end = self._head + self._size
+        if end <= len(self._slots):
+            return iter(self._slots[self._head:end])
+        return iter(self._slots[self._head:] + self._slots[:end - len(self._slots)])
+
+
+# -- Card pools -- #
+# Cards never change, so every game shares the same Card objects.
+# _POOLS[n_decks] is the shoe of n_decks decks
+_POOLS = {}
+
+
+def cardPool(n_decks=config.NUM_DECKS):
+    """cardPool: The shared Card objects of a shoe of n_decks decks, as
+    a tuple in the order of a new deck (by value, then by suit)"""
+    pool = _POOLS.get(n_decks)
+    if pool is None:
+        pool = _POOLS[n_decks] = tuple(Card(value, suit)
+                                       for _ in range(n_decks)
+                                       for value in range(1, NUM_VALUES + 1)
+                                       for suit in config.SUITS)
+    return pool
+
+
+# -- Hands -- #
+# Masks are ints with bit v set for card value v. PLAYABLE_BY_ROOM[room]
+# is the mask of values whose true value fits in room (max total minus
+# total), every value fits once room reaches MAX_TRUE_VALUE
+MAX_TRUE_VALUE = max(TRUE_VALUES)
+ALL_VALUES_MASK = sum(1 << v for v in range(1, NUM_VALUES + 1))
+_NO_COUNTS = (0,) * (NUM_VALUES + 1)  # Hand.counts of an empty hand
+PLAYABLE_BY_ROOM = [sum(1 << v for v in range(1, NUM_VALUES + 1) if TRUE_VALUES[v] <= room)
+                    for room in range(MAX_TRUE_VALUE + 1)]
+
+
+def valueMask(values):
+    """valueMask: Mask of a list of card values"""
+    mask = 0
+    for value in values:
+        mask |= 1 << value
+    return mask
+
+
+def playableMask(total, max_total):
+    """playableMask: Mask of the values that can be played at total
+    (true value + total <= max_total), in O(1)"""
+    room = max_total - total
+    if room < 0:
+        return 0
+    return PLAYABLE_BY_ROOM[min(room, MAX_TRUE_VALUE)]
+
+
+class Hand(object):
+    """Constructor: Creates an empty hand. Besides the cards, a hand keeps
+    a count of its cards by value and a mask of the values it holds, so
+    questions like "is any card of these values playable?" take O(1)
+    no matter how many cards are held. The order of the cards doesn't
+    matter to the game, so by default removing a card moves the last card
+    into its place. Hands shown to a person keep their order instead
+    @param stable: Keep the order of the cards: the cards after a removed
+       one move up by one, O(hand size)"""
+    def __init__(self, stable=False):
+        self.stable = stable
+        self._cards = []
+        self._positions = [[] for _ in range(NUM_VALUES + 1)]  # Indexes of the cards, by value
+        self._where = []  # _where[i] is where index i is in _positions
+        self.counts = [0] * (NUM_VALUES + 1)  # Number of cards, by value
+        self.mask = 0  # Values held
+
+    def addCard(self, card):
+        """Adds a card to the end of the hand
+        @param card: A Card object"""
+        value = card.value
+        positions = self._positions[value]
+        self._where.append(len(positions))
+        positions.append(len(self._cards))
+        self._cards.append(card)
+        self.counts[value] += 1
+        self.mask |= 1 << value
+
+    def removeCard(self, index):
+        """Removes and returns the card at index. The last card takes
+        its place, or in a stable hand the cards after it move up by one.
+        IndexError if there is no such card
+        @param index: Index of the card"""
+        cards = self._cards
+        if index < 0:
+            index += len(cards)
+        if not 0 <= index < len(cards):
+            raise IndexError("hand index out of range")
+        card = cards[index]
+        value = card.value
+        where = self._where
+
+        # Take the index out of its value's list, the last index of
+        # that list takes its place
+        positions = self._positions[value]
+        moved = positions.pop()
+        if moved != index:
+            positions[where[index]] = moved
+            where[moved] = where[index]
+
+        if self.stable:  # Close the gap, renumbering the cards after it
+            del cards[index]
+            del where[index]
+            for i in range(index, len(cards)):
+                self._positions[cards[i].value][where[i]] = i
+            self.counts[value] -= 1
+            if self.counts[value] == 0:
+                self.mask &= ~(1 << value)
+            return card
+
+        # Move the last card into the gap
+        last = cards.pop()
+        last_where = where.pop()
+        if index < len(cards):
+            cards[index] = last
+            where[index] = last_where
+            self._positions[last.value][last_where] = index
+        self.counts[value] -= 1
+        if self.counts[value] == 0:
+            self.mask &= ~(1 << value)
+        return card
+
+    def removeTopCard(self):
+        """Removes and returns the first card
+        IndexError if there are no cards"""
+        if not self._cards:
+            raise IndexError("removeTopCard from an empty hand")
+        return self.removeCard(0)
+
+    def takeAllCards(self, other):
+        """Moves every card of a deck or hand into this hand
+        @param other: A Deck or Hand object"""
+        while len(other):
+            self.addCard(other.removeTopCard())
+        other.removeAllCards()
+
+    def removeAllCards(self):
+        """Clears the hand of all cards"""
+        self._cards.clear()
+        self._where.clear()
+        for positions in self._positions:
+            positions.clear()
+        self.counts[:] = _NO_COUNTS
+        self.mask = 0
+
+    def indexOf(self, value):
+        """indexOf: Index of a card with this value, -1 if there is none"""
+        positions = self._positions[value]
+        return positions[-1] if positions else -1
+
+    def countOf(self, mask):
+        """countOf: Number of cards with a value in mask"""
+        count = 0
+        remaining = self.mask & mask
+        while remaining:
+            value = remaining.bit_length() - 1
+            count += self.counts[value]
+            remaining &= ~(1 << value)
+        return count
+
+    def playable(self, mask, total, max_total):
+        """playable: Mask of the values in mask that the hand holds and
+        can play at total"""
+        return self.mask & mask & playableMask(total, max_total)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __getitem__(self, key):
+        return self._cards[key]
+
+    def __iter__(self):
+        return iter(self._cards)
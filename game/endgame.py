@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+endgame.py
+
+Exact solver for two player rounds with perfect
+information: both hands and the order of the deck
+are known. With two players 3s and 4s don't skip or
+reverse, so turns simply alternate and a round is a
+deterministic game that ends when the player to move
+is stuck. The solver finds out, with perfect play,
+who gets stuck.
+
+Positions are solved live, as they come up: a
+position is only worth anything for the deck order it
+was solved with, and positions from other deals
+practically never repeat (the two hands alone have
+about 200,000 combinations, before the deck), so
+solved values are only kept while the deck is the
+same. Solving a round takes milliseconds.
+"""
+
+from .player import Player
+from .ai import tableMove
+from .state import ADD_VALUES, legalMoves
+
+
+# Round values, for the player to move
+LOSS = 0
+UNKNOWN = 1  # The deck runs out first, so the next cards are not known
+WIN = 2
+
+
+def playMove(total, hand, move, drawn):
+    """playMove: Returns (new total, new sorted hand) after hand plays move
+    at total and draws the card drawn"""
+    value, selected_value = move
+    if value == 9:
+        total = 99
+    total += selected_value if value == 1 or value == 10 else ADD_VALUES[value]
+    new_hand = list(hand)
+    new_hand.remove(value)
+    new_hand.append(drawn)
+    new_hand.sort()
+    return total, tuple(new_hand)
+
+
+class Solver(object):
+    """Constructor: Creates a solver with an empty transposition table
+    @param max_total: Total cannot go over this number"""
+    def __init__(self, max_total=99):
+        self.max_total = max_total
+        self.table = {}  # (total, hand, other hand, deck position) -> value
+        self.deck = ()
+
+    def solve(self, total, hand, other_hand, deck):
+        """solve: Value (LOSS, UNKNOWN or WIN) of the round for the player to
+        move, with perfect play from both players
+        @param total: Game total
+        @param hand: Card values of the player to move
+        @param other_hand: Card values of the other player
+        @param deck: Card values in the deck, top card first"""
+        deck = tuple(deck)
+        if deck != self.deck:  # Positions are keyed by deck position
+            self.table = {}
+            self.deck = deck
+        return self._solve(total, tuple(sorted(hand)), tuple(sorted(other_hand)), 0)
+
+    def _solve(self, total, hand, other_hand, position):
+        key = (total, hand, other_hand, position)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+
+        moves = legalMoves(hand, total, self.max_total)
+        if not moves:
+            value = LOSS
+        elif position == len(self.deck):
+            value = UNKNOWN
+        else:
+            value = LOSS
+            drawn = self.deck[position]
+            for move in moves:
+                new_total, new_hand = playMove(total, hand, move, drawn)
+                result = WIN - self._solve(new_total, other_hand, new_hand, position + 1)
+                if result > value:
+                    value = result
+                    if value == WIN:
+                        break
+        self.table[key] = value
+        return value
+
+
+class EndgameAI(Player):
+    """Constructor: Perfect two player AI. It reads the opponent's hand and
+    the deck order from the game (it has perfect information), so it is
+    meant as a benchmark for the other AIs, not as a fair opponent.
+    Every position is solved as it comes up.
+    With more than two players it plays like the normal AI
+    @param name: Name of the AI
+    @param tokens: Number of tokens it starts off with"""
+    def __init__(self, name, tokens):
+        Player.__init__(self, name, tokens)
+        self.solver = Solver()
+
+    def getMove(self, current_total, max_total):
+        """getMove: Returns an index from its own cards to play and the value
+        to play in an array format [index, value]
+
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        values = [card.value for card in self.cards]
+        if self.game is None or len(self.game.PLAYERS) != 2 or max_total != self.solver.max_total:
+            move = tableMove(values, current_total, max_total)
+            return [values.index(move[0]), move[1]] if move else [-1, 0]
+
+        other = [player for player in self.game.PLAYERS if player is not self][0]
+        other_hand = [card.value for card in other.cards]
+        deck = [card.value for card in self.game.DECK]
+
+        best, best_value = None, -1
+        for move in legalMoves(values, current_total, max_total):
+            new_total, new_hand = playMove(current_total, values, move, deck[0])
+            value = WIN - self.solver.solve(new_total, other_hand, new_hand, deck[1:])
+            if value > best_value:
+                best, best_value = move, value
+        if best is None:
+            return [-1, 0]
+        return [values.index(best[0]), best[1]]
+
+    def getType(self):
+        """Returns type of player"""
+        return "endgame"
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+events.py
+
+Game events and the sinks that present them. The
+game emits events to its EventBus and never prints
+anything itself. Events are only created when the
+bus has a sink, so a game with no sinks does no
+formatting or output work at all.
+"""
+
+from .util import slowPrint
+
+import sys
+
+
+class Event(object):
+    """Base class of game events"""
+    __slots__ = ()
+    NAME = "event"
+
+    def text(self):
+        """text: The event as console text"""
+        return ""
+
+    def asDict(self):
+        """asDict: The event as plain data (for json.dumps)"""
+        return {"event": self.NAME}
+
+
+class GameStarted(Event):
+    """Constructor: A game has started
+    @param n_players: Number of players"""
+    __slots__ = ("n_players",)
+    NAME = "game_started"
+
+    def __init__(self, n_players):
+        self.n_players = n_players
+
+    def text(self):
+        return """Starting a new game with {} players.
+Shuffling the deck... distributing the cards...""".format(self.n_players)
+
+    def asDict(self):
+        return {"event": self.NAME, "players": self.n_players}
+
+
+class CardPlayed(Event):
+    """Constructor: A player has played a card
+    @param player: The Player
+    @param card: The Card played
+    @param total: Game total after the card"""
+    __slots__ = ("player", "card", "total")
+    NAME = "card_played"
+
+    def __init__(self, player, card, total):
+        self.player = player
+        self.card = card
+        self.total = total
+
+    def text(self):
+        lines = ["[{}] {} has played a {}{}.".format(self.player.name, self.player.name, self.card,
+                                                     " (Special)" if self.card.isSpecial() else "")]
+        if self.card.value == 4:
+            lines.append("[GAME] Turn order has been reversed!")
+        elif self.card.value == 3:
+            lines.append("[GAME] The next player has been skipped.")
+        lines.append("[GAME] The current total is {}".format(self.total))
+        return "\n".join(lines)
+
+    def asDict(self):
+        return {"event": self.NAME, "player": self.player.name, "seat": self.player.seat,
+                "card": self.card.id, "card_name": self.card.getName(), "total": self.total}
+
+
+class PlayerEliminated(Event):
+    """Constructor: A player has run out of tokens
+    @param player: The Player"""
+    __slots__ = ("player",)
+    NAME = "player_eliminated"
+
+    def __init__(self, player):
+        self.player = player
+
+    def text(self):
+        return "[GAME] {} has been eliminated!".format(self.player.name)
+
+    def asDict(self):
+        return {"event": self.NAME, "player": self.player.name, "seat": self.player.seat}
+
+
+class NoMoves(Event):
+    """Constructor: A player can't move, every card is redistributed
+    @param player: The Player who was stuck"""
+    __slots__ = ("player",)
+    NAME = "no_moves"
+
+    def __init__(self, player):
+        self.player = player
+
+    def text(self):
+        return "\nNO POSSIBLE MOVES, REDISTRIBUTING ALL CARDS\n"
+
+    def asDict(self):
+        return {"event": self.NAME, "player": self.player.name, "seat": self.player.seat,
+                "tokens": self.player.tokens}
+
+
+class DeckReshuffled(Event):
+    """Constructor: The deck ran out and the pile was shuffled into it"""
+    __slots__ = ()
+    NAME = "deck_reshuffled"
+
+    def text(self):
+        return "\nDeck empty, putting cards from the pile back into the deck...\nShuffling...\n"
+
+
+class EventBus(object):
+    """Constructor: Creates a bus with no sinks. The bus is falsy while it
+    has no sinks, check it before creating an event:
+        if self.EVENTS: self.EVENTS.emit(...)"""
+    def __init__(self):
+        self.sinks = []
+
+    def subscribe(self, sink):
+        """subscribe: Sends every event to sink from now on"""
+        self.sinks.append(sink)
+
+    def unsubscribe(self, sink):
+        """unsubscribe: Stops sending events to sink"""
+        self.sinks.remove(sink)
+
+    def emit(self, event):
+        """emit: Sends event to every sink"""
+        for sink in self.sinks:
+            sink.handle(event)
+
+    def flush(self):
+        """flush: Flushes every sink"""
+        for sink in self.sinks:
+            sink.flush()
+
+    def __bool__(self):
+        return len(self.sinks) > 0
+
+
+class Sink(object):
+    """Base class of event sinks. Subclasses override handle"""
+    def handle(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(Sink):
+    """Sink that drops every event"""
+    pass
+
+
+def consoleLines(event):
+    """consoleLines: The console output of an event, as a list of
+    (text, slow) where slow text is printed a character at a time"""
+    if isinstance(event, GameStarted):
+        return [(event.text(), True)]
+    if isinstance(event, DeckReshuffled):
+        return [("", False), ("Deck empty, putting cards from the pile back into the deck...", False),
+                ("Shuffling...", True), ("", False)]
+    return [(event.text(), False)]
+
+
+class ConsoleSink(Sink):
+    """Prints events to the console as the game always has, with
+    the slow printing for the start and reshuffle messages"""
+    def handle(self, event):
+        for text, slow in consoleLines(event):
+            if slow:
+                slowPrint(text)
+            else:
+                print(text)
+
+
+class BufferedSink(Sink):
+    """Constructor: Writes the console text of events in batches, with
+    no delays
+    @param stream: File to write to, defaults to stdout
+    @param batch_size: Number of events per write"""
+    def __init__(self, stream=None, batch_size=256):
+        self.stream = stream if stream is not None else sys.stdout
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def handle(self, event):
+        self.buffer.append(event.text())
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.stream.flush()
+
+
+class JsonLinesSink(Sink):
+    """Constructor: Writes each event as one line of JSON
+    @param stream: File to write to"""
+    def __init__(self, stream):
+        import json  # Only loaded when needed, it is slow to import
+        self.stream = stream
+        self.dumps = json.dumps
+
+    def handle(self, event):
+        self.stream.write(self.dumps(event.asDict()) + "\n")
+
+    def flush(self):
+        self.stream.flush()
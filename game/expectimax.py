@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+expectimax.py
+
+Depth limited expectimax AI. It searches its own moves
+(max nodes) and, as chance nodes, the cards it draws
+and the cards opponents play. Opponents' hands are
+never looked at: what they can hold comes from the
+cards counted as unseen (counting.CardCounter), an
+opponent is stuck with the hypergeometric probability
+and otherwise plays any card that fits, in proportion
+to how many are unseen. Totals, skips and reversals
+follow Game.playTurn. A round is worth 1 if another
+player gets stuck, 0 if this AI does.
+
+Opponents are all alike in this model, so a position
+is just (total, direction, whose turn it is counted
+from this AI, players left, own hand, unseen counts).
+Positions are cached in a transposition table keyed
+by Zobrist hashes of those, updated with a couple of
+XORs per move. Orders of play that end up in the same
+position (e.g. 5 then 6, or 6 then 5) are searched
+once. The table holds at most EXPECTIMAX_TABLE_SIZE
+positions, the least recently used are dropped, and
+it reports its hit rate and memory.
+
+The search deepens one ply at a time until the time
+budget per move runs out, the table carries over from
+one depth (and one move) to the next.
+
+Usage: python -m game.expectimax [--games N] [--players N] [--budget SECONDS]
+                                 [--table-size N] [--seed S]
+"""
+
+from .game import Game
+from .player import Player
+from .ai import AI, tableMove
+from .simulate import playGame, gameSeed
+from .rng import DealRNG
+from .counting import CardCounter
+from .state import ADD_VALUES, legalMoves
+from .deck import NUM_VALUES
+from .config import (EXPECTIMAX_TIME_BUDGET, EXPECTIMAX_MAX_DEPTH, EXPECTIMAX_TABLE_SIZE,
+                     DEFAULT_NUM_PLAYERS)
+
+from collections import OrderedDict
+import argparse
+import random
+import sys
+import time
+
+
+MAX_PLAYERS = 64  # Most players the Zobrist keys cover
+MAX_COUNT = 64  # Most cards of one value the Zobrist keys cover (16 decks)
+SAFE_CARD_BONUS = 0.1  # Leaf bonus per card that can be played at any total (4, 9, 10, K)
+ORDERED_DICT_LINK_BYTES = 56  # Each OrderedDict entry also has a node in its linked list (CPython)
+SAFE_MASK = sum(1 << value for value in range(1, NUM_VALUES + 1) if ADD_VALUES[value] <= 0)
+
+
+# -- Zobrist keys -- #
+# One random 64 bit number per (feature, value), a position's key is the
+# XOR of the numbers of its features. The numbers are fixed (seeded) so
+# keys are the same in every process
+def _zobristNumbers(count, rng):
+    return [rng.getrandbits(64) for _ in range(count)]
+
+
+_ZOBRIST_RNG = random.Random(0x99)
+Z_TOTAL = _zobristNumbers(400, _ZOBRIST_RNG)  # Indexed by total + TOTAL_OFFSET
+TOTAL_OFFSET = 200
+Z_REVERSED = _ZOBRIST_RNG.getrandbits(64)  # Direction of play is down the seats
+Z_TURN = _zobristNumbers(MAX_PLAYERS, _ZOBRIST_RNG)  # Seats from this AI to the player to move
+Z_PLAYERS = _zobristNumbers(MAX_PLAYERS + 1, _ZOBRIST_RNG)  # Players still in
+Z_PENDING = _ZOBRIST_RNG.getrandbits(64)  # This AI hasn't drawn its card yet
+Z_HAND = [_zobristNumbers(MAX_COUNT + 1, _ZOBRIST_RNG) for _ in range(NUM_VALUES + 1)]  # [value][nth copy]
+Z_UNSEEN = [_zobristNumbers(MAX_COUNT + 1, _ZOBRIST_RNG) for _ in range(NUM_VALUES + 1)]  # [value][count]
+
+
+def zobristKey(total, turn, direction, n_players, hand, unseen, pending=False):
+    """zobristKey: Key of a position, worked out from scratch. The
+    search updates keys incrementally instead
+    @param total: The game total
+    @param turn: Seats from the AI to the player to move, going up
+    @param direction: 1 or -1
+    @param n_players: Players still in
+    @param hand: The AI's card counts, indexed by value
+    @param unseen: Unseen card counts, indexed by value
+    @param pending: Has the AI still to draw a card?"""
+    key = Z_TOTAL[total + TOTAL_OFFSET] ^ Z_TURN[turn] ^ Z_PLAYERS[n_players]
+    if direction < 0:
+        key ^= Z_REVERSED
+    if pending:
+        key ^= Z_PENDING
+    for value in range(1, NUM_VALUES + 1):
+        for copy in range(1, hand[value] + 1):
+            key ^= Z_HAND[value][copy]
+        key ^= Z_UNSEEN[value][unseen[value]]
+    return key
+
+
+class TranspositionTable(object):
+    """Constructor: Creates an empty table of searched positions, keyed by
+    Zobrist key. Each entry keeps the value and the depth it was searched
+    to, a lookup only hits if the position was searched at least as deep
+    as asked. Once full, the least recently used entry makes room
+    @param size: Most entries kept, 0 turns the table off"""
+    def __init__(self, size=EXPECTIMAX_TABLE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()  # Key -> (depth, value), least recently used first
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key, depth):
+        """get: The value of a position searched to depth or deeper, or None"""
+        self.lookups += 1
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < depth:
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def store(self, key, depth, value):
+        """store: Saves the value of a position searched to depth"""
+        if self.size <= 0:
+            return
+        self.stores += 1
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.size:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = (depth, value)
+
+    def hitRate(self):
+        """hitRate: Fraction of lookups that found a usable entry"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def memory(self):
+        """memory: Estimated bytes held by the table: the dict and its
+        linked list, the entry tuples, the keys and the values"""
+        if not self.entries:
+            return sys.getsizeof(self.entries)
+        key, entry = next(iter(self.entries.items()))
+        per_entry = sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1]) + \
+            ORDERED_DICT_LINK_BYTES
+        return sys.getsizeof(self.entries) + len(self.entries) * per_entry
+
+    def snapshot(self):
+        """snapshot: The table's statistics as plain data (for json.dumps)"""
+        return {
+            "size": self.size,
+            "entries": len(self.entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hitRate(),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "memory_bytes": self.memory(),
+        }
+
+    def report(self):
+        """report: The table's statistics as text"""
+        return "Transposition table: {} of {} entries, {:.1%} hit rate ({} of {} lookups), {} evicted, " \
+               "~{:.1f} MB".format(len(self.entries), self.size, self.hitRate(), self.hits, self.lookups,
+                                   self.evictions, self.memory() / 1e6)
+
+
+class SearchTimeout(Exception):
+    """The time budget of a move ran out in the middle of a search"""
+    pass
+
+
+class ExpectimaxAI(Player):
+    """Constructor: Creates an expectimax AI
+    @param name: Name of the AI
+    @param tokens: Number of tokens it starts off with
+    @param time_budget: Max thinking time per move, in seconds
+    @param max_depth: Deepest search, in plies (one player's turn each)
+    @param table: TranspositionTable to use, a new one of
+       EXPECTIMAX_TABLE_SIZE entries if None. AIs can share one"""
+    def __init__(self, name, tokens, time_budget=EXPECTIMAX_TIME_BUDGET, max_depth=EXPECTIMAX_MAX_DEPTH,
+                 table=None):
+        Player.__init__(self, name, tokens)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = table if table is not None else TranspositionTable()
+        self.counter = None
+        self.last_depth = 0  # Deepest search completed for the last move
+        self.depths = 0  # Sum of last_depth over every searched move
+        self.searches = 0  # Moves searched
+        self.nodes = 0
+
+        # Search state, changed in place and restored as the search goes
+        self.hand = None  # Own card counts by value
+        self.unseen = None  # Unseen card counts by value
+        self.max_total = 99
+        self.hand_size = 3
+        self.deadline = 0
+
+    def joinGame(self, game):
+        """joinGame: Starts counting the game's cards"""
+        Player.joinGame(self, game)
+        self.counter = CardCounter(game)
+
+    def getMove(self, current_total, max_total):
+        """getMove: Returns an index from its own cards to play and the value
+        to play in an array format [index, value]
+
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        values = [card.value for card in self.cards]
+        if self.counter is None or current_total > max_total:  # Not in a game, play like the normal AI
+            move = tableMove(values, current_total, max_total)
+            return [values.index(move[0]), move[1]] if move else [-1, 0]
+
+        moves = legalMoves(values, current_total, max_total)
+        if len(moves) == 0:
+            return [-1, 0]
+        if len(moves) == 1:
+            return [values.index(moves[0][0]), moves[0][1]]
+
+        move = self.search(current_total, max_total)
+        return [values.index(move[0]), move[1]]
+
+    def search(self, total, max_total):
+        """search: Deepens the search one ply at a time until the time
+        budget runs out or max_depth is reached, and returns the best
+        move (card value, selected value) of the deepest finished search
+        @param total: The game total, it is this AI's turn
+        @param max_total: Total cannot go over this number"""
+        self.hand = list(self.cards.counts)
+        self.unseen = self.counter.unseen(self.cards)
+        self.max_total = max_total
+        self.hand_size = self.game.HAND_SIZE
+        self.deadline = time.perf_counter() + self.time_budget
+        n_players = len(self.game.PLAYERS)
+        direction = self.game.PLAYERS.direction
+        key = zobristKey(total, 0, direction, n_players, self.hand, self.unseen)
+
+        best = tableMove([value for value in range(1, NUM_VALUES + 1) for _ in range(self.hand[value])],
+                         total, max_total)
+        self.last_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best = self._ownTurn(total, direction, n_players, depth, key, root=True)
+            except SearchTimeout:
+                # The hand and counts were changed in place, put them back
+                self.hand = list(self.cards.counts)
+                self.unseen = self.counter.unseen(self.cards)
+                break
+            self.last_depth = depth
+        self.depths += self.last_depth
+        self.searches += 1
+        return best
+
+    # -- Search -- #
+    # turn is the number of seats from this AI to the player to move, going
+    # up the seats. key is always the Zobrist key of the position
+    def _value(self, total, turn, direction, n_players, pending, depth, key):
+        """Expected value of a position for this AI"""
+        if depth == 0:
+            return self._leafValue(total, n_players)
+        value = self.table.get(key, depth)
+        if value is not None:
+            return value
+
+        self.nodes += 1
+        if self.nodes & 127 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if turn != 0:
+            value = self._opponentTurn(total, turn, direction, n_players, depth, key)
+        elif pending:
+            value = self._draw(total, direction, n_players, depth, key)
+        else:
+            value = self._ownTurn(total, direction, n_players, depth, key)
+        self.table.store(key, depth, value)
+        return value
+
+    def _draw(self, total, direction, n_players, depth, key):
+        """Chance node: this AI draws the card for its last move, any
+        unseen card in proportion to how many are unseen"""
+        hand, unseen = self.hand, self.unseen
+        cards = sum(unseen)
+        key ^= Z_PENDING
+        if cards == 0:
+            return self._value(total, 0, direction, n_players, False, depth, key)
+
+        value = 0.0
+        for card in range(1, NUM_VALUES + 1):
+            count = unseen[card]
+            if count == 0:
+                continue
+            hand[card] += 1
+            unseen[card] -= 1
+            child_key = key ^ Z_HAND[card][hand[card]] ^ Z_UNSEEN[card][count] ^ Z_UNSEEN[card][count - 1]
+            value += count / cards * self._value(total, 0, direction, n_players, False, depth, child_key)
+            unseen[card] += 1
+            hand[card] -= 1
+        return value
+
+    def _ownTurn(self, total, direction, n_players, depth, key, root=False):
+        """Max node: the best of this AI's moves. At the root, returns the
+        move instead of its value"""
+        hand = self.hand
+        moves = legalMoves([value for value in range(1, NUM_VALUES + 1) if hand[value]], total, self.max_total)
+        if not moves:
+            return None if root else 0.0  # Stuck
+
+        best, best_value = None, -1.0
+        for move in moves:
+            card = move[0]
+            new_total, turn, new_direction, child_key = self._play(move, total, 0, direction, n_players, key)
+            child_key ^= Z_HAND[card][hand[card]] ^ Z_PENDING
+            hand[card] -= 1
+            value = self._value(new_total, turn, new_direction, n_players, True, depth - 1, child_key)
+            hand[card] += 1
+            if value > best_value:
+                best, best_value = move, value
+        return best if root else best_value
+
+    def _opponentTurn(self, total, turn, direction, n_players, depth, key):
+        """Chance node: the opponent to move is stuck (the round is won),
+        or plays one of the unseen cards that fit under the total"""
+        unseen = self.unseen
+        stuck = self.counter.stuckProbability(unseen, total, self.max_total, self.hand_size)
+        if stuck >= 1.0:
+            return 1.0
+
+        room = self.max_total - total
+        plays = []
+        weight = 0
+        for card in range(1, NUM_VALUES + 1):
+            if unseen[card] and (ADD_VALUES[card] <= room or card == 9 or card == 10):
+                plays.append(card)
+                weight += unseen[card]
+        if weight == 0:
+            return stuck
+
+        value = stuck
+        for card in plays:
+            count = unseen[card]
+            move = (card, 10 if room >= 10 else -10) if card == 10 else (card, card)
+            new_total, new_turn, new_direction, child_key = self._play(move, total, turn, direction,
+                                                                       n_players, key)
+            unseen[card] -= 1
+            child_key ^= Z_UNSEEN[card][count] ^ Z_UNSEEN[card][count - 1]
+            value += (1.0 - stuck) * count / weight * self._value(new_total, new_turn, new_direction, n_players,
+                                                                   True, depth - 1, child_key)
+            unseen[card] += 1
+        return value
+
+    def _play(self, move, total, turn, direction, n_players, key):
+        """The total, turn, direction and key (without the card changes)
+        after the player to move plays move, as in Game.playTurn"""
+        card, selected_value = move
+        new_total = total
+        if card == 9:
+            new_total = 99
+        new_total += selected_value if card == 1 or card == 10 else ADD_VALUES[card]
+        new_direction = direction
+        steps = 1
+        if n_players > 2:
+            if card == 4:
+                new_direction = -direction
+            elif card == 3:
+                steps = 2
+        new_turn = (turn + new_direction * steps) % n_players
+        key ^= Z_TOTAL[total + TOTAL_OFFSET] ^ Z_TOTAL[new_total + TOTAL_OFFSET] ^ Z_TURN[turn] ^ Z_TURN[new_turn]
+        if new_direction != direction:
+            key ^= Z_REVERSED
+        return new_total, new_turn, new_direction, key
+
+    def _leafValue(self, total, n_players):
+        """Value of a position the search stops at: the share of the
+        rounds lost by the others, nothing if this AI's hand can't be
+        played at the total, a little more for each card that always can"""
+        hand = self.hand
+        playable = any(hand[value] and (ADD_VALUES[value] <= self.max_total - total or value in (9, 10))
+                       for value in range(1, NUM_VALUES + 1))
+        if not playable:
+            return 0.0
+        safe = sum(hand[value] for value in range(1, NUM_VALUES + 1) if SAFE_MASK & (1 << value))
+        return min(1.0, (n_players - 1) / n_players + SAFE_CARD_BONUS * safe / self.hand_size)
+
+    def meanDepth(self):
+        """meanDepth: Average depth of the searches finished in time"""
+        return self.depths / self.searches if self.searches else 0.0
+
+    def getType(self):
+        """Returns type of player"""
+        return "expectimax"
+
+
+def evaluate(n_games, n_players=DEFAULT_NUM_PLAYERS, time_budget=EXPECTIMAX_TIME_BUDGET,
+             table_size=EXPECTIMAX_TABLE_SIZE, seed=None):
+    """evaluate: Plays n_games with one ExpectimaxAI against normal AIs
+    (moving round the seats) and returns (win rate, the AI's table,
+    mean search depth)"""
+    if seed is None:
+        seed = random.getrandbits(64)
+    table = TranspositionTable(table_size)
+    wins = depths = searches = 0
+    for i in range(n_games):
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(gameSeed(seed, i)))
+        player = ExpectimaxAI("Expectimax", game.INITAL_TOKEN, time_budget, table=table)
+        game.startGame(players=[player if seat == i % n_players else AI("AI{}".format(seat + 1), game.INITAL_TOKEN)
+                                for seat in range(n_players)])
+        if playGame(game).winner == player.name:
+            wins += 1
+        depths += player.depths
+        searches += player.searches
+    return wins / n_games if n_games else 0.0, table, depths / searches if searches else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the expectimax AI against normal AIs")
+    parser.add_argument("--games", type=int, default=50, help="Number of games to play")
+    parser.add_argument("--players", type=int, default=DEFAULT_NUM_PLAYERS, help="Players per game")
+    parser.add_argument("--budget", type=float, default=EXPECTIMAX_TIME_BUDGET, help="Seconds per move")
+    parser.add_argument("--table-size", type=int, default=EXPECTIMAX_TABLE_SIZE,
+                        help="Transposition table entries, 0 turns it off")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the deals")
+    args = parser.parse_args()
+
+    win_rate, table, depth = evaluate(args.games, args.players, args.budget, args.table_size, args.seed)
+    print("Win rate: {:.3f} over {} games ({:.3f} for an even share)".format(win_rate, args.games,
+                                                                            1 / args.players))
+    print("Mean search depth: {:.2f} plies".format(depth))
+    print(table.report())
@@ -8,114 +8,157 @@ The actual game logic. A new Game
 object is created when a game is started
 """
 
-import sys
-import os
-sys.path.append(os.getcwd() + "/game")
-
-from ai import AI
-from human import Human
-from deck import Card, Deck
-from config import *
-from util import *
+from .ai import AI
+from .deck import Deck, cardPool
+from .seats import SeatRing
+from .rng import DealRNG
+from .config import NUM_DECKS, DEFAULT_NUM_PLAYERS
+from . import records
+from .events import EventBus, GameStarted, CardPlayed, PlayerEliminated, NoMoves, DeckReshuffled
 
 import random
 
 
 class Game(object):
-    def __init__(self):
+    """Constructor: Creates a new game
+    @param verbose: Print game events to the console (subscribes a
+       ConsoleSink to EVENTS). Simulations turn this off so no event
+       is even created, unless another sink is subscribed.
+    @param rng: Random number generator used for every shuffle. It must
+       be random.Random compatible: the seating order is shuffled with
+       its shuffle method and the cards with its random method (see
+       Deck.shuffle). Defaults to the random module.
+       A rng.DealRNG is restarted at every round, so each round's deal
+       only depends on the game's key and the round number
+    @param recorder: Optional records.GameWriter that every game event
+       is written to
+    @param seed: Seed rng was made from. Only used to label the record
+    @param metrics: Optional metrics.Metrics that counts game events and
+       times playTurn and the players' getMove. Without it nothing is timed"""
+    def __init__(self, verbose=True, rng=None, recorder=None, seed=None, metrics=None):
+        self.EVENTS = EventBus()  # Game events go to the sinks subscribed here
+        if verbose:
+            from .events import ConsoleSink  # Console output is only loaded when asked for
+            self.EVENTS.subscribe(ConsoleSink())
+        self.RNG = rng if rng is not None else random
+        self.RECORDER = recorder
+        self.SEED = seed
+        self.METRICS = metrics
+        if metrics is not None:
+            metrics.instrumentGame(self)
+
+        self.SHOE = ()  # Every card of the game (shared by every game), in the order of a new deck
         self.DECK = Deck()  # Deck to draw cards from
         self.PILE = Deck()  # Pile of cards placed on the table
-        self.PLAYERS = []  # Array of players
-
-        self.TURN = 0  # Number repersenting the current turn
-        self.TURN_INC = 1  # How much to increment TURN each turn
+        self.PLAYERS = SeatRing()  # Players still in and the turn order
 
         self.TOTAL = 0  # Number repersenting the total sum
         self.MAX = 99  # TOTAL cannot go over this number.
         self.INITAL_TOKEN = 3  # Inital number of tokens per player
         self.HAND_SIZE = 3  # Cards per player
+        self.NUM_DECKS = NUM_DECKS  # Decks shuffled together into the shoe
 
         # -- Stats -- #
         self.TURNS_TOTAL = 0
         self.PLAYERS_ELIMINATED = 0
+        self.REDISTRIBUTIONS = 0
 
     def generateDeck(self):
         """Regenerates the deck, based on the
-        config data in config.py"""
-
-        self.DECK.removeAllCards()
-        for i in range(int(DECK_SIZE / SUIT_SIZE)):
-            for suit in SUITS:
-                self.DECK.addCard(Card(i + 1, suit))
+        config data in config.py and NUM_DECKS. The cards
+        come from the shared pool, none are created"""
+        self.SHOE = cardPool(self.NUM_DECKS)
+        self.DECK.fill(self.SHOE)
 
     def distributeCards(self):
         """Distributes card from the deck to players.
         If cards run out throws an IndexError Exception"""
-        for i in range(len(self.PLAYERS)):
+        for player in self.PLAYERS:
             for k in range(self.HAND_SIZE):
-                self.PLAYERS[i].cards.addCard(self.DECK.removeTopCard())
+                player.cards.addCard(self.DECK.removeTopCard())
+                if self.RECORDER is not None:
+                    self.RECORDER.record(records.DEAL, player.seat, player.cards[-1].id)
 
     def redistributeCards(self):
         """Redistributes all cards (Combines PILE, DECK and player cards)
-        to the players all over again."""
+        to the players all over again. The deck is put back in the
+        order of SHOE before it is shuffled, so the new deal only
+        depends on the random numbers, not on how the last round went.
+        The existing cards and deck, pile and hand storage are reused,
+        a reset only moves references around and allocates nothing"""
         for player in self.PLAYERS:
             player.cards.removeAllCards()
-        self.PILE = Deck()
-        self.generateDeck()
-        self.DECK.shuffle()
+        self.PILE.removeAllCards()
+        self.DECK.fill(self.SHOE)
+        if isinstance(self.RNG, DealRNG):
+            self.RNG.startRound(self.REDISTRIBUTIONS + 1)
+        self.DECK.shuffle(self.RNG)
+        if self.RECORDER is not None:
+            self.RECORDER.record(records.REDISTRIBUTE, records.NO_SEAT, total=self.TOTAL)
         self.distributeCards()
+        self.REDISTRIBUTIONS += 1
+        if self.METRICS is not None:
+            self.METRICS.count("redistributions")
 
-    def startGameMessage(self, n):
-        """Displays the game loading mesage
-        @param n: Number of players in the game"""
-
-        message = """Starting a new game with {} players.
-Shuffling the deck... distributing the cards...""".format(n)
-        slowPrint(message)
-
-    def startGame(self, n=DEFAULT_NUM_PLAYERS):
+    def startGame(self, n=DEFAULT_NUM_PLAYERS, players=None):
         """Start a game with n players
-        @param n: The number of players in the game"""
-        self.startGameMessage(n)
+        @param n: The number of players in the game
+        @param players: Optional list of Player objects to seat instead
+           of the default n-1 AIs and a human. n is ignored if given"""
+        if players is not None:
+            n = len(players)
+        if self.EVENTS:
+            self.EVENTS.emit(GameStarted(n))
 
         # Create the inital deck
         self.generateDeck()
-        self.DECK.shuffle()
+        if isinstance(self.RNG, DealRNG):
+            self.RNG.startRound(0)
+        self.DECK.shuffle(self.RNG)
 
         # Create the players
-        self.PLAYERS = []  # Remove all current players
-
-        # Create n-1 AI players
-        for i in range(n - 1):
-            self.PLAYERS.append(
-                AI(
-                    name="AI{}".format(i + 1),
+        seated = []
+        if players is not None:
+            seated.extend(players)
+        else:
+            # Create n-1 AI players
+            for i in range(n - 1):
+                seated.append(
+                    AI(
+                        name="AI{}".format(i + 1),
+                        tokens=self.INITAL_TOKEN
+                    )
+                )
+            # Create the human player (the console player, only loaded here)
+            from .human import Human
+            seated.append(
+                Human(
+                    name="MAN",
                     tokens=self.INITAL_TOKEN
                 )
             )
-        # Create the human player
-        self.PLAYERS.append(
-            Human(
-                name="MAN",
-                tokens=self.INITAL_TOKEN
-            )
-        )
         # Shuffle the turn order
-        random.shuffle(self.PLAYERS)
+        self.RNG.shuffle(seated)
+        self.PLAYERS = SeatRing(seated)
+        for player in self.PLAYERS:
+            player.joinGame(self)
+        if self.METRICS is not None:
+            self.METRICS.count("games")
+            for player in self.PLAYERS:
+                self.METRICS.instrumentPlayer(player)
+        if self.RECORDER is not None:
+            self.RECORDER.startGame(self)
 
         # Distribute cards to players
         self.distributeCards()
 
     def getCurrentPlayer(self):
         """Returns the current player, based on turn order"""
-        return self.PLAYERS[self.TURN % len(self.PLAYERS)]
+        return self.PLAYERS.currentPlayer()
 
     def getHumanPlayer(self):
         """Returns the human player"""
-        for p in self.PLAYERS:
-            if p.getType() == "human":
-                return p
-        return None
+        return self.PLAYERS.firstOfRole("human")
 
     def playTurn(self, card_index, selected_value=0):
         """The current player plays a card
@@ -129,7 +172,7 @@ Shuffling the deck... distributing the cards...""".format(n)
         Returns False if the card is played successfully, otherwise
         returns True"""
 
-        current_player = self.PLAYERS[self.TURN % len(self.PLAYERS)]
+        current_player = self.PLAYERS.currentPlayer()
 
         # Index is invalid, should be 0 <= index < cards.length
         if not 0 <= card_index < len(current_player.cards):
@@ -148,14 +191,14 @@ Shuffling the deck... distributing the cards...""".format(n)
         # 4 is worth 0, reverses order of play
         elif card_to_play.value == 4:
             if len(self.PLAYERS) > 2:
-                self.TURN_INC = -self.TURN_INC
+                self.PLAYERS.reverse()
 
                 # 3 is worth 3, next player is skipped unless
         # there are only 2 players
         elif card_to_play.value == 3:
             to_add = 3
             if len(self.PLAYERS) > 2:
-                self.TURN += self.TURN_INC
+                self.PLAYERS.skip()
 
                 # 10 is either +10 or -10
         elif card_to_play.value == 10:
@@ -186,12 +229,16 @@ Shuffling the deck... distributing the cards...""".format(n)
             return False
 
         self.TOTAL += to_add
-        self.TURN += self.TURN_INC
-        self.announceTurn(current_player, card_to_play)
+        self.PLAYERS.advance()
+        if self.EVENTS:
+            self.EVENTS.emit(CardPlayed(current_player, card_to_play, self.TOTAL))
 
-        self.PILE.addCard(current_player.cards.cards[card_index])
-        del current_player.cards.cards[card_index]
+        self.PILE.addCard(current_player.cards.removeCard(card_index))
         current_player.cards.addCard(self.DECK.removeTopCard())
+        if self.RECORDER is not None:
+            self.RECORDER.record(records.PLAY, current_player.seat, card_to_play.id,
+                                 current_player.cards[-1].id,
+                                 selected_value if card_to_play.value in [1, 10] else 0, self.TOTAL)
 
         self.TURNS_TOTAL += 1
 
@@ -199,38 +246,65 @@ Shuffling the deck... distributing the cards...""".format(n)
 
         return True
 
-    def announceTurn(self, player, card):
-        """Announces a player action and the current game total"""
-        print("[{}] {} has played a {}{}.".format(player.name, player.name, card,
-                                                  " (Special)" if card.isSpecial() else ""))
-        if card.value == 4:
-            print("[GAME] Turn order has been reversed!")
-        elif card.value == 3:
-            print("[GAME] The next player has been skipped.")
-        print("[GAME] The current total is {}".format(self.TOTAL))
-
     def killCurrentPlayer(self):
         """Announces the current player's death and removes them
-        from the array"""
+        from the turn order, the turn passes to the next seat.
+        Their cards go to the pile"""
         current_player = self.getCurrentPlayer()
+        self.PILE.takeAllCards(current_player.cards)
         self.PLAYERS_ELIMINATED += 1
-        print("[GAME] {} has been eliminated!".format(current_player.name))
-        self.PLAYERS.remove(current_player)
+        if self.METRICS is not None:
+            self.METRICS.count("eliminations")
+        if self.EVENTS:
+            self.EVENTS.emit(PlayerEliminated(current_player))
+        self.PLAYERS.eliminate(current_player)
+
+    def handleNoMoves(self):
+        """The current player can't make a move at all. They lose a token
+        (and are eliminated when they run out), then all cards are
+        redistributed. Returns the eliminated player, or None"""
+        eliminated = None
+        current_player = self.getCurrentPlayer()
+        current_player.tokens -= 1
+        if self.RECORDER is not None:
+            self.RECORDER.record(records.NO_MOVES, current_player.seat, total=self.TOTAL)
+        if current_player.tokens == 0:
+            eliminated = current_player
+            self.killCurrentPlayer()
+            if self.RECORDER is not None:
+                self.RECORDER.record(records.ELIMINATED, current_player.seat, total=self.TOTAL)
+        else:
+            self.PLAYERS.passForward()  # Game doesn't advance the turn if a move fails
+
+        if self.EVENTS:
+            self.EVENTS.emit(NoMoves(current_player))
+        self.redistributeCards()
+        if self.RECORDER is not None and self.isGameOver():
+            self.RECORDER.endGame(self.PLAYERS[0].seat)
+        return eliminated
+
+    def isGameOver(self):
+        """Is there only one player left?"""
+        return len(self.PLAYERS) == 1
 
     def checkDeckSize(self):
         """If the deck size is 0 collect cards from the PILE
         and reshuffle"""
         if len(self.DECK) == 0:
-            print("")
-            print("Deck empty, putting cards from the pile back into the deck...")
-            slowPrint("Shuffling...")
-            print("")
+            if self.EVENTS:
+                self.EVENTS.emit(DeckReshuffled())
 
             self.DECK, self.PILE = self.PILE, self.DECK
-            self.DECK.shuffle()
-
-    def displayStats(self):
-        """Display statistics"""
+            self.DECK.shuffle(self.RNG)
+            if self.METRICS is not None:
+                self.METRICS.count("reshuffles")
+            if self.RECORDER is not None:
+                self.RECORDER.record(records.RESHUFFLE, records.NO_SEAT, total=self.TOTAL)
+
+    def displayStats(self, player=None):
+        """Display statistics
+        @param player: Player whose tokens are shown as "your tokens",
+           defaults to the human player"""
         player_list = "\n".join(
             list(map(lambda x:
                      "      [{}] Tokens: {}".format(x.name, x.tokens),
@@ -238,9 +312,10 @@ Shuffling the deck... distributing the cards...""".format(n)
         )
 
         tokens = 0
-        human_player = self.getHumanPlayer()
-        if human_player is not None:
-            tokens = human_player.tokens
+        if player is None:
+            player = self.getHumanPlayer()
+        if player is not None:
+            tokens = player.tokens
 
         print("""
             -- Current Game Stats --
@@ -251,3 +326,5 @@ Shuffling the deck... distributing the cards...""".format(n)
             Your tokens:        {} 
             """.format(player_list, self.TURNS_TOTAL, self.PLAYERS_ELIMINATED,
                        tokens))
+        if self.METRICS is not None:
+            print(self.METRICS.report() + "\n")
@@ -8,8 +8,9 @@ Human player. Accepts input form the
 console to make moves.
 """
 
-from player import Player
-import command
+from .player import Player
+from .deck import Hand, playableMask
+from . import command
 
 
 class Human(Player):
@@ -18,6 +19,7 @@ class Human(Player):
     @param tokens: Number of tokens it starts off with"""
     def __init__(self, name, tokens):
         Player.__init__(self, name, tokens)
+        self.cards = Hand(stable=True)  # Cards stay where the player last saw them
 
     def promptSelectedValue(self, allowed_values):
         """promptSelectedValue: Used when a card has more than 1
@@ -66,14 +68,14 @@ class Human(Player):
             option += 1
         print("+------------------------------------+")
 
-        # If the user has 1 or 2 unplayable cards, then display a tip
+        # If the user has some unplayable cards, then display a tip
         # stating that the user cannot play those cards
-        if 3 > len(unplayable_cards) > 0:
+        if len(self.cards) > len(unplayable_cards) > 0:
             list_unplayable_cards = ", ".join([str(x) for x in unplayable_cards])
             print("\n[TIP] Cards you cannot play: {}".format(list_unplayable_cards))
 
         # If the user cannot play any cards, they must surrender
-        elif len(unplayable_cards) == 3:
+        elif not self.cards.mask & playableMask(current_total, max_total):
             print("\nYou cannot make any moves. Press ENTER to continue")
             input("> ")
             return [-1, 0]
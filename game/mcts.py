@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+mcts.py
+
+Search based AI. Picks moves with information set
+Monte Carlo tree search: each iteration guesses the
+hidden cards (deck and opponents' hands) from the
+cards it hasn't seen, then plays the round out with
+the normal AI's strategy. The tree holds this AI's own
+moves, opponents are expected to play like the normal
+AI. A round is won by not being the player who gets
+stuck. Thinking time per move is capped so it always
+answers on time.
+"""
+
+from .player import Player
+from .ai import tableMove
+from .state import GameState
+from .config import MCTS_TIME_BUDGET, MCTS_MAX_ITERATIONS
+
+import math
+import random
+import time
+
+
+ROLLOUT_LIMIT = 200  # Rollouts longer than this are scored as a draw
+EXPLORATION = 0.7  # UCB exploration constant
+
+
+class Node(object):
+    """Constructor: A node of the search tree
+    @param move: (card value, selected value) that leads to this node
+    @param seat: Seat of the player who made that move
+    @param parent: Parent node"""
+    __slots__ = ("move", "seat", "parent", "children", "visits", "wins", "available")
+
+    def __init__(self, move=None, seat=None, parent=None):
+        self.move = move
+        self.seat = seat
+        self.parent = parent
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0  # Rounds the mover did not lose
+        self.available = 1  # Iterations where this move could have been played
+
+    def selectChild(self, moves):
+        """selectChild: Returns the child with the highest UCB score
+        among moves (the moves legal in this iteration)"""
+        best, best_score = None, -1.0
+        for move in moves:
+            child = self.children[move]
+            score = child.wins / child.visits + \
+                EXPLORATION * math.sqrt(math.log(child.available) / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+
+class MCTSAI(Player):
+    """Constructor: Creates a search AI
+    @param name: Name of the AI
+    @param tokens: Number of tokens it starts off with
+    @param time_budget: Max thinking time per move, in seconds
+    @param max_iterations: Max search iterations per move
+    @param rng: Random number generator for the search"""
+    def __init__(self, name, tokens, time_budget=MCTS_TIME_BUDGET,
+                 max_iterations=MCTS_MAX_ITERATIONS, rng=None):
+        Player.__init__(self, name, tokens)
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.rng = rng if rng is not None else random.Random()
+        self.last_iterations = 0  # Iterations run for the last move
+
+    def getMove(self, current_total, max_total):
+        """getMove: Returns an index from its own cards to play and the value
+        to play in an array format [index, value]
+
+        @param current_total: The current game total
+        @param max_total: Total cannot go over this number"""
+        values = [card.value for card in self.cards]
+        if self.game is None:  # Not in a game, play like the normal AI
+            move = tableMove(values, current_total, max_total)
+            return [values.index(move[0]), move[1]] if move else [-1, 0]
+
+        root_state = GameState.fromGame(self.game, self.rng)
+        moves = root_state.legalMoves()
+        if len(moves) == 0:
+            return [-1, 0]
+        if len(moves) == 1:
+            return [values.index(moves[0][0]), moves[0][1]]
+
+        move = self.search(root_state)
+        return [values.index(move[0]), move[1]]
+
+    def search(self, root_state):
+        """search: Runs ISMCTS from root_state until the time or iteration
+        budget runs out. Returns the most visited move, or the normal AI's
+        move if the budget ran out before the first iteration
+        @param root_state: GameState where it is this AI's turn"""
+        root = Node()
+        deadline = time.perf_counter() + self.time_budget
+        iterations = 0
+
+        while iterations < self.max_iterations and time.perf_counter() < deadline:
+            state = self.determinize(root_state)
+            node = root
+
+            # Selection: go down while every legal move has been tried
+            moves = self.treeMoves(state)
+            while moves and all(move in node.children for move in moves):
+                for move in moves:
+                    node.children[move].available += 1
+                node = node.selectChild(moves)
+                state.applyMove(*node.move)
+                moves = self.treeMoves(state)
+
+            # Expansion: add one untried move
+            if moves:
+                move = self.rng.choice([move for move in moves if move not in node.children])
+                child = Node(move, state.currentSeat(), node)
+                node.children[move] = child
+                node = child
+                state.applyMove(*move)
+
+            loser = self.rollout(state)
+
+            # Backpropagation
+            while node is not None:
+                node.visits += 1
+                if loser is None:
+                    node.wins += 0.5
+                elif node.seat != loser:
+                    node.wins += 1
+                node = node.parent
+            iterations += 1
+
+        self.last_iterations = iterations
+        if not root.children:  # No iteration finished, play like the normal AI
+            return root_state.heuristicMove() or root_state.legalMoves()[0]
+        best = max(root.children.values(), key=lambda child: child.visits)
+        return best.move
+
+    def treeMoves(self, state):
+        """treeMoves: Plays opponents' turns with the normal AI's strategy
+        until it is this AI's turn again, then returns its legal moves.
+        Returns an empty list if the round ended first"""
+        while state.currentSeat() != self.seat:
+            move = state.heuristicMove()
+            if move is None:
+                return []
+            state.applyMove(*move)
+        return state.legalMoves()
+
+    def determinize(self, root_state):
+        """determinize: Copy of root_state where the cards this AI can't
+        see (deck and opponents' hands) are dealt at random from the
+        cards it hasn't seen"""
+        state = root_state.clone()
+        unseen = list(state.shoe)
+        for value in state.hands[self.seat] + state.pile:
+            unseen.remove(value)
+        self.rng.shuffle(unseen)
+
+        for seat in state.players:
+            if seat != self.seat:
+                size = len(state.hands[seat])
+                state.hands[seat] = unseen[-size:]
+                del unseen[-size:]
+        state.deck = unseen
+        return state
+
+    def rollout(self, state):
+        """rollout: Plays the round out with the normal AI's strategy.
+        Returns the seat of the player who got stuck, None if the
+        rollout was too long"""
+        for _ in range(ROLLOUT_LIMIT):
+            move = state.heuristicMove()
+            if move is None:
+                return state.currentSeat()
+            state.applyMove(*move)
+        return None
+
+    def getType(self):
+        """Returns type of player"""
+        return "mcts"
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+metrics.py
+
+Optional instrumentation: counters of game events
+and latency histograms of playTurn and of getMove
+by player type. A Game only collects them if it is
+given a Metrics object. Without one nothing is
+wrapped or timed, the hot paths run exactly as
+before (rare events cost one "is None" check).
+
+One Metrics can be shared by many games, e.g. a
+long simulation, and saved as a JSON snapshot.
+"""
+
+import json
+import time
+
+
+# Histogram buckets: latencies under 8ns have a bucket each, above that
+# every power of 2 is split into 8 buckets, so a bucket's bounds are
+# within 12.5% of each other
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+BUCKETS = (64 - SUB_BITS + 1) << SUB_BITS
+
+
+def bucketOf(ns):
+    """bucketOf: Histogram bucket of a latency in nanoseconds"""
+    if ns < SUB_BUCKETS:
+        return ns
+    shift = ns.bit_length() - 1 - SUB_BITS
+    return ((shift + 1) << SUB_BITS) + ((ns >> shift) & (SUB_BUCKETS - 1))
+
+
+def bucketUpper(bucket):
+    """bucketUpper: Largest latency in nanoseconds that goes in bucket"""
+    if bucket < SUB_BUCKETS:
+        return bucket
+    shift = (bucket >> SUB_BITS) - 1
+    return ((SUB_BUCKETS + (bucket & (SUB_BUCKETS - 1)) + 1) << shift) - 1
+
+
+class Histogram(object):
+    """Constructor: Creates an empty latency histogram. Latencies are
+    counted in log-spaced buckets of nanoseconds (see bucketOf), so
+    recording one is O(1) and the histogram never grows"""
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0  # Nanoseconds
+        self.min = None
+        self.max = None
+
+    def record(self, ns):
+        """record: Adds one latency
+        @param ns: Latency in nanoseconds"""
+        self.buckets[bucketOf(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        """merge: Adds another histogram's latencies to this one"""
+        for i in range(BUCKETS):
+            self.buckets[i] += other.buckets[i]
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def mean(self):
+        """mean: Mean latency in nanoseconds, 0 if empty"""
+        return self.total / self.count if self.count else 0
+
+    def quantile(self, q):
+        """quantile: Latency in nanoseconds below which a fraction q of
+        the latencies fall. It is the upper end of a bucket, so it is
+        at most 12.5% over the true value (and never more than max)"""
+        if self.count == 0:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i in range(BUCKETS):
+            seen += self.buckets[i]
+            if seen >= rank and self.buckets[i]:
+                return min(bucketUpper(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        """snapshot: The histogram as plain data (for json.dumps)"""
+        return {
+            "count": self.count,
+            "total_seconds": self.total / 1e9,
+            "mean_ns": self.mean(),
+            "min_ns": self.min,
+            "max_ns": self.max,
+            "p50_ns": self.quantile(0.5),
+            "p90_ns": self.quantile(0.9),
+            "p99_ns": self.quantile(0.99),
+            # Upper end of each bucket in ns -> count, empty buckets left out
+            "buckets": {str(bucketUpper(i)): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Metrics(object):
+    """Constructor: Creates empty metrics. Give it to Game(metrics=...)"""
+    COUNTERS = ("games", "turns", "failed_moves", "redistributions", "reshuffles", "eliminations")
+
+    def __init__(self):
+        self.counters = dict((name, 0) for name in self.COUNTERS)
+        self.histograms = {}  # Name -> Histogram
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        """count: Adds n to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def histogram(self, name):
+        """histogram: The histogram called name, created if needed"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def instrumentGame(self, game):
+        """instrumentGame: Times and counts game.playTurn by replacing it
+        on the game object. A successful move counts as a turn, a
+        failed one as a failed move"""
+        play_turn = game.playTurn
+        histogram = self.histogram("playTurn")
+        counters = self.counters
+        clock = time.perf_counter_ns
+
+        def timedPlayTurn(card_index, selected_value=0):
+            start = clock()
+            played = play_turn(card_index, selected_value)
+            histogram.record(clock() - start)
+            if played:
+                counters["turns"] += 1
+            else:
+                counters["failed_moves"] += 1
+            return played
+        game.playTurn = timedPlayTurn
+
+    def instrumentPlayer(self, player):
+        """instrumentPlayer: Times player.getMove by replacing it on the
+        player object, in the histogram "getMove.<player type>". Does
+        nothing if the player is already instrumented"""
+        if "getMove" in player.__dict__:
+            return
+        get_move = player.getMove
+        histogram = self.histogram("getMove." + player.getType())
+        clock = time.perf_counter_ns
+
+        def timedGetMove(current_total, max_total):
+            start = clock()
+            move = get_move(current_total, max_total)
+            histogram.record(clock() - start)
+            return move
+        player.getMove = timedGetMove
+
+    def merge(self, other):
+        """merge: Adds another Metrics' counts and latencies to this one"""
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, histogram in other.histograms.items():
+            self.histogram(name).merge(histogram)
+
+    def snapshot(self):
+        """snapshot: The metrics as plain data (for json.dumps)"""
+        return {
+            "elapsed_seconds": time.time() - self.started,
+            "counters": dict(self.counters),
+            "histograms": dict((name, histogram.snapshot())
+                               for name, histogram in sorted(self.histograms.items())),
+        }
+
+    def export(self, path):
+        """export: Writes snapshot() to a JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def report(self):
+        """report: The metrics as text, for the stats command"""
+        lines = ["            -- Instrumentation --"]
+        for name in self.COUNTERS:
+            lines.append("            {:<20}{}".format(name.replace("_", " ").capitalize() + ":",
+                                                       self.counters.get(name, 0)))
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append("            {:<20}n={} mean={} p50={} p99={} max={}".format(
+                name + ":", histogram.count, formatNs(histogram.mean()), formatNs(histogram.quantile(0.5)),
+                formatNs(histogram.quantile(0.99)), formatNs(histogram.max or 0)))
+        return "\n".join(lines)
+
+
+def formatNs(ns):
+    """formatNs: A latency in nanoseconds in a readable unit"""
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return "{:.1f}{}".format(ns / scale, unit)
+    return "{:.0f}ns".format(ns)
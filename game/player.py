@@ -9,7 +9,7 @@ Human extend this class
 """
 
 from abc import abstractmethod, ABCMeta
-from deck import Deck
+from .deck import Hand
 
 
 class Player(object):
@@ -17,8 +17,16 @@ class Player(object):
 
     def __init__(self, name, tokens):
         self.name = name
-        self.cards = Deck()
+        self.cards = Hand()
         self.tokens = tokens
+        self.seat = None  # Position in the turn order, set by the game
+        self.game = None  # Game being played, set by joinGame
+
+    def joinGame(self, game):
+        """joinGame: Called by the game when it starts, once
+        the turn order (and self.seat) is set
+        @param game: The Game object"""
+        self.game = game
 
     @abstractmethod
     def getType(self):
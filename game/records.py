@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+records.py
+
+Compact binary game records. A Game given a
+GameWriter as its recorder streams every event to
+the file as it happens: the deals, every card played
+(with the card drawn and the new total), lost tokens,
+eliminations, redistributions and reshuffles. Each
+event is one fixed width record.
+
+File layout:
+    file header:  magic, version, record size
+    per game:     game header (seed, record count, players,
+                  hand size, tokens, winner) then its records
+
+The start of each game is also streamed to an index
+file next to the log (FILE.idx), so GameLog can jump
+straight to game N of a memory-mapped log without
+reading the games before it. Logs are replayed from the
+records alone, the engine is never run.
+
+A game's header holds UNFINISHED as its record count
+until the game is finished, so a log cut off by a crash
+is read up to the last finished game.
+"""
+
+from .deck import Card
+
+import array
+import mmap
+import os
+import struct
+import weakref
+
+
+LOG_MAGIC = b"99GR"
+LOG_VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")  # magic, version, record size
+GAME_HEADER = struct.Struct("<QIBBBB")  # seed, records, players, hand size, tokens, winner
+RECORD = struct.Struct("<BBBbh")  # kind << 5 | seat, card id, drawn card id, selected value, total
+
+# Event kinds
+PLAY = 0  # seat played card, drew drawn. Selected value for aces and 10s, the new total
+DEAL = 1  # seat was dealt card
+NO_MOVES = 2  # seat was stuck and lost a token
+ELIMINATED = 3  # seat was eliminated
+REDISTRIBUTE = 4  # Every card was collected and shuffled, DEAL records follow
+RESHUFFLE = 5  # The deck ran out, the pile was shuffled into the deck
+KIND_NAMES = ["play", "deal", "no moves", "eliminated", "redistribute", "reshuffle"]
+
+NO_CARD = 255
+NO_SEAT = 31  # Seat of events that aren't a player's
+NO_WINNER = 255
+UNFINISHED = 0xFFFFFFFF  # Record count of a game that is still being written
+MAX_SEATS = 31  # Seats must fit in the low 5 bits of a record
+
+
+class GameWriter(object):
+    """Constructor: Opens a log file for writing, replacing any existing
+    file. Pass it to Game as the recorder. Records go straight to the
+    file, nothing is kept for the whole game
+    @param path: File to write"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.index = open(path + ".idx", "wb")
+        self.file.write(FILE_HEADER.pack(LOG_MAGIC, LOG_VERSION, RECORD.size))
+        self.games = 0
+        self.header_offset = None  # Offset of the current game's header
+        self.seed = 0
+        self.records = 0
+        self.game_info = None  # (players, hand size, tokens) of the current game
+
+    def startGame(self, game):
+        """startGame: Starts a new game record. Called by the game before
+        the first cards are dealt"""
+        self.finishGame()
+        if len(game.PLAYERS) > MAX_SEATS:
+            raise ValueError("Game records hold at most {} players".format(MAX_SEATS))
+        self.header_offset = self.file.tell()
+        self.seed = game.SEED if game.SEED is not None else 0
+        self.records = 0
+        self.game_info = (len(game.PLAYERS), game.HAND_SIZE, game.INITAL_TOKEN)
+        self.file.write(GAME_HEADER.pack(self.seed, UNFINISHED, *self.game_info, NO_WINNER))
+        self.index.write(struct.pack("<Q", self.header_offset))
+        self.games += 1
+
+    def record(self, kind, seat, card=NO_CARD, drawn=NO_CARD, selected_value=0, total=0):
+        """record: Appends one event to the current game
+        @param kind: Event kind, e.g. PLAY
+        @param seat: Seat of the player, NO_SEAT if it isn't a player's event
+        @param card: Card id played or dealt
+        @param drawn: Card id drawn after playing
+        @param selected_value: Value selected for aces and 10s
+        @param total: Game total after the event"""
+        self.file.write(RECORD.pack(kind << 5 | seat, card, drawn, selected_value, total))
+        self.records += 1
+
+    def endGame(self, winner_seat):
+        """endGame: Records the winner and closes the current game
+        @param winner_seat: Seat of the winner"""
+        self.finishGame(winner_seat)
+
+    def finishGame(self, winner_seat=NO_WINNER):
+        """finishGame: Fills in the current game's header"""
+        if self.header_offset is None:
+            return
+        end = self.file.tell()
+        self.file.seek(self.header_offset)
+        self.file.write(GAME_HEADER.pack(self.seed, self.records, *self.game_info, winner_seat))
+        self.file.seek(end)
+        self.header_offset = None
+
+    def close(self):
+        """close: Finishes the current game and closes the files"""
+        self.finishGame()
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecord(object):
+    """Constructor: One game of a GameLog
+    @param data: memoryview of the game, header included"""
+    def __init__(self, data):
+        self.seed, self.n_records, self.n_players, self.hand_size, self.tokens, winner = \
+            GAME_HEADER.unpack_from(data)
+        self.winner_seat = None if winner == NO_WINNER else winner
+        self.data = data[GAME_HEADER.size:GAME_HEADER.size + self.n_records * RECORD.size]
+
+    def __len__(self):
+        return self.n_records
+
+    def release(self):
+        """release: Lets go of the log's memory. The record can't be
+        read afterwards"""
+        self.data.release()
+
+    def events(self):
+        """events: Yields every event as (kind, seat, card id, drawn card id,
+        selected value, total)"""
+        for kind_seat, card, drawn, selected_value, total in RECORD.iter_unpack(self.data):
+            yield kind_seat >> 5, kind_seat & 31, card, drawn, selected_value, total
+
+    def replay(self):
+        """replay: Yields every event followed by the hands (lists of card
+        ids, by seat) right after it"""
+        hands = [[] for _ in range(self.n_players)]
+        for event in self.events():
+            kind, seat, card, drawn = event[:4]
+            if kind == PLAY:
+                hands[seat].remove(card)
+                hands[seat].append(drawn)
+            elif kind == DEAL:
+                hands[seat].append(card)
+            elif kind == ELIMINATED:
+                hands[seat] = []
+            elif kind == REDISTRIBUTE:
+                hands = [[] for _ in range(self.n_players)]
+            yield event, hands
+
+    def describe(self):
+        """describe: The game as readable lines, one per event"""
+        lines = []
+        for kind, seat, card, drawn, selected_value, total in self.events():
+            if kind == PLAY:
+                lines.append("[Seat {}] played {} ({}), drew {}. Total: {}".format(
+                    seat, Card.fromId(card), selected_value, Card.fromId(drawn), total))
+            elif kind == DEAL:
+                lines.append("[Seat {}] was dealt {}".format(seat, Card.fromId(card)))
+            elif seat != NO_SEAT:
+                lines.append("[Seat {}] {}".format(seat, KIND_NAMES[kind]))
+            else:
+                lines.append("[GAME] {}".format(KIND_NAMES[kind]))
+        return lines
+
+
+class GameLog(object):
+    """Constructor: Opens a log file with mmap, for random access to its games.
+    Its GameRecords read straight from the mapped file, closing the log
+    releases them
+    @param path: Log written by GameWriter"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = FILE_HEADER.unpack_from(self.map)
+        if magic != LOG_MAGIC or version != LOG_VERSION or record_size != RECORD.size:
+            raise ValueError("{} is not a game log".format(path))
+        self.data = memoryview(self.map)
+        self.offsets = self.readIndex(path + ".idx")
+        self.records = weakref.WeakSet()  # GameRecords still viewing the map
+
+    def readIndex(self, path):
+        """readIndex: Game offsets from the index file, read with mmap.
+        Falls back to scanning the game headers if it is missing or
+        doesn't match the log. Either way the games stop at the first
+        unfinished one"""
+        self.index_map = None
+        if os.path.exists(path) and os.path.getsize(path) >= 8:
+            with open(path, "rb") as f:
+                self.index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = memoryview(self.index_map)[:len(self.index_map) // 8 * 8].cast("Q")
+            end = self.gameEnd(offsets[-1])
+            if end == len(self.map):
+                return offsets
+            previous_end = self.gameEnd(offsets[-2]) if len(offsets) > 1 else FILE_HEADER.size
+            if end is None and previous_end == offsets[-1]:
+                finished = offsets[:-1]  # Cut off while the last game was written
+                offsets.release()
+                return finished
+            offsets.release()
+            self.index_map.close()
+            self.index_map = None
+
+        offsets = array.array("Q")
+        offset = FILE_HEADER.size
+        end = self.gameEnd(offset)
+        while end is not None:
+            offsets.append(offset)
+            offset, end = end, self.gameEnd(end)
+        return offsets
+
+    def gameEnd(self, offset):
+        """gameEnd: Offset just after the game starting at offset, None if
+        there is no finished game there"""
+        if offset + GAME_HEADER.size > len(self.map):
+            return None
+        records = GAME_HEADER.unpack_from(self.map, offset)[1]
+        end = offset + GAME_HEADER.size + records * RECORD.size
+        if records == UNFINISHED or end > len(self.map):
+            return None
+        return end
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, n):
+        """Returns game number n as a GameRecord"""
+        record = GameRecord(self.data[self.offsets[n]:])
+        self.records.add(record)
+        return record
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def close(self):
+        """close: Releases the GameRecords it returned and closes the file"""
+        for record in list(self.records):
+            record.release()
+        if self.index_map is not None:
+            self.offsets.release()
+            self.index_map.close()
+        self.data.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+renderer.py
+
+Paced console output. PacedRenderer is an event sink
+that queues the game's events and plays them back on
+its own thread at human speed: slow printed messages
+and a pause after every turn. The game never waits
+for it, so it keeps computing moves (AI moves
+included) while earlier turns are still on screen.
+
+Playback can be skipped (everything queued is printed
+at once) or sped up at any time. Headless runs don't
+subscribe a renderer, so there is no pacing at all.
+If playback falls too far behind, new events are
+dropped and replaced by one line saying how many.
+"""
+
+from .events import Sink, GameStarted, CardPlayed, NoMoves, consoleLines
+from .config import CHAR_DELAY, AI_TURN_DELAY, RENDERER_MAX_QUEUED
+
+import select
+import sys
+import threading
+import queue
+
+
+# Events that end a turn. main.py used to print a blank line
+# and sleep after each of these
+TURN_EVENTS = (GameStarted, CardPlayed, NoMoves)
+
+
+def inputReady():
+    """inputReady: Has the user typed a line that hasn't been read?
+    Always False where stdin can't be polled (e.g. Windows)"""
+    try:
+        return len(select.select([sys.stdin], [], [], 0)[0]) > 0
+    except (OSError, ValueError):
+        return False
+
+
+class PacedRenderer(Sink):
+    """Constructor: Starts the playback thread
+    @param char_delay: Delay between characters of slow printed text
+    @param turn_delay: Pause after each turn
+    @param stream: File to write to, defaults to stdout
+    @param max_queued: Most events waiting to be played back, later
+       events are dropped until playback catches up"""
+    def __init__(self, char_delay=CHAR_DELAY, turn_delay=AI_TURN_DELAY, stream=None,
+                 max_queued=RENDERER_MAX_QUEUED):
+        self.char_delay = char_delay
+        self.turn_delay = turn_delay
+        self.stream = stream if stream is not None else sys.stdout
+        self.speed = 1.0  # Playback speed, fastForward changes it
+
+        self.queue = queue.Queue(max_queued + 1)  # Lines waiting to be played back, and the stop item
+        self.max_queued = max_queued
+        self.pending = 0  # Events queued or being played back
+        self.dropped = 0  # Events dropped since the last one queued
+        self.idle = threading.Condition()
+        self.skipping = threading.Event()  # Set while skipping to the end of the queue
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def handle(self, event):
+        """handle: Queues an event. The text is formatted now, the
+        players may have changed by the time it is played back"""
+        with self.idle:
+            if self.pending >= self.max_queued:
+                self.dropped += 1
+                return
+            lines = self.droppedLines() + consoleLines(event)
+            self.pending += 1
+        pause = 0
+        if isinstance(event, TURN_EVENTS):
+            lines.append(("", False))
+            pause = self.turn_delay if not isinstance(event, GameStarted) else 0
+        self.queue.put_nowait((lines, pause))
+
+    def droppedLines(self):
+        """droppedLines: The line standing in for the events dropped since
+        the last one queued, and resets the count. Called holding idle"""
+        if self.dropped == 0:
+            return []
+        lines = [("[... {} event{} skipped, the game was ahead of the screen ...]".format(
+            self.dropped, "s" if self.dropped > 1 else ""), False)]
+        self.dropped = 0
+        return lines
+
+    def run(self):
+        """run: Playback thread, plays queued events in order"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            lines, pause = item
+            for text, slow in lines:
+                self.write(text, slow)
+            self.sleep(pause)
+            with self.idle:
+                self.pending -= 1
+                if self.pending == 0:
+                    self.skipping.clear()
+                    self.idle.notify_all()
+
+    def write(self, text, slow):
+        """write: Prints a line, a character at a time if slow"""
+        if slow and not self.skipping.is_set():
+            for char in text:
+                self.stream.write(char)
+                self.stream.flush()
+                self.sleep(self.char_delay)
+            self.stream.write("\n")
+        else:
+            self.stream.write(text + "\n")
+        self.stream.flush()
+
+    def sleep(self, seconds):
+        """sleep: Waits seconds at the current speed. Returns at once
+        when playback is skipped"""
+        if seconds > 0:
+            self.skipping.wait(seconds / self.speed)
+
+    def skip(self):
+        """skip: Prints everything queued right away"""
+        self.skipping.set()
+
+    def fastForward(self, speed):
+        """fastForward: Changes the playback speed
+        @param speed: 1 is normal speed, 2 twice as fast, etc."""
+        self.speed = speed
+
+    def waitIdle(self, skip_on_enter=False):
+        """waitIdle: Blocks until everything queued has been played back
+        @param skip_on_enter: Pressing enter while waiting skips playback"""
+        with self.idle:
+            if self.dropped > 0:  # Nothing came after them, say so now
+                self.pending += 1
+                self.queue.put_nowait((self.droppedLines(), 0))
+            while self.pending > 0:
+                self.idle.wait(0.05)
+                if skip_on_enter and self.pending > 0 and inputReady():
+                    sys.stdin.readline()
+                    self.skip()
+
+    def flush(self):
+        """flush: Waits for playback to finish"""
+        self.waitIdle()
+
+    def close(self):
+        """close: Finishes playback and stops the thread"""
+        self.waitIdle()
+        self.queue.put(None)
+        self.thread.join()
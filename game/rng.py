@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+rng.py
+
+Random numbers for dealing, keyed by (master seed,
+game index, round index). The key of a round is a
+hash (SplitMix64) of those three counters, so any
+game, and any round of a game, can be regenerated on
+its own in O(1) without playing what came before it.
+Rounds are numbered by how many times the cards have
+been redistributed.
+
+Within a round the numbers come from a Mersenne
+Twister seeded with the round's key: reseeding costs
+about one shuffle's worth of time once per round,
+while drawing stays at C speed (a SplitMix64 stream
+in Python made every shuffle 4 times slower).
+
+Different machines can play different games of the
+same run with no coordination, and one interesting
+game out of billions can be replayed from its seed
+and index alone.
+"""
+
+import random
+
+
+MASK64 = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15  # SplitMix64 increment (golden ratio)
+
+
+def mix64(x):
+    """mix64: SplitMix64's finalizer, a bijective hash of a 64 bit int"""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return x ^ (x >> 31)
+
+
+def gameKey(seed, game):
+    """gameKey: Key of game number game of the run seeded with seed.
+    Records store it as the game's seed
+    @param seed: Master seed of the run (any int)
+    @param game: Game index"""
+    return mix64((mix64(seed & MASK64) + (game + 1) * GAMMA) & MASK64)
+
+
+def roundKey(game_key, round):
+    """roundKey: Key of a round of a game
+    @param game_key: The game's gameKey
+    @param round: Round index, 0 for the first deal"""
+    return mix64(game_key ^ mix64((round + 1) * GAMMA & MASK64))
+
+
+class DealRNG(random.Random):
+    """Constructor: Creates the random numbers of one game. Game restarts
+    them at every round (see startRound), shuffles within a round (when
+    the pile goes back into the deck) carry on the round's numbers.
+    Everything random.Random has works on it
+    @param seed: Master seed of the run
+    @param game: Game index
+    @param round: Round to start at"""
+    def __init__(self, seed, game=0, round=0):
+        random.Random.__init__(self, 0)
+        self.game_key = gameKey(seed, game)
+        self.startRound(round)
+
+    @classmethod
+    def fromGameKey(cls, game_key, round=0):
+        """fromGameKey: The random numbers of a game from its key, e.g.
+        the seed saved in a game record"""
+        rng = cls(0)
+        rng.game_key = game_key
+        rng.startRound(round)
+        return rng
+
+    def startRound(self, round):
+        """startRound: Jumps to the start of a round, in O(1)"""
+        self.round = round
+        self.seed(roundKey(self.game_key, round))
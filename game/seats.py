@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+seats.py
+
+The turn order. SeatRing keeps the players still
+in as a ring of seats (linked by seat number), so
+moving the turn on, skipping a player, reversing
+the order and eliminating a player are all O(1)
+however many players are at the table.
+
+Whose turn it is is a seat, not a position in a
+list, so eliminating a player never changes whose
+turn it is, unless the eliminated player was the
+one to move.
+"""
+
+
+class SeatRing(object):
+    """Constructor: Seats the players in the order given, players[i]
+    gets seat i (and player.seat is set). The first player moves
+    first, going up the seats
+    @param players: List of Player objects"""
+    def __init__(self, players=()):
+        self._players = list(players)  # Indexed by seat, eliminated players stay
+        n = len(self._players)
+        self._next = [(seat + 1) % n for seat in range(n)]  # Next seat still in, going up
+        self._prev = [(seat - 1) % n for seat in range(n)]  # Next seat still in, going down
+        self._in = [True] * n
+        self._size = n
+        self.head = 0  # Lowest seat still in
+        self.current = 0  # Seat whose turn it is
+        self.direction = 1  # 1 going up the seats, -1 going down
+
+        # Players still in by role (Player.getType()), in seat order
+        self._roles = {}
+        for seat in range(n):
+            self._players[seat].seat = seat
+            self._roles.setdefault(self._players[seat].getType(), {})[seat] = self._players[seat]
+
+    def currentPlayer(self):
+        """currentPlayer: The player whose turn it is"""
+        return self._players[self.current]
+
+    def player(self, seat):
+        """player: The player in a seat (eliminated or not)"""
+        return self._players[seat]
+
+    def nextSeat(self, seat, direction=None):
+        """nextSeat: The seat after seat that is still in
+        @param direction: 1 or -1, defaults to the direction of play"""
+        if direction is None:
+            direction = self.direction
+        return self._next[seat] if direction > 0 else self._prev[seat]
+
+    def advance(self):
+        """advance: Moves the turn to the next player in the direction of play"""
+        self.current = self._next[self.current] if self.direction > 0 else self._prev[self.current]
+
+    def skip(self):
+        """skip: Skips the next player in the direction of play. The
+        turn still has to be advanced as usual after it"""
+        self.advance()
+
+    def reverse(self):
+        """reverse: Reverses the direction of play"""
+        self.direction = -self.direction
+
+    def passForward(self):
+        """passForward: Moves the turn to the next seat going up, whatever
+        the direction of play. A stuck player's turn always passes this way"""
+        self.current = self._next[self.current]
+
+    def eliminate(self, player):
+        """eliminate: Takes a player out of the ring. If it was their turn,
+        the turn passes forward (see passForward), otherwise it doesn't
+        change. ValueError if the player isn't in
+        @param player: The Player, its seat must be set"""
+        seat = player.seat
+        if seat is None or not 0 <= seat < len(self._players) or \
+                self._players[seat] is not player or not self._in[seat]:
+            raise ValueError("{} is not in the game".format(player.name))
+        following, preceding = self._next[seat], self._prev[seat]
+        self._next[preceding] = following
+        self._prev[following] = preceding
+        self._in[seat] = False
+        self._size -= 1
+        if self.head == seat:
+            self.head = following
+        if self.current == seat:
+            self.current = following
+        del self._roles[player.getType()][seat]
+
+    def isIn(self, player):
+        """isIn: Is the player still in?"""
+        seat = player.seat
+        return seat is not None and 0 <= seat < len(self._players) and \
+            self._players[seat] is player and self._in[seat]
+
+    def firstOfRole(self, role):
+        """firstOfRole: The player still in with the lowest seat whose
+        getType() is role, or None"""
+        players = self._roles.get(role)
+        if not players:
+            return None
+        return next(iter(players.values()))
+
+    def playersOfRole(self, role):
+        """playersOfRole: Every player still in whose getType() is role"""
+        return list(self._roles.get(role, {}).values())
+
+    def seats(self):
+        """seats: Seats of the players still in, in seat order"""
+        return [player.seat for player in self]
+
+    def position(self):
+        """position: Position of the current player among the players
+        still in, in seat order. O(n)"""
+        return self.seats().index(self.current)
+
+    # Number of players still in
+    def __len__(self):
+        return self._size
+
+    # Players still in, in seat order
+    def __iter__(self):
+        if self._size == 0:
+            return
+        seat = self.head
+        for _ in range(self._size):
+            yield self._players[seat]
+            seat = self._next[seat]
+
+    # ring[i] is the i'th player still in, in seat order. ring[0] is O(1),
+    # the others walk the ring
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("seat ring index out of range")
+        seat = self.head
+        for _ in range(index):
+            seat = self._next[seat]
+        return self._players[seat]
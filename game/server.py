@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+server.py
+
+Hosts many games at once from one process. Players
+connect over TCP (e.g. with telnet or nc) and are
+seated at tables, the empty seats are filled with
+AIs. Each table runs its own Game as an asyncio task:
+remote players send their moves over the connection,
+search AI moves are computed on a thread pool so the
+event loop never blocks. Slow players have their move made
+for them after a timeout.
+
+Protocol, one line per message:
+    server -> client: game events as console text, and
+        "[TURN] total=T cards=V,V,V" when it's their move,
+        "[GAME OVER] winner=NAME" when the table ends
+    client -> server: "N" or "N VALUE" to play card N (1-3)
+        with VALUE for aces and 10s, or a command:
+        stats, rules, help [command], quit
+
+Usage: python -m game.server serve [--port P] [--players N] [--humans H] [--ai ai|mcts]
+       python -m game.server loadtest CLIENTS [--port P] [--games G]
+"""
+
+from .game import Game
+from .player import Player
+from .deck import Hand
+from .ai import AI, tableMove
+from .mcts import MCTSAI
+from .state import legalMoves
+from .events import Sink
+from .config import SERVER_HOST, SERVER_PORT, SERVER_MOVE_TIMEOUT, SERVER_AI_THREADS, SERVER_BACKLOG, \
+    DEFAULT_NUM_PLAYERS
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Connection(object):
+    """Constructor: A connected client
+    @param name: Name of the player
+    @param reader: asyncio StreamReader
+    @param writer: asyncio StreamWriter"""
+    def __init__(self, name, reader, writer):
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.moves = asyncio.Queue()  # Move lines sent by the client
+        self.table = None  # Table it is seated at
+        self.player = None  # Its RemotePlayer at that table
+        self.closed = False
+
+    def send(self, text):
+        """send: Sends text to the client, one line per line of text"""
+        if not self.closed:
+            self.writer.write((text + "\n").encode())
+
+    def close(self):
+        """close: Closes the connection"""
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+            self.moves.put_nowait(None)  # Wakes up a pending requestMove
+
+
+class RemotePlayer(Player):
+    """Constructor: A seat played from a network connection
+    @param connection: The player's Connection
+    @param tokens: Number of tokens it starts off with"""
+    def __init__(self, connection, tokens):
+        Player.__init__(self, connection.name, tokens)
+        self.cards = Hand(stable=True)  # The client numbers cards by their order
+        self.connection = connection
+
+    def getMove(self, current_total, max_total):
+        """getMove: The move made for the player when they time out or
+        disconnect, the normal AI's move"""
+        values = [card.value for card in self.cards]
+        move = tableMove(values, current_total, max_total)
+        return [values.index(move[0]), move[1]] if move else [-1, 0]
+
+    async def requestMove(self, current_total, max_total, timeout):
+        """requestMove: Asks the client for a move and waits up to timeout
+        seconds for a valid one. Returns it as [index, value]"""
+        connection = self.connection
+        values = [card.value for card in self.cards]
+        if connection.closed:
+            return self.getMove(current_total, max_total)
+        if not legalMoves(values, current_total, max_total):
+            connection.send("\nYou cannot make any moves.")
+            return [-1, 0]
+
+        while not connection.moves.empty():  # Drop moves sent out of turn
+            connection.moves.get_nowait()
+        lines = ["", "+------------ Your Cards -----------+"]
+        for option, card in enumerate(self.cards):
+            lines.append("[{}] :  {} {}".format(option + 1, card, card.getDescription()))
+        lines.append("+------------------------------------+")
+        lines.append("[TURN] total={} cards={}".format(current_total, ",".join(str(v) for v in values)))
+        connection.send("\n".join(lines))
+        try:
+            await connection.writer.drain()
+        except ConnectionError:
+            connection.close()
+            return self.getMove(current_total, max_total)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = await asyncio.wait_for(connection.moves.get(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                connection.send("[TIMEOUT] Your move was made for you")
+                return self.getMove(current_total, max_total)
+            if line is None:  # Disconnected
+                return self.getMove(current_total, max_total)
+            move = self.parseMove(line, current_total, max_total)
+            if move is not None:
+                return move
+            connection.send("You cannot play that card or value!")
+
+    def parseMove(self, line, current_total, max_total):
+        """parseMove: Reads "N" or "N VALUE" into [index, value], None if
+        it isn't a legal move (state.legalMoves)"""
+        try:
+            args = [int(arg) for arg in line.split()]
+        except ValueError:
+            return None
+        if not 1 <= len(args) <= 2 or not 1 <= args[0] <= len(self.cards):
+            return None
+        card = self.cards[args[0] - 1]
+        selected_value = args[1] if len(args) == 2 else 0
+        # Checked against the same rule as requestMove and Game.playTurn
+        move = (card.value, selected_value if card.value in [1, 10] else card.value)
+        if move not in legalMoves([card.value], current_total, max_total):
+            return None
+        return [args[0] - 1, selected_value]
+
+    def getType(self):
+        """Returns type of player"""
+        return "remote"
+
+
+class TableSink(Sink):
+    """Constructor: Sends a table's game events to its players
+    @param table: The Table"""
+    def __init__(self, table):
+        self.table = table
+
+    def handle(self, event):
+        text = event.text()
+        for connection in self.table.connections:
+            connection.send(text)
+
+
+class Table(object):
+    """Constructor: One game hosted by the server
+    @param server: The GameServer
+    @param number: Table number
+    @param connections: Connections of the remote players"""
+    def __init__(self, server, number, connections):
+        self.server = server
+        self.number = number
+        self.connections = connections
+        self.game = Game(verbose=False)
+
+    async def run(self):
+        """run: Plays the game to the end, then sends the players back
+        to the lobby"""
+        game = self.game
+        tokens = game.INITAL_TOKEN
+        players = []
+        for connection in self.connections:
+            connection.table = self
+            connection.player = RemotePlayer(connection, tokens)
+            players.append(connection.player)
+        for i in range(self.server.players_per_table - len(players)):
+            players.append(self.server.ai_factory(name="AI{}".format(i + 1), tokens=tokens))
+
+        game.EVENTS.subscribe(TableSink(self))
+        game.startGame(players=players)
+        loop = asyncio.get_running_loop()
+
+        while not game.isGameOver():
+            player = game.getCurrentPlayer()
+            if isinstance(player, RemotePlayer):
+                move = await player.requestMove(game.TOTAL, game.MAX, self.server.move_timeout)
+            elif isinstance(player, AI):
+                # A table lookup, cheaper than handing it to a thread
+                move = player.getMove(game.TOTAL, game.MAX)
+            else:
+                move = await loop.run_in_executor(self.server.executor, player.getMove, game.TOTAL, game.MAX)
+            if not game.playTurn(move[0], move[1]):
+                game.handleNoMoves()
+            self.server.moves += 1
+
+        winner = game.PLAYERS[0].name
+        for connection in self.connections:
+            connection.send("[GAME OVER] winner={}".format(winner))
+            connection.table = connection.player = None
+        self.server.games += 1
+        for connection in self.connections:
+            if not connection.closed:
+                self.server.seat(connection)
+
+
+class GameServer(object):
+    """Constructor: Creates a server
+    @param host: Address to listen on
+    @param port: Port to listen on
+    @param players_per_table: Seats per table
+    @param humans_per_table: Remote players seated per table, the
+       rest of the seats are filled by ai_factory
+    @param ai_factory: Function (name, tokens) -> Player for the AI seats
+    @param move_timeout: Seconds a remote player has to make a move"""
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, players_per_table=DEFAULT_NUM_PLAYERS,
+                 humans_per_table=1, move_timeout=SERVER_MOVE_TIMEOUT, ai_factory=AI):
+        if not 1 <= humans_per_table <= players_per_table:
+            raise ValueError("humans_per_table must be between 1 and players_per_table ({})".format(
+                players_per_table))
+        self.host = host
+        self.port = port
+        self.players_per_table = players_per_table
+        self.humans_per_table = humans_per_table
+        self.move_timeout = move_timeout
+        self.ai_factory = ai_factory
+        self.executor = concurrent.futures.ThreadPoolExecutor(SERVER_AI_THREADS)
+        self.lobby = []  # Connections waiting for a table
+        self.tables = set()  # Tables being played
+        self.table_numbers = itertools.count(1)
+        self.player_numbers = itertools.count(1)
+        self.games = 0  # Games finished
+        self.moves = 0  # Moves made on every table
+
+    async def serve(self):
+        """serve: Accepts connections until cancelled"""
+        server = await asyncio.start_server(self.handleConnection, self.host, self.port,
+                                            backlog=SERVER_BACKLOG)
+        async with server:
+            await server.serve_forever()
+
+    def seat(self, connection):
+        """seat: Puts a connection in the lobby and starts a table once
+        enough players are waiting"""
+        self.lobby.append(connection)
+        connection.send("Waiting for a table...")
+        if len(self.lobby) >= self.humans_per_table:
+            connections = self.lobby[:self.humans_per_table]
+            del self.lobby[:self.humans_per_table]
+            table = Table(self, next(self.table_numbers), connections)
+            task = asyncio.get_running_loop().create_task(table.run())
+            self.tables.add(task)
+            task.add_done_callback(lambda task: self.tableDone(table, task))
+
+    def tableDone(self, table, task):
+        """tableDone: Forgets a finished table. If its game raised, the
+        error is logged and the table's players are told and disconnected,
+        nobody else is left waiting on it"""
+        self.tables.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        logger.error("Table %d stopped", table.number, exc_info=error)
+        for connection in table.connections:
+            connection.send("[ERROR] The table stopped: {}".format(error))
+            connection.close()
+
+    async def handleConnection(self, reader, writer):
+        """handleConnection: Reads lines from a client until it leaves"""
+        connection = Connection("P{}".format(next(self.player_numbers)), reader, writer)
+        connection.send("Welcome to 99, you are {}. Type help for commands".format(connection.name))
+        self.seat(connection)
+        try:
+            while not connection.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors="replace").strip()
+                if line == "quit":
+                    break
+                if line[:1].isdigit():
+                    connection.moves.put_nowait(line)
+                elif line:
+                    connection.send(self.runCommand(connection, line))
+        except ConnectionError:
+            pass
+        finally:
+            if connection in self.lobby:
+                self.lobby.remove(connection)
+            connection.close()
+
+    def runCommand(self, connection, line):
+        """runCommand: Runs a command for one connection and returns
+        what it printed"""
+        from . import command  # The console's commands, only loaded once a player types one
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            if line == "stats":
+                if connection.table is None:
+                    print("     You are not at a table")
+                else:
+                    connection.table.game.displayStats(connection.player)
+            elif not command.executeCommand(line):
+                print("     Unknown command, type help for commands")
+        return output.getvalue().rstrip("\n")
+
+
+class LoadTestStats(object):
+    """Constructor: Totals of a load test"""
+    def __init__(self):
+        self.connected = 0
+        self.games = 0
+        self.moves = 0
+        self.latency_total = 0.0  # Seconds from sending a move to the next reply
+        self.latency_max = 0.0
+        self.errors = 0
+
+    def __str__(self):
+        mean = self.latency_total / self.moves if self.moves else 0.0
+        return """
+            -- Load Test --
+        Clients connected:  {}
+        Games finished:     {}
+        Moves sent:         {}
+        Reply latency:      {:.2f} ms mean, {:.2f} ms max
+        Errors:             {}
+        """.format(self.connected, self.games, self.moves, mean * 1000, self.latency_max * 1000, self.errors)
+
+
+async def loadTestClient(host, port, n_games, stats, rng):
+    """loadTestClient: One simulated player. Plays n_games games with the
+    normal AI's strategy, then quits"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats.errors += 1
+        return
+    stats.connected += 1
+    games = 0
+    sent = None  # When the last move was sent
+    try:
+        while games < n_games:
+            line = await reader.readline()
+            if not line:
+                break
+            if sent is not None:
+                latency = time.perf_counter() - sent
+                stats.latency_total += latency
+                stats.latency_max = max(stats.latency_max, latency)
+                sent = None
+            line = line.decode()
+            if line.startswith("[TURN]"):
+                fields = dict(field.split("=") for field in line.split()[1:])
+                values = [int(v) for v in fields["cards"].split(",")]
+                move = tableMove(values, int(fields["total"]), 99)
+                if move is None:  # The server only asks when there is a move
+                    move = (values[0], 0)
+                if rng.random() < 0.1:
+                    writer.write(b"stats\n")
+                writer.write("{} {}\n".format(values.index(move[0]) + 1, move[1]).encode())
+                sent = time.perf_counter()
+                stats.moves += 1
+            elif line.startswith("[GAME OVER]"):
+                games += 1
+        writer.write(b"quit\n")
+        await writer.drain()
+    except ConnectionError:
+        stats.errors += 1
+    finally:
+        writer.close()
+    stats.games += games
+
+
+async def loadTest(n_clients, host=SERVER_HOST, port=SERVER_PORT, n_games=1, seed=None):
+    """loadTest: Connects n_clients simulated players to a running
+    server and returns LoadTestStats once they are done"""
+    stats = LoadTestStats()
+    rng = random.Random(seed)
+    await asyncio.gather(*[loadTestClient(host, port, n_games, stats, rng) for _ in range(n_clients)])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host 99 tables over TCP, or load test a server")
+    parser.add_argument("mode", choices=["serve", "loadtest"])
+    parser.add_argument("clients", type=int, nargs="?", default=1000, help="Simulated players (loadtest)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--players", type=int, default=DEFAULT_NUM_PLAYERS, help="Seats per table (serve)")
+    parser.add_argument("--humans", type=int, default=1, help="Remote players per table (serve)")
+    parser.add_argument("--ai", choices=["ai", "mcts"], default="ai", help="AI for the empty seats (serve)")
+    parser.add_argument("--timeout", type=float, default=SERVER_MOVE_TIMEOUT, help="Seconds per move (serve)")
+    parser.add_argument("--games", type=int, default=1, help="Games per simulated player (loadtest)")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        print("Serving on {}:{}".format(args.host, args.port))
+        asyncio.run(GameServer(args.host, args.port, args.players, args.humans, args.timeout,
+                                      MCTSAI if args.ai == "mcts" else AI).serve())
+    else:
+        started = time.perf_counter()
+        print(asyncio.run(loadTest(args.clients, args.host, args.port, args.games)))
+        print("        Took {:.2f} s".format(time.perf_counter() - started))
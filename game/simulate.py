@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+simulate.py
+
+Headless simulation. Plays full games with no
+console output, no delays and no human input,
+for evaluating AI strategies statistically.
+
+The object engine plays about 1,000 games a second
+per core: every card is an object and every turn goes
+through Game.playTurn and a Player, most of the time
+is the Python work of the turns and the deals
+themselves. That is far from tens of thousands of
+games per core. For that many all-AI games use the
+vectorized engine, batch.simulateBatch (about 15,000
+a second per core, needs numpy).
+"""
+
+from .game import Game
+from .ai import AI
+from .rng import DealRNG, gameKey
+from .config import DEFAULT_NUM_PLAYERS, NUM_DECKS, SIM_MAX_TURNS
+
+import random
+
+
+class GameResult(object):
+    """Constructor: The outcome of one simulated game
+    @param winner: Name of the winning player, None if the game was stopped
+    @param winner_seat: Seat (position in the shuffled turn order) of the winner
+    @param turns: Number of cards played during the game
+    @param eliminations: Seats of the eliminated players, in order
+    @param redistributions: How many times the cards were redistributed"""
+    def __init__(self, winner, winner_seat, turns, eliminations, redistributions):
+        self.winner = winner
+        self.winner_seat = winner_seat
+        self.turns = turns
+        self.eliminations = eliminations
+        self.redistributions = redistributions
+
+    def __repr__(self):
+        return "GameResult(winner={}, winner_seat={}, turns={}, eliminations={}, redistributions={})".format(
+            self.winner, self.winner_seat, self.turns, self.eliminations, self.redistributions)
+
+
+def defaultPlayer(seat, tokens):
+    """defaultPlayer: Player factory used when none is given
+    @param seat: Seat number of the player (before the turn order is shuffled)
+    @param tokens: Number of tokens it starts off with"""
+    return AI(name="AI{}".format(seat + 1), tokens=tokens)
+
+
+def playGame(game, max_turns=SIM_MAX_TURNS):
+    """playGame: Plays a started game until one player is left
+    and returns its GameResult
+    @param game: A Game that startGame has been called on
+    @param max_turns: The game is stopped with no winner after this many turns"""
+    eliminations = []
+    while not game.isGameOver():
+        if game.TURNS_TOTAL >= max_turns:
+            return GameResult(None, None, game.TURNS_TOTAL, eliminations, game.REDISTRIBUTIONS)
+        move = game.getCurrentPlayer().getMove(game.TOTAL, game.MAX)
+        if not game.playTurn(move[0], move[1]):
+            eliminated = game.handleNoMoves()
+            if eliminated is not None:
+                eliminations.append(eliminated.seat)
+
+    winner = game.PLAYERS[0]
+    return GameResult(winner.name, winner.seat, game.TURNS_TOTAL,
+                      eliminations, game.REDISTRIBUTIONS)
+
+
+def gameSeed(seed, index):
+    """gameSeed: Returns the key of game number index in the run
+    seeded with seed (rng.gameKey). Every game gets its own independent
+    key, so any range of games can be played on its own (in any process)
+    @param seed: Seed of the whole run
+    @param index: Game number within the run"""
+    return gameKey(seed, index)
+
+
+def roundDeck(game_key, round, n_decks=NUM_DECKS):
+    """roundDeck: The deck dealt from in one round of a game, worked out
+    on its own in O(1) (not counting the deck size). Returns a Deck, top
+    card first. Round 0 is the first deal, round r the deal after r
+    redistributions
+    @param game_key: The game's key, see gameSeed
+    @param round: Round index
+    @param n_decks: Decks in the shoe"""
+    game = Game(verbose=False, rng=DealRNG.fromGameKey(game_key, round))
+    game.NUM_DECKS = n_decks
+    game.generateDeck()
+    game.DECK.shuffle(game.RNG)
+    return game.DECK
+
+
+def playGames(n_games=None, n_players=DEFAULT_NUM_PLAYERS, seed=None, player_factory=defaultPlayer, start=0,
+              recorder=None, metrics=None):
+    """playGames: Plays headless games one after the other, yielding
+    the GameResult of each game as soon as it is over, so results can
+    be aggregated as they come and the run stopped at any point.
+    Takes the same parameters as simulate, n_games None plays until
+    the caller stops asking for results"""
+    if seed is None:
+        seed = random.getrandbits(64)
+    i = start
+    while n_games is None or i < start + n_games:
+        game_seed = gameSeed(seed, i)
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(game_seed), recorder=recorder, seed=game_seed,
+                    metrics=metrics)
+        game.startGame(players=[player_factory(seat, game.INITAL_TOKEN)
+                                for seat in range(n_players)])
+        yield playGame(game)
+        i += 1
+
+
+def simulate(n_games, n_players=DEFAULT_NUM_PLAYERS, seed=None, player_factory=defaultPlayer, start=0,
+             recorder=None, metrics=None):
+    """simulate: Plays n_games headless games and returns a list
+    of GameResult objects, one per game. About 1,000 games a second
+    per core, see batch.simulateBatch for bulk all-AI runs
+
+    @param n_games: Number of games to play
+    @param n_players: Number of players per game
+    @param seed: Seed of the run. The same seed always gives the same
+       results. None picks a random seed
+    @param player_factory: Function (seat, tokens) -> Player used to
+       create each seat. Defaults to the normal AI
+    @param start: Number of the first game. simulate(n, seed=s, start=k)
+       plays exactly games k..k+n-1 of the run seeded with s
+    @param recorder: Optional records.GameWriter to record every game to
+    @param metrics: Optional metrics.Metrics that every game is counted and timed in"""
+    return list(playGames(n_games, n_players, seed, player_factory, start, recorder, metrics))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+state.py
+
+A compact copy of a game's state, for AIs that
+search or simulate ahead. Cards are plain values
+1-13 (suits never matter to the rules), and the
+rules are the same as Game.playTurn and
+Game.handleNoMoves.
+
+Moves are made in place and can be taken back:
+applyMove and applyNoMoves return an undo record
+and undoMove reverts it, without copying the state.
+"""
+
+from .ai import tableMove
+from .config import NUM_DECKS
+from . import deck
+
+import random
+
+
+SHOE = deck.CARD_VALUES * NUM_DECKS  # Every card in the shoe, by value
+
+# How much each card adds to the total. Aces and 10s add
+# their selected value, a 9 sets the total to 99
+ADD_VALUES = [0] + [10 if v in [11, 12] else deck.TRUE_VALUES[v] for v in range(1, deck.NUM_VALUES + 1)]
+
+
+def legalMoves(hand, total, max_total=99):
+    """legalMoves: Every move that can be made from hand at total, as a
+    list of (card value, selected value). Empty if there are none
+    @param hand: Card values in the hand
+    @param total: The game total
+    @param max_total: Total cannot go over this number"""
+    moves = []
+    room = max_total - total
+    for value in set(hand):
+        if value == 1:
+            if room >= 1:
+                moves.append((1, 1))
+            if room >= 11:
+                moves.append((1, 11))
+        elif value == 10:
+            if room >= 10:
+                moves.append((10, 10))
+            moves.append((10, -10))
+        elif ADD_VALUES[value] <= room or value == 9:
+            moves.append((value, value))
+    return moves
+
+
+class NoMovesRecord(object):
+    """Constructor: Undo record of GameState.applyNoMoves
+    @param seat: Seat of the player who was stuck
+    @param turn: turn before the move
+    @param position: Their position in players if they were eliminated, else None
+    @param hands: The hands list before the cards were redistributed
+    @param deck: The deck before the cards were redistributed
+    @param pile: The pile before the cards were redistributed"""
+    __slots__ = ("seat", "turn", "position", "hands", "deck", "pile")
+
+    def __init__(self, seat, turn, position, hands, deck, pile):
+        self.seat = seat
+        self.turn = turn
+        self.position = position
+        self.hands = hands
+        self.deck = deck
+        self.pile = pile
+
+    def eliminated(self):
+        """eliminated: Was the player eliminated?"""
+        return self.position is not None
+
+
+class GameState(object):
+    """Constructor: Creates a game state
+    @param total: The game total (Game.TOTAL)
+    @param turn: Position of the current player in players (any number, it
+       is taken modulo the number of players)
+    @param turn_inc: Direction of play, 1 or -1 (SeatRing.direction)
+    @param players: Seats of the players still in, in seat order (Game.PLAYERS)
+    @param hands: Card values in each seat's hand, indexed by seat
+    @param tokens: Tokens of each seat, indexed by seat
+    @param deck: Card values in the deck, top card LAST
+    @param pile: Card values in the pile, last played card last
+    @param max_total: Total cannot go over this number (Game.MAX)
+    @param hand_size: Cards per player (Game.HAND_SIZE)
+    @param rng: Random number generator used for shuffles
+    @param shoe: Card values of every card in the game (Game.SHOE)"""
+    __slots__ = ("total", "turn", "turn_inc", "players", "hands", "tokens",
+                 "deck", "pile", "max_total", "hand_size", "rng", "shoe")
+
+    def __init__(self, total, turn, turn_inc, players, hands, tokens, deck, pile,
+                 max_total=99, hand_size=3, rng=random, shoe=SHOE):
+        self.total = total
+        self.turn = turn
+        self.turn_inc = turn_inc
+        self.players = players
+        self.hands = hands
+        self.tokens = tokens
+        self.deck = deck
+        self.pile = pile
+        self.max_total = max_total
+        self.hand_size = hand_size
+        self.rng = rng
+        self.shoe = shoe
+
+    @classmethod
+    def fromGame(cls, game, rng=random):
+        """fromGame: Copies the state of a started Game
+        @param game: The Game object
+        @param rng: Random number generator for the copy's shuffles"""
+        seats = max(player.seat for player in game.PLAYERS) + 1
+        hands = [[] for _ in range(seats)]
+        tokens = [0] * seats
+        for player in game.PLAYERS:
+            hands[player.seat] = [card.value for card in player.cards]
+            tokens[player.seat] = player.tokens
+        return cls(game.TOTAL, game.PLAYERS.position(), game.PLAYERS.direction,
+                   game.PLAYERS.seats(), hands, tokens,
+                   [card.value for card in game.DECK][::-1],
+                   [card.value for card in game.PILE],
+                   game.MAX, game.HAND_SIZE, rng, [card.value for card in game.SHOE])
+
+    def clone(self):
+        """clone: Returns an independent copy of the state"""
+        return GameState(self.total, self.turn, self.turn_inc, list(self.players),
+                         [list(hand) for hand in self.hands], list(self.tokens),
+                         list(self.deck), list(self.pile), self.max_total, self.hand_size, self.rng,
+                         self.shoe)
+
+    def currentSeat(self):
+        """currentSeat: Seat of the player whose turn it is"""
+        return self.players[self.turn % len(self.players)]
+
+    def isOver(self):
+        """isOver: Is there only one player left?"""
+        return len(self.players) == 1
+
+    def legalMoves(self):
+        """legalMoves: Every move the current player can make, as a
+        list of (card value, selected value). Empty if they are stuck"""
+        return legalMoves(self.hands[self.currentSeat()], self.total, self.max_total)
+
+    def heuristicMove(self):
+        """heuristicMove: The move the normal AI would make for the
+        current player, as (card value, selected value), or None"""
+        return tableMove(self.hands[self.currentSeat()], self.total, self.max_total)
+
+    def applyMove(self, value, selected_value=0):
+        """applyMove: The current player plays a card (Game.playTurn).
+        The move must be legal. Returns an undo record for undoMove
+        @param value: Value of the card to play
+        @param selected_value: Value selected for aces and 10s"""
+        n_players = len(self.players)
+        seat = self.players[self.turn % n_players]
+        hand = self.hands[seat]
+        index = hand.index(value)
+        record = (seat, index, self.total, self.turn, self.turn_inc, None)
+
+        if value == 4:
+            if n_players > 2:
+                self.turn_inc = -self.turn_inc
+        elif value == 3:
+            if n_players > 2:
+                self.turn += self.turn_inc
+        elif value == 9:
+            self.total = 99
+
+        if value == 1 or value == 10:
+            self.total += selected_value
+        else:
+            self.total += ADD_VALUES[value]
+        self.turn += self.turn_inc
+
+        del hand[index]
+        self.pile.append(value)
+        hand.append(self.deck.pop())
+
+        if not self.deck:  # Game.checkDeckSize
+            record = record[:5] + (list(self.pile),)  # Order of the pile before the shuffle
+            self.deck, self.pile = self.pile, self.deck
+            self.rng.shuffle(self.deck)
+        return record
+
+    def applyNoMoves(self):
+        """applyNoMoves: The current player is stuck (Game.handleNoMoves).
+        Returns an undo record for undoMove. The record's
+        eliminated() tells if the player was eliminated"""
+        seat = self.currentSeat()
+        record = NoMovesRecord(seat, self.turn, None, list(self.hands), self.deck, self.pile)
+        self.tokens[seat] -= 1
+        if self.tokens[seat] == 0:
+            # The turn passes to the next seat, now at the same position
+            record.position = self.turn % len(self.players)
+            del self.players[record.position]
+            self.hands[seat] = []
+            self.turn = record.position
+        else:
+            self.turn += 1
+        self.redistribute()
+        return record
+
+    def undoMove(self, record):
+        """undoMove: Takes back the move that returned record. Moves
+        must be taken back in the reverse order they were made
+        @param record: Undo record from applyMove or applyNoMoves"""
+        if isinstance(record, NoMovesRecord):
+            self.turn = record.turn
+            self.hands, self.deck, self.pile = record.hands, record.deck, record.pile
+            if record.position is not None:
+                self.players.insert(record.position, record.seat)
+            self.tokens[record.seat] += 1
+            return
+
+        seat, index, total, turn, turn_inc, pile = record
+        if pile is not None:  # Undo the reshuffle
+            self.deck, self.pile = self.pile, pile
+        hand = self.hands[seat]
+        self.deck.append(hand.pop())
+        hand.insert(index, self.pile.pop())
+        self.total, self.turn, self.turn_inc = total, turn, turn_inc
+
+    def redistribute(self):
+        """redistribute: Shuffles every card and deals new hands"""
+        self.deck = list(self.shoe)
+        self.rng.shuffle(self.deck)
+        self.pile = []
+        for seat in self.players:
+            self.hands[seat] = [self.deck.pop() for _ in range(self.hand_size)]
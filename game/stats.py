@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+stats.py
+
+Streaming statistics of simulated games. Results are
+added one at a time as the games finish and nothing
+is stored per game: mean and variance are updated
+online (Welford), game length quantiles come from P²
+sketches (5 markers each) and wins are counted by
+seat, so memory doesn't grow with the number of games.
+
+Instead of guessing how many games a question needs,
+runUntil keeps playing until the confidence intervals
+asked for are narrow enough, and reports how many of
+the allowed games it didn't need to play.
+
+Usage: python -m game.stats --width W [--players N] [--max-games N]
+                            [--turns-width T] [--seed S]
+"""
+
+from .simulate import playGames, defaultPlayer
+from .config import DEFAULT_NUM_PLAYERS, STATS_CONFIDENCE, STATS_MIN_GAMES, STATS_QUANTILES
+
+import argparse
+import bisect
+import statistics
+
+
+def zScore(confidence):
+    """zScore: Number of standard deviations a two sided normal
+    confidence interval spans on each side, 1.96 for 0.95"""
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilsonInterval(successes, trials, z):
+    """wilsonInterval: Wilson score interval (low, high) of a proportion.
+    Unlike the plain normal interval it stays inside [0, 1] and is
+    still sensible when the proportion is close to 0 or 1"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half = z * (p * (1 - p) / trials + z * z / (4 * trials * trials)) ** 0.5 / denominator
+    return max(centre - half, 0.0), min(centre + half, 1.0)
+
+
+class RunningStats(object):
+    """Constructor: Creates an empty running mean and variance. Values
+    are added with Welford's method, which doesn't lose precision the
+    way summing squares does on long runs"""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        """add: Adds one value, O(1)"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        """merge: Adds another RunningStats' values to this one (Chan et al.)"""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+    def variance(self):
+        """variance: Sample variance, 0 with fewer than 2 values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        """std: Sample standard deviation"""
+        return self.variance() ** 0.5
+
+    def interval(self, z):
+        """interval: Normal confidence interval (low, high) of the mean
+        @param z: See zScore"""
+        if self.count < 2:
+            return float("-inf"), float("inf")
+        half = z * (self.variance() / self.count) ** 0.5
+        return self.mean - half, self.mean + half
+
+
+class P2Quantile(object):
+    """Constructor: Estimates a quantile of a stream of values with the
+    P² algorithm (Jain and Chlamtac, 1985). Only 5 markers are kept,
+    their heights are moved with a parabolic fit as values come in
+    @param q: The quantile, e.g. 0.9"""
+    def __init__(self, q):
+        self.q = q
+        self.count = 0
+        self.heights = []  # The first 5 values (sorted), then the marker heights
+        self.positions = [1, 2, 3, 4, 5]  # Actual marker positions
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]  # Wanted marker positions
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        """add: Adds one value, O(1)"""
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            bisect.insort(heights, x)
+            return
+
+        # Find the cell x falls in, stretching the extreme markers if needed
+        if x < heights[0]:
+            heights[0] = x
+            cell = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            cell = 3
+        else:
+            cell = bisect.bisect_right(heights, x) - 1
+        positions = self.positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers that are off their desired position by a step or more
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / \
+                        (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        """Height of marker i moved by step, from a parabola through its neighbours"""
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        """value: The estimate, exact while there are 5 values or fewer.
+        None if there are none"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.heights[min(int(self.q * self.count), self.count - 1)]
+        return self.heights[2]
+
+
+class StreamingStats(object):
+    """Constructor: Creates empty statistics of games of n_players
+    @param n_players: Number of players per game
+    @param confidence: Confidence level of the intervals
+    @param quantiles: Game length quantiles to track"""
+    def __init__(self, n_players, confidence=STATS_CONFIDENCE, quantiles=STATS_QUANTILES):
+        self.n_players = n_players
+        self.confidence = confidence
+        self.z = zScore(confidence)
+        self.games = 0
+        self.unfinished = 0  # Games stopped with no winner
+        self.wins = [0] * n_players  # Wins by seat
+        self.eliminations = [0] * n_players  # Eliminations by seat
+        self.turns = RunningStats()
+        self.redistributions = RunningStats()
+        self.quantiles = [P2Quantile(q) for q in quantiles]
+
+    def addResult(self, result):
+        """addResult: Adds a single GameResult, O(players + quantiles)"""
+        self.games += 1
+        if result.winner_seat is None:
+            self.unfinished += 1
+        else:
+            self.wins[result.winner_seat] += 1
+        for seat in result.eliminations:
+            self.eliminations[seat] += 1
+        self.turns.add(result.turns)
+        self.redistributions.add(result.redistributions)
+        for quantile in self.quantiles:
+            quantile.add(result.turns)
+
+    def winRates(self):
+        """winRates: Fraction of games won by each seat"""
+        return [wins / self.games if self.games else 0.0 for wins in self.wins]
+
+    def winIntervals(self):
+        """winIntervals: Confidence interval (low, high) of each seat's win rate"""
+        return [wilsonInterval(wins, self.games, self.z) for wins in self.wins]
+
+    def winWidth(self):
+        """winWidth: Width of the widest win rate interval"""
+        return max(high - low for low, high in self.winIntervals())
+
+    def turnsWidth(self):
+        """turnsWidth: Width of the interval of the mean game length, in turns"""
+        low, high = self.turns.interval(self.z)
+        return high - low
+
+    def isPrecise(self, width, turns_width=None, min_games=STATS_MIN_GAMES):
+        """isPrecise: Are the intervals narrow enough to stop?
+        @param width: Widest a seat's win rate interval may be (0.02 is +-1%)
+        @param turns_width: Widest the mean game length interval may be, in
+           turns. None doesn't look at it
+        @param min_games: Never precise before this many games"""
+        if self.games < min_games:
+            return False
+        if turns_width is not None and self.turnsWidth() > turns_width:
+            return False
+        return self.winWidth() <= width
+
+    def asDict(self):
+        """asDict: The statistics as plain data (for json.dump)"""
+        return {
+            "games": self.games,
+            "players": self.n_players,
+            "confidence": self.confidence,
+            "unfinished": self.unfinished,
+            "win_rate_by_seat": self.winRates(),
+            "win_interval_by_seat": [list(interval) for interval in self.winIntervals()],
+            "eliminations_by_seat": list(self.eliminations),
+            "turns_mean": self.turns.mean,
+            "turns_std": self.turns.std(),
+            "turns_interval": list(self.turns.interval(self.z)),
+            "turns_min": self.turns.min,
+            "turns_max": self.turns.max,
+            "turns_quantiles": dict((str(quantile.q), quantile.value()) for quantile in self.quantiles),
+            "redistributions_mean": self.redistributions.mean,
+        }
+
+    def __str__(self):
+        seats = "\n".join(
+            "      [Seat {}] Win rate: {:.4f}  ({:.4f} - {:.4f})  Eliminated: {}".format(
+                seat, rate, low, high, self.eliminations[seat])
+            for seat, (rate, (low, high)) in enumerate(zip(self.winRates(), self.winIntervals())))
+        low, high = self.turns.interval(self.z)
+        quantiles = ", ".join("p{:g} {:.0f}".format(100 * quantile.q, quantile.value() or 0)
+                              for quantile in self.quantiles)
+        return """
+            -- Simulation Statistics --
+        Games played:       {}
+        Players per game:   {}
+        Unfinished games:   {}
+        Confidence:         {:.0%}
+{}
+
+        Game length:        {:.2f} turns ({:.2f} - {:.2f}, std {:.2f})
+        Length quantiles:   {}
+        Redistributions:    {:.2f} per game
+        """.format(self.games, self.n_players, self.unfinished, self.confidence, seats,
+                   self.turns.mean, low, high, self.turns.std(), quantiles, self.redistributions.mean)
+
+
+class RunReport(object):
+    """Constructor: The outcome of runUntil
+    @param stats: StreamingStats of the games played
+    @param max_games: Most games the run was allowed to play
+    @param precise: Did the intervals get narrow enough before max_games?"""
+    def __init__(self, stats, max_games, precise):
+        self.stats = stats
+        self.max_games = max_games
+        self.precise = precise
+
+    def gamesSaved(self):
+        """gamesSaved: Allowed games that didn't have to be played"""
+        return self.max_games - self.stats.games
+
+    def asDict(self):
+        """asDict: The report as plain data (for json.dump)"""
+        return dict(self.stats.asDict(), max_games=self.max_games, precise=self.precise,
+                    games_saved=self.gamesSaved())
+
+    def __str__(self):
+        if self.precise:
+            outcome = "Precise enough after {} of {} games, {} games saved ({:.1%})".format(
+                self.stats.games, self.max_games, self.gamesSaved(), self.gamesSaved() / self.max_games)
+        else:
+            outcome = "Not precise enough after all {} games".format(self.max_games)
+        return "{}\n        {}\n".format(self.stats, outcome)
+
+
+def runUntil(width, n_players=DEFAULT_NUM_PLAYERS, max_games=100000, seed=None, turns_width=None,
+             confidence=STATS_CONFIDENCE, min_games=STATS_MIN_GAMES, player_factory=defaultPlayer):
+    """runUntil: Plays simulated games until every seat's win rate is
+    known to within width (and the mean game length to within
+    turns_width, if given), or max_games have been played. Returns a
+    RunReport. The intervals are checked after every game, which is
+    cheap next to playing one
+
+    @param width: Widest a seat's win rate interval may be (0.02 is +-1%)
+    @param n_players: Number of players per game
+    @param max_games: Most games to play
+    @param seed: Seed of the run. The same seed always stops at the same game
+    @param turns_width: Widest the mean game length interval may be, in turns
+    @param confidence: Confidence level of the intervals
+    @param min_games: Games always played before checking the intervals
+    @param player_factory: Function (seat, tokens) -> Player used to create each seat"""
+    stats = StreamingStats(n_players, confidence)
+    for result in playGames(max_games, n_players, seed, player_factory):
+        stats.addResult(result)
+        if stats.isPrecise(width, turns_width, min_games):
+            return RunReport(stats, max_games, True)
+    return RunReport(stats, max_games, stats.isPrecise(width, turns_width, min_games))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate games until the statistics are precise enough")
+    parser.add_argument("--width", type=float, required=True,
+                        help="Widest a seat's win rate confidence interval may be (0.02 is +-1%%)")
+    parser.add_argument("--turns-width", type=float, default=None,
+                        help="Widest the mean game length confidence interval may be, in turns")
+    parser.add_argument("--players", type=int, default=DEFAULT_NUM_PLAYERS, help="Players per game")
+    parser.add_argument("--max-games", type=int, default=100000, help="Most games to play")
+    parser.add_argument("--confidence", type=float, default=STATS_CONFIDENCE, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the run")
+    args = parser.parse_args()
+
+    print(runUntil(args.width, args.players, args.max_games, args.seed, args.turns_width, args.confidence))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+tournament.py
+
+Runs large numbers of simulated games across all
+CPU cores. The games are split into fixed size shards,
+each shard is played by a worker process and the partial
+results are merged into one TournamentReport.
+
+Usage: python -m game.tournament GAMES [--players N] [--seed S] [--workers W]
+"""
+
+from .simulate import simulate, defaultPlayer
+from .config import DEFAULT_NUM_PLAYERS
+
+import argparse
+import multiprocessing
+import random
+
+
+SHARD_SIZE = 5000  # Games per unit of work handed to a worker
+
+
+class TournamentReport(object):
+    """Constructor: Creates an empty report
+    @param n_players: Number of players per game"""
+    def __init__(self, n_players):
+        self.n_players = n_players
+        self.games = 0
+        self.unfinished = 0  # Games stopped with no winner
+        self.wins = [0] * n_players  # Wins by seat
+        self.eliminations = [0] * n_players  # Eliminations by seat
+        self.turns_total = 0
+        self.turns_squared = 0
+        self.turns_min = None
+        self.turns_max = None
+        self.redistributions = 0
+
+    def addResult(self, result):
+        """addResult: Adds a single GameResult to the report"""
+        self.games += 1
+        if result.winner_seat is None:
+            self.unfinished += 1
+        else:
+            self.wins[result.winner_seat] += 1
+        for seat in result.eliminations:
+            self.eliminations[seat] += 1
+        self.turns_total += result.turns
+        self.turns_squared += result.turns * result.turns
+        if self.turns_min is None or result.turns < self.turns_min:
+            self.turns_min = result.turns
+        if self.turns_max is None or result.turns > self.turns_max:
+            self.turns_max = result.turns
+        self.redistributions += result.redistributions
+
+    def merge(self, other):
+        """merge: Adds the results of another report to this one
+        @param other: TournamentReport with the same number of players"""
+        if other.games == 0:
+            return
+        self.games += other.games
+        self.unfinished += other.unfinished
+        for seat in range(self.n_players):
+            self.wins[seat] += other.wins[seat]
+            self.eliminations[seat] += other.eliminations[seat]
+        self.turns_total += other.turns_total
+        self.turns_squared += other.turns_squared
+        if self.turns_min is None or other.turns_min < self.turns_min:
+            self.turns_min = other.turns_min
+        if self.turns_max is None or other.turns_max > self.turns_max:
+            self.turns_max = other.turns_max
+        self.redistributions += other.redistributions
+
+    def winRates(self):
+        """winRates: Fraction of games won by each seat"""
+        return [wins / self.games if self.games else 0.0 for wins in self.wins]
+
+    def meanTurns(self):
+        """meanTurns: Average game length in turns"""
+        return self.turns_total / self.games if self.games else 0.0
+
+    def stdTurns(self):
+        """stdTurns: Standard deviation of the game length in turns"""
+        if self.games < 2:
+            return 0.0
+        mean = self.meanTurns()
+        variance = (self.turns_squared - self.games * mean * mean) / (self.games - 1)
+        return max(variance, 0.0) ** 0.5
+
+    def asDict(self):
+        """asDict: The report as plain data (for json.dump)"""
+        return {
+            "games": self.games,
+            "players": self.n_players,
+            "unfinished": self.unfinished,
+            "win_rate_by_seat": self.winRates(),
+            "eliminations_by_seat": list(self.eliminations),
+            "turns_mean": self.meanTurns(),
+            "turns_std": self.stdTurns(),
+            "turns_min": self.turns_min,
+            "turns_max": self.turns_max,
+            "redistributions_mean": self.redistributions / self.games if self.games else 0.0,
+        }
+
+    def __str__(self):
+        seats = "\n".join(
+            "      [Seat {}] Win rate: {:.4f}  Eliminated: {}".format(seat, rate, self.eliminations[seat])
+            for seat, rate in enumerate(self.winRates()))
+        return """
+            -- Tournament Report --
+        Games played:       {}
+        Players per game:   {}
+        Unfinished games:   {}
+{}
+
+        Game length:        {:.2f} turns (std {:.2f}, min {}, max {})
+        Redistributions:    {:.2f} per game
+        """.format(self.games, self.n_players, self.unfinished, seats, self.meanTurns(), self.stdTurns(),
+                   self.turns_min, self.turns_max,
+                   self.redistributions / self.games if self.games else 0.0)
+
+
+def runShard(shard):
+    """runShard: Plays one shard of games and returns its TournamentReport.
+    Runs inside a worker process
+    @param shard: Tuple (seed, start, count, n_players, player_factory)"""
+    seed, start, count, n_players, player_factory = shard
+    report = TournamentReport(n_players)
+    for result in simulate(count, n_players, seed, player_factory, start):
+        report.addResult(result)
+    return report
+
+
+def makeShards(n_games, n_players, seed, player_factory, shard_size=SHARD_SIZE):
+    """makeShards: Splits games 0..n_games-1 into shards. Shards only
+    depend on the game numbers, so the merged report is the same no
+    matter how many workers play them"""
+    return [(seed, start, min(shard_size, n_games - start), n_players, player_factory)
+            for start in range(0, n_games, shard_size)]
+
+
+def runTournament(n_games, n_players=DEFAULT_NUM_PLAYERS, seed=None, workers=None,
+                  player_factory=defaultPlayer, shard_size=SHARD_SIZE):
+    """runTournament: Plays n_games games on a pool of worker processes
+    and returns the merged TournamentReport
+
+    @param n_games: Number of games to play
+    @param n_players: Number of players per game
+    @param seed: Seed of the run. The same seed always gives the same report
+    @param workers: Number of worker processes. Defaults to one per CPU core
+    @param player_factory: Function (seat, tokens) -> Player, must be a module
+       level function so it can be sent to the workers
+    @param shard_size: Games per shard"""
+    if seed is None:
+        seed = random.getrandbits(64)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    shards = makeShards(n_games, n_players, seed, player_factory, shard_size)
+    report = TournamentReport(n_players)
+
+    if workers <= 1 or len(shards) <= 1:
+        for shard in shards:
+            report.merge(runShard(shard))
+        return report
+
+    with multiprocessing.Pool(min(workers, len(shards))) as pool:
+        for partial in pool.imap_unordered(runShard, shards):
+            report.merge(partial)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play simulated games on all CPU cores")
+    parser.add_argument("games", type=int, help="Number of games to play")
+    parser.add_argument("--players", type=int, default=DEFAULT_NUM_PLAYERS, help="Players per game")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the run")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    print(runTournament(args.games, args.players, args.seed, args.workers))
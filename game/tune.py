@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# # -*- coding: utf-8 -*-
+
+"""
+tune.py
+
+Searches for better AI profiles (ai.AIProfile) with
+an evolution strategy: the best profiles of each
+generation (the elites) survive, the rest of the
+population are mutated crossovers of them.
+
+A profile's fitness is its win rate against default
+AIs. Every candidate plays the same deals from the
+same seats (common random numbers), so candidates
+are told apart by how they play rather than by the
+luck of their deals, with far fewer games. Games are
+played across all cores in shards, by the batch
+engine (batch.py) when numpy is installed and by the
+object engine otherwise, and fitness is cached by the
+profile's parameters, so a profile that comes up
+again (an elite, a repeated mutation) is never played
+twice.
+
+The best profiles are then played on deals none of
+them were picked on (holdout deals) and saved as JSON
+that ai.loadProfiles, and the arena, can load.
+
+Usage: python -m game.tune [--generations N] [--population N] [--games N] [--players N]
+                           [--seed S] [--workers W] [--output FILE]
+"""
+
+from .game import Game
+from .ai import AI, AIProfile, DEFAULT_PROFILE, BRANCHES, saveProfiles
+from .simulate import playGame, gameSeed
+from .rng import DealRNG
+from .config import (DEFAULT_NUM_PLAYERS, TUNE_GAMES, TUNE_POPULATION, TUNE_ELITES, TUNE_GENERATIONS,
+                     TUNE_SHARD_SIZE, TUNE_BATCH_SHARD_SIZE)
+
+import argparse
+import multiprocessing
+import random
+import sys
+
+try:
+    from .batch import simulateBatch
+except ImportError:  # No numpy, games are played by the object engine
+    simulateBatch = None
+
+
+CANDIDATE = "Candidate"  # Name of the profile being evaluated in its games
+TUNED_GROUPS = ("useless_cards", "small_cards", "last_ditch_effort", "most_valuable", "plus_10")  # Mutated groups
+SMALL_THRESHOLD_RANGE = (60, 98)
+
+
+# -- Evaluation -- #
+def evaluateShard(shard):
+    """evaluateShard: Plays games start..start+count-1 of the deals seeded
+    with seed, with the candidate profile against default AIs, and
+    returns (profile key, wins). Runs inside a worker process. The
+    candidate moves round the seats from one game to the next
+    @param shard: Tuple (profile, seed, start, count, n_players)"""
+    profile, seed, start, count, n_players = shard
+    if simulateBatch is not None:
+        # Rotated, the candidate (the first profile) sits in seat game % n_players
+        results = simulateBatch(count, n_players, seed, profiles=[profile] + [DEFAULT_PROFILE] * (n_players - 1),
+                                rotate=True, start=start)
+        return profile.key(), sum(1 for i, seat in enumerate(results.winner_seat.tolist())
+                                  if seat == (start + i) % n_players)
+
+    wins = 0
+    for i in range(start, start + count):
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(gameSeed(seed, i)))
+        candidate = i % n_players
+        game.startGame(players=[AI(CANDIDATE, game.INITAL_TOKEN, profile=profile) if seat == candidate
+                                else AI("AI{}".format(seat + 1), game.INITAL_TOKEN)
+                                for seat in range(n_players)])
+        if playGame(game).winner == CANDIDATE:
+            wins += 1
+    return profile.key(), wins
+
+
+# -- Variation -- #
+def mutate(profile, rng, name, hand_size=3):
+    """mutate: A copy of profile, called name, with one to three random
+    changes: a card value moved in or out of a group, two branches
+    swapped, the small card threshold moved or the 99 strategy's card
+    count changed"""
+    data = profile.asDict()
+    data["name"] = name
+    for _ in range(rng.randint(1, 3)):
+        change = rng.randrange(4)
+        if change == 0:
+            group, value = rng.choice(TUNED_GROUPS), rng.randint(1, 13)
+            if value in data[group]:
+                data[group].remove(value)
+            else:
+                data[group].append(value)
+        elif change == 1:
+            i, j = rng.sample(range(len(BRANCHES)), 2)
+            data["order"][i], data["order"][j] = data["order"][j], data["order"][i]
+        elif change == 2:
+            data["small_threshold"] = min(max(data["small_threshold"] + rng.randint(-5, 5),
+                                              SMALL_THRESHOLD_RANGE[0]), SMALL_THRESHOLD_RANGE[1])
+        else:
+            data["ninety_nine_count"] = rng.randint(1, hand_size)
+    return AIProfile.fromDict(data)
+
+
+def crossover(first, second, rng, name):
+    """crossover: A profile, called name, taking each parameter (each
+    card group, the branch order, ...) from one of two parents at random"""
+    a, b = first.asDict(), second.asDict()
+    data = dict((key, a[key] if rng.random() < 0.5 else b[key]) for key in a)
+    data["name"] = name
+    return AIProfile.fromDict(data)
+
+
+# -- Search -- #
+class Tuner(object):
+    """Constructor: Creates a tuner, the first population is the default
+    profile and mutations of it
+    @param n_players: Players per game, the candidate and default AIs
+    @param n_games: Deals each candidate is played on
+    @param population: Profiles per generation
+    @param elites: Best profiles kept from one generation to the next
+    @param seed: Seed of the search and of the deals
+    @param workers: Number of worker processes. Defaults to one per CPU core"""
+    def __init__(self, n_players=DEFAULT_NUM_PLAYERS, n_games=TUNE_GAMES, population=TUNE_POPULATION,
+                 elites=TUNE_ELITES, seed=None, workers=None):
+        self.n_players = n_players
+        self.n_games = n_games
+        self.population_size = population
+        self.elites = elites
+        self.rng = random.Random(seed)
+        self.deal_seed = self.rng.getrandbits(64)  # Every candidate plays these deals
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.hand_size = Game(verbose=False).HAND_SIZE
+
+        self.fitness = {}  # Profile key -> wins on the deals
+        self.evaluated = 0  # Profiles played
+        self.cache_hits = 0  # Profiles whose fitness was already known
+        self.generation = 0
+        self.population = [DEFAULT_PROFILE] + [mutate(DEFAULT_PROFILE, self.rng, self.newName(), self.hand_size)
+                                               for _ in range(population - 1)]
+
+    def newName(self):
+        """newName: A name for a new profile, after its generation"""
+        return "tuned-{}-{:06x}".format(self.generation, self.rng.getrandbits(24))
+
+    def shards(self, profile, seed, n_games):
+        """shards: The units of work playing profile on n_games deals"""
+        size = TUNE_BATCH_SHARD_SIZE if simulateBatch is not None else TUNE_SHARD_SIZE
+        return [(profile, seed, start, min(size, n_games - start), self.n_players)
+                for start in range(0, n_games, size)]
+
+    def play(self, profiles, seed, n_games, pool=None):
+        """play: Plays each profile on the same n_games deals and returns
+        a dict profile key -> wins"""
+        shards = [shard for profile in profiles for shard in self.shards(profile, seed, n_games)]
+        wins = dict((profile.key(), 0) for profile in profiles)
+        results = map(evaluateShard, shards) if pool is None else pool.imap_unordered(evaluateShard, shards)
+        for key, shard_wins in results:
+            wins[key] += shard_wins
+        return wins
+
+    def evaluate(self, pool=None):
+        """evaluate: Works out the fitness of every profile of the
+        population that isn't cached yet, in one batch of shards"""
+        new = {}
+        for profile in self.population:
+            key = profile.key()
+            if key in self.fitness or key in new:
+                self.cache_hits += 1
+            else:
+                new[key] = profile
+        self.fitness.update(self.play(list(new.values()), self.deal_seed, self.n_games, pool))
+        self.evaluated += len(new)
+
+    def winRate(self, profile):
+        """winRate: Fraction of its deals a profile won, None if not played yet"""
+        wins = self.fitness.get(profile.key())
+        return None if wins is None else wins / self.n_games
+
+    def ranked(self):
+        """ranked: The population's distinct profiles, best first"""
+        unique = dict((profile.key(), profile) for profile in reversed(self.population))
+        return sorted(unique.values(), key=lambda profile: -self.fitness[profile.key()])
+
+    def step(self, pool=None):
+        """step: Evaluates the population and breeds the next generation.
+        Returns the best profile of the evaluated generation"""
+        self.evaluate(pool)
+        ranked = self.ranked()
+        elites = ranked[:self.elites]
+        self.generation += 1
+        children = []
+        while len(elites) + len(children) < self.population_size:
+            child = crossover(self.rng.choice(elites), self.rng.choice(elites), self.rng, "")
+            children.append(mutate(child, self.rng, self.newName(), self.hand_size))
+        self.population = elites + children
+        return ranked[0]
+
+    def run(self, generations=TUNE_GENERATIONS, top=3, out=sys.stdout):
+        """run: Runs the search and returns the top profiles as a list of
+        (profile, win rate, holdout win rate), best first. The holdout
+        win rate is measured on deals the search never played
+        @param generations: Generations to breed
+        @param top: Number of profiles to return
+        @param out: Progress is printed here, None for no output"""
+        pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        try:
+            for _ in range(generations):
+                best = self.step(pool)
+                if out is not None:
+                    out.write("Generation {:>3}: best {:.4f} ({}), default {:.4f}, {} played, {} cached\n".format(
+                        self.generation, self.winRate(best), best.name, self.winRate(DEFAULT_PROFILE),
+                        self.evaluated, self.cache_hits))
+                    out.flush()
+            self.evaluate(pool)
+            best = self.ranked()[:top]
+            if DEFAULT_PROFILE not in best:
+                best.append(DEFAULT_PROFILE)  # Holdout baseline
+            holdout = self.play(best, self.deal_seed + 1, self.n_games, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return [(profile, self.winRate(profile), holdout[profile.key()] / self.n_games) for profile in best]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the AI's strategy with an evolution strategy")
+    parser.add_argument("--generations", type=int, default=TUNE_GENERATIONS, help="Generations to breed")
+    parser.add_argument("--population", type=int, default=TUNE_POPULATION, help="Profiles per generation")
+    parser.add_argument("--elites", type=int, default=TUNE_ELITES, help="Profiles kept between generations")
+    parser.add_argument("--games", type=int, default=TUNE_GAMES, help="Deals each profile is played on")
+    parser.add_argument("--players", type=int, default=DEFAULT_NUM_PLAYERS, help="Players per game")
+    parser.add_argument("--top", type=int, default=3, help="Number of profiles to save")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the search")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--output", "-o", default="profiles.json", help="Save the best profiles to this file")
+    args = parser.parse_args()
+
+    tuner = Tuner(args.players, args.games, args.population, args.elites, args.seed, args.workers)
+    results = tuner.run(args.generations, args.top)
+    for profile, rate, holdout in results:
+        print("{:<20} win rate {:.4f}, holdout {:.4f}".format(profile.name, rate, holdout))
+    saveProfiles(args.output, [profile for profile, _, _ in results],
+                 [{"win_rate": rate, "holdout_win_rate": holdout, "games": args.games, "players": args.players}
+                  for _, rate, holdout in results])
+    print("Saved {} profiles to {}".format(len(results), args.output))
@@ -7,7 +7,7 @@ util.py
 Helpful utility functions
 """
 
-from config import DEBUG, CHAR_DELAY
+from .config import DEBUG, CHAR_DELAY
 import time
 
 def printIfDebug(args):
@@ -13,62 +13,92 @@ Python Version: 3.6
 from game import game
 from game import config
 from game import command
-import time
+from game import records
+from game import renderer
+from game import metrics
+
+import json
 
 Game = game.Game
-global CURRENT_GAME
+GameWriter = records.GameWriter
+PacedRenderer = renderer.PacedRenderer
+Metrics = metrics.Metrics
+CURRENT_GAME = None  # Game being played, for the stats and metrics commands
 
-def startGame(n=config.DEFAULT_NUM_PLAYERS):
-    """Plays a game with n players"""
+def startGame(n=config.DEFAULT_NUM_PLAYERS, record_file=None):
+    """Plays a game with n players, optionally recording it to record_file"""
 
     n = int(n)
-    if n < 2 or n > config.DECK_SIZE / 3: # Invalid player number
+    max_players = int(config.DECK_SIZE * config.NUM_DECKS / 3)
+    if n < 2 or n > max_players: # Invalid player number
         print("     Invalid number of players. The number of players should")
-        print("     be between 2 and {}".format(int(config.DECK_SIZE/3)))
+        print("     be between 2 and {}".format(max_players))
         return False
 
-    game = Game()
+    recorder = GameWriter(record_file) if record_file is not None else None
+    paced = PacedRenderer()  # Plays the game back at human speed
+    game = Game(verbose=False, recorder=recorder,
+                metrics=Metrics() if config.COLLECT_METRICS else None)
+    game.EVENTS.subscribe(paced)
     game.startGame(n)
-    print("")
 
     while True:
         global CURRENT_GAME
         CURRENT_GAME = game
 
-        # Prompt the current player for a move
-        move = game.getCurrentPlayer().getMove(game.TOTAL, game.MAX)
+        # Prompt the current player for a move. AIs move right
+        # away, a human waits until the renderer has caught up
+        player = game.getCurrentPlayer()
+        if player.getType() == "human":
+            paced.waitIdle(skip_on_enter=True)
+        move = player.getMove(game.TOTAL, game.MAX)
         move_allowed = game.playTurn(move[0], move[1])
 
         if not move_allowed:  # Player can't make a move at all
-            game.getCurrentPlayer().tokens -= 1
-            if game.getCurrentPlayer().tokens == 0:
-                game.killCurrentPlayer()
-
-            print("\nNO POSSIBLE MOVES, REDISTRIBUTING ALL CARDS\n")
-            game.redistributeCards()
-            game.TURN += 1  # Game doesn't increment turn if move fails
-
-        print("")
+            game.handleNoMoves()
 
-        if len(game.PLAYERS) == 1:
+        if game.isGameOver():
+            paced.waitIdle(skip_on_enter=True)
             print("WINNER! {}".format(game.getCurrentPlayer()))
             break
 
-        time.sleep(config.AI_TURN_DELAY)
+    paced.close()
+    if recorder is not None:
+        recorder.close()
 
 def gameStats():
-    global CURRENT_GAME
+    if CURRENT_GAME is None:
+        print("     No game has been started")
+        return
     print(CURRENT_GAME)
     CURRENT_GAME.displayStats()
 
-command.addCommand(
-    command.Command("stats", "stats - Display current game stats.", gameStats))
-command.addCommand(
-    command.Command("start", "start [players=4] - Start a game with n players.", startGame))
+def gameMetrics(path=None):
+    """Prints the current game's metrics as JSON, or saves them to path"""
+    if CURRENT_GAME is None:
+        print("     No game has been started")
+    elif CURRENT_GAME.METRICS is None:
+        print("     Metrics are turned off (COLLECT_METRICS in config.py)")
+    elif path is None:
+        print(json.dumps(CURRENT_GAME.METRICS.snapshot(), indent=2))
+    else:
+        CURRENT_GAME.METRICS.export(path)
+        print("     Saved the metrics to {}".format(path))
+
+def addCommands():
+    """Adds the game commands to the console (importing main.py doesn't)"""
+    command.addCommand(
+        command.Command("stats", "stats - Display current game stats.", gameStats))
+    command.addCommand(
+        command.Command("metrics", "metrics [file] - Print the current game's metrics as JSON, or save them to file.",
+                        gameMetrics))
+    command.addCommand(
+        command.Command("start", "start [players=4] [record_file] - Start a game with n players, optionally recording it.", startGame))
 
 
 # Run the actual game
 if __name__ == "__main__":
+    addCommands()
     print(config.TITLE)
 
     while True:
@@ -0,0 +1,61 @@
+"""Tests of the AI's fast paths (game/ai.py): the mask decisions and the
+profile's cached decisions must make the same moves as getHeuristicMove"""
+
+import random
+
+import pytest
+
+from game.ai import AI, AIProfile, BRANCHES, DEFAULT_PROFILE, buildDecisionTable, tableMove, verifyDecisionTable
+from game.deck import Card
+from game.game import Game
+from game.rng import DealRNG
+from game.simulate import playGame
+from game.tune import mutate
+
+
+def test_mask_decisions_match_heuristic():
+    rng = random.Random(2)
+    profiles = [DEFAULT_PROFILE] + [mutate(DEFAULT_PROFILE, rng, "mutant{}".format(i)) for i in range(5)]
+    for i in range(60):
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(i))
+        n_players = 2 + i % 3
+        # verify asserts every move against getHeuristicMove
+        game.startGame(players=[AI("AI{}".format(seat), game.INITAL_TOKEN, verify=True,
+                                   profile=profiles[(i + seat) % len(profiles)])
+                                for seat in range(n_players)])
+        playGame(game)
+
+
+@pytest.mark.parametrize("group, branch", [("useless_cards", "useless"), ("small_cards", "small"),
+                                           ("plus_10", "plus_10"), ("most_valuable", "valuable")])
+def test_a_ten_in_any_group_is_played_as_minus_ten_when_plus_ten_does_not_fit(group, branch):
+    data = DEFAULT_PROFILE.asDict()
+    data[group] = data[group] + [10]
+    data["order"] = [branch] + [other for other in BRANCHES if other != branch]  # The group's branch decides
+    profile = AIProfile.fromDict(data)
+    game = Game(verbose=False, rng=random.Random(0))
+    game.startGame(players=[AI("AI{}".format(seat), game.INITAL_TOKEN, verify=True, profile=profile)
+                            for seat in range(2)])
+    player = game.getCurrentPlayer()
+    player.cards.removeAllCards()
+    for value in (10, 2, 2):
+        player.cards.addCard(Card(value, "clubs"))
+    game.TOTAL = 95
+    move = player.getMove(game.TOTAL, game.MAX)
+    assert move == [0, -10]
+    assert tableMove([10, 2, 2], 95, 99, profile) == (10, -10)
+    assert game.playTurn(*move) and game.TOTAL == 85
+
+
+def test_decision_table_matches_heuristic():
+    for max_total in (99, 50):
+        assert len(buildDecisionTable(max_total)) > 0
+        assert verifyDecisionTable(max_total) == 0
+
+
+def test_table_moves_share_the_profiles_cache():
+    profile = AIProfile(small_threshold=80, order=("small", "useless", "ninety_nine", "plus_10",
+                                                   "king", "ten", "valuable", "any"))
+    assert tableMove([2, 5, 13], 85, 99, profile) == (2, 2)
+    assert len(profile.decisions) == 1
+    assert verifyDecisionTable(99, profile=profile) == 0
@@ -0,0 +1,78 @@
+"""Tests of the arena's ratings and match scheduling (game/arena.py)"""
+
+import pytest
+
+from game.arena import Arena, Entrant, Rating, finishOrder, pairwiseOutcomes, updateRatings
+from game.config import ARENA_MIN_RD
+
+
+def test_glicko_update_matches_glickmans_example():
+    # The worked example of Glickman's "The Glicko system"
+    ratings = {"player": Rating(1500, 200), "a": Rating(1400, 30), "b": Rating(1550, 100),
+               "c": Rating(1700, 300)}
+    updateRatings(ratings, [("player", "a", 1.0), ("player", "b", 0.0), ("player", "c", 0.0)])
+    assert ratings["player"].rating == pytest.approx(1464.1, abs=0.1)
+    assert ratings["player"].rd == pytest.approx(151.4, abs=0.1)
+    assert ratings["player"].games == 3
+    assert ratings["player"].score == 1.0
+    # Only the entrants with outcomes change
+    assert (ratings["a"].rating, ratings["a"].rd) == (1400, 30)
+
+
+def test_everyone_is_updated_from_the_ratings_before_the_match():
+    ratings = {"a": Rating(), "b": Rating()}
+    updateRatings(ratings, pairwiseOutcomes([["a"], ["b"]]))
+    assert ratings["a"].rating - 1500 == pytest.approx(1500 - ratings["b"].rating)
+    assert ratings["a"].rd == ratings["b"].rd < 350
+
+
+def test_rd_never_drops_below_the_minimum():
+    ratings = {"a": Rating(rd=ARENA_MIN_RD), "b": Rating(rd=ARENA_MIN_RD)}
+    for _ in range(20):
+        updateRatings(ratings, pairwiseOutcomes([["a", "b"]]))
+    assert ratings["a"].rd == ratings["b"].rd == ARENA_MIN_RD
+    assert ratings["a"].rating == ratings["b"].rating == 1500
+
+
+def test_finish_order_and_pairwise_outcomes():
+    class Result(object):
+        eliminations = [2, 0]  # Seat 2 went out first
+
+    order = finishOrder(Result(), ["a", "b", "c", "d"])
+    assert order == [["b", "d"], ["a"], ["c"]]
+    outcomes = pairwiseOutcomes(order)
+    assert len(outcomes) == 4 * 3
+    assert ("b", "d", 0.5) in outcomes and ("a", "c", 1.0) in outcomes and ("c", "b", 0.0) in outcomes
+
+
+def test_round_robin_cycles_through_every_table():
+    arena = Arena([Entrant(name) for name in "dcba"], n_players=2, schedule="roundrobin", workers=1)
+    tables = [tuple(arena.nextMatch()) for _ in range(7)]
+    assert tables[:6] == [("a", "b"), ("a", "c"), ("a", "d"), ("b", "c"), ("b", "d"), ("c", "d")]
+    assert tables[6] == ("a", "b")
+
+
+def test_swiss_pairs_the_least_certain_entrant_with_the_closest_rating():
+    arena = Arena([Entrant(name) for name in "abcd"], n_players=2, workers=1)
+    arena.ratings["a"].rd = 100
+    arena.ratings["b"].rd = 150
+    arena.ratings["c"].rating, arena.ratings["c"].rd = 1700, 120
+    arena.ratings["d"].rating, arena.ratings["d"].rd = 1800, 50
+    assert arena.nextMatch() == ["b", "a"]
+
+    # Entrants already playing count as more certain
+    names, match = arena.scheduleMatch()
+    assert names == ["b", "a"] and match[1] == 0
+    assert arena.nextMatch() == ["c", "d"]
+
+
+def test_run_stops_once_ratings_are_settled():
+    arena = Arena([Entrant("a"), Entrant("b")], seed=5, workers=1)
+    arena.run(3)
+    assert arena.played == arena.matches == 3
+    assert all(rating.games == 3 * 2 for rating in arena.ratings.values())
+    assert all(arena.in_flight[name] == 0 for name in arena.in_flight)
+
+    target = max(rating.rd for rating in arena.ratings.values())
+    arena.run(10, target_rd=target)
+    assert arena.played == 3
@@ -0,0 +1,75 @@
+"""Tests of the vectorized engine (game/batch.py)"""
+
+from itertools import combinations_with_replacement
+
+import pytest
+
+from game.ai import AI, AIProfile, DEFAULT_PROFILE
+from game.deck import Card
+from game.simulate import simulate
+from game.tournament import TournamentReport
+
+np = pytest.importorskip("numpy")
+batch = pytest.importorskip("game.batch")
+
+PROFILES = [
+    DEFAULT_PROFILE,
+    AIProfile(name="reordered", order=("any", "valuable", "ten", "king", "plus_10", "small", "ninety_nine",
+                                       "useless")),
+    AIProfile(name="two nines", ninety_nine_count=2, small_threshold=75, small_cards=(1, 2, 3, 5),
+              useless_cards=(6, 7, 8), most_valuable=(4, 13)),
+    AIProfile(name="tens everywhere", useless_cards=(5, 6, 7, 8, 10), small_cards=(1, 2, 10), plus_10=(10, 11, 12),
+              most_valuable=(4, 10)),
+]
+
+
+def test_compiled_moves_match_the_ai():
+    hands = np.array(list(combinations_with_replacement(range(1, 14), 3)))
+    totals = np.arange(100)
+    all_hands, all_totals = np.repeat(hands, len(totals), axis=0), np.tile(totals, len(hands))
+    engine = batch.BatchEngine(n_players=2, batch_size=1)
+    for profile in PROFILES:
+        slot, value, selected, ok = engine.getMoves(all_hands, all_totals, profile)
+        ai = AI("AI", 3, profile=profile)
+        for i, (hand, total) in enumerate(zip(all_hands, all_totals)):
+            ai.cards.removeAllCards()
+            for card_value in hand:
+                ai.cards.addCard(Card(int(card_value), "clubs"))
+            index, expected = ai.getMove(int(total), 99)
+            if index == -1:
+                assert not ok[i]
+            else:
+                assert ok[i] and (value[i], selected[i]) == (ai.cards[index].value, expected)
+
+
+def test_batch_engine_plays_like_the_object_engine():
+    n = 2000
+    batched = batch.simulateBatch(n, n_players=3, seed=1).toReport()
+    objects = TournamentReport(3)
+    for result in simulate(n, n_players=3, seed=1):
+        objects.addResult(result)
+    assert abs(batched.meanTurns() - objects.meanTurns()) < 1.5
+    assert abs(batched.redistributions - objects.redistributions) / n < 0.5
+    for rate, expected in zip(batched.winRates(), objects.winRates()):
+        assert abs(rate - expected) < 0.05
+
+
+def test_games_do_not_depend_on_the_batch_size():
+    first = batch.simulateBatch(600, seed=4, batch_size=64)
+    second = batch.simulateBatch(600, seed=4, batch_size=600)
+    assert (first.winner_seat == second.winner_seat).all() and (first.turns == second.turns).all()
+    assert (first.eliminations == second.eliminations).all()
+
+
+def test_any_range_of_games_plays_on_its_own():
+    games = batch.simulateBatch(300, seed=6, batch_size=64)
+    later = batch.simulateBatch(200, seed=6, batch_size=64, start=100)
+    assert (later.winner_seat == games.winner_seat[100:]).all() and (later.turns == games.turns[100:]).all()
+
+
+def test_rotated_profiles_move_round_the_seats():
+    candidate = PROFILES[2]
+    engine = batch.BatchEngine(n_players=4, batch_size=8, profiles=[candidate] + [DEFAULT_PROFILE] * 3, rotate=True)
+    engine._newGames(np.arange(8), np.arange(8))
+    for game in range(8):
+        assert [engine.profiles[i] for i in engine.profile[game]].index(candidate) == game % 4
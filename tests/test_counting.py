@@ -0,0 +1,60 @@
+"""Tests of the card counting AI (game/counting.py)"""
+
+import random
+
+from game.ai import AI
+from game.counting import resultingTotal, CountingAI
+from game.deck import Card, NUM_VALUES
+from game.game import Game
+from game.simulate import playGame
+
+
+def selections(value):
+    """The values a card can be played as"""
+    if value == 1:
+        return (1, 11)
+    if value == 10:
+        return (10, -10)
+    return (value,)
+
+
+def test_resulting_total_matches_play_turn():
+    for value in range(1, NUM_VALUES + 1):
+        for selected_value in selections(value):
+            for total in range(0, 100):
+                game = Game(verbose=False, rng=random.Random(0))
+                game.startGame(players=[AI("A", 3), AI("B", 3)])
+                player = game.getCurrentPlayer()
+                player.cards.removeAllCards()
+                player.cards.addCard(Card(value, "clubs"))
+                game.TOTAL = total
+
+                expected = resultingTotal(value, selected_value, total, game.MAX)
+                if game.playTurn(0, selected_value):
+                    assert game.TOTAL == expected, (value, selected_value, total)
+                else:
+                    assert expected > game.MAX, (value, selected_value, total)
+
+
+def test_counter_matches_unseen_cards():
+    for seed in range(30):
+        game = Game(verbose=False, rng=random.Random(seed))
+        counting = CountingAI("C", 3)
+        game.startGame(players=[counting, AI("A", 3), AI("B", 3)])
+        checked = [0]
+        get_move = counting.getMove
+
+        def checkedGetMove(current_total, max_total):
+            unseen = [0] * (NUM_VALUES + 1)
+            for card in game.DECK:
+                unseen[card.value] += 1
+            for player in game.PLAYERS:
+                if player is not counting:
+                    for card in player.cards:
+                        unseen[card.value] += 1
+            assert counting.counter.unseen(counting.cards)[1:] == unseen[1:]
+            checked[0] += 1
+            return get_move(current_total, max_total)
+        counting.getMove = checkedGetMove
+        playGame(game)
+        assert checked[0] > 0
@@ -0,0 +1,181 @@
+"""Tests of the cards, decks and hands (game/deck.py)"""
+
+import random
+
+import pytest
+
+from game import config
+from game.deck import (Deck, Hand, Card, NUM_VALUES, UNKNOWN_CARD, CARD_VALUES, EFFECTS, EFFECT_ADD, EFFECT_SKIP,
+                       EFFECT_PLUS_10, valueMask, encodeCard, cardValue, cardSuit, cardPool)
+from game.ai import AI
+from game.game import Game
+
+
+def referenceName(value, suit):
+    """Card.getName as it was worked out before the tables"""
+    if value < 11:
+        return "{} of {}".format(value, suit)
+    return "{} of {}".format(config.CARD_MAP[value], suit)
+
+
+def test_card_ids_round_trip():
+    ids = set()
+    for value in range(1, NUM_VALUES + 1):
+        for suit in config.SUITS:
+            card_id = encodeCard(value, suit)
+            assert (cardValue(card_id), cardSuit(card_id)) == (value, suit)
+            assert Card(value, suit).id == card_id and Card.fromId(card_id) == Card(value, suit)
+            ids.add(card_id)
+    assert ids == set(range(config.DECK_SIZE))
+    assert CARD_VALUES == [cardValue(card_id) for card_id in range(config.DECK_SIZE)]
+
+
+def test_card_tables_match_the_rules():
+    for card_id in range(config.DECK_SIZE):
+        card = Card.fromId(card_id)
+        value = card.value
+        assert card.getName() == referenceName(value, card.suit)
+        assert card.getTrueValue() == (0 if value in [4, 10, 9, 13] else value)
+        assert card.isSpecial() == (value in config.SPECIAL_CARDS)
+        assert str(card)[:-1] == (str(value) if value < 11 else "JQK"[value - 11])
+    assert (EFFECTS[2], EFFECTS[3], EFFECTS[11], EFFECTS[12]) == (EFFECT_ADD, EFFECT_SKIP,
+                                                                 EFFECT_PLUS_10, EFFECT_PLUS_10)
+    assert Card(14, "clubs").id == UNKNOWN_CARD
+    assert Card(14, "clubs").getName() == "Unknown card." and Card(14, "clubs").prettyName() == "--"
+
+
+def test_deck_ring_buffer_matches_a_list():
+    rng = random.Random(4)
+    deck, model = Deck(capacity=4), []  # Small, so it wraps round and grows
+    pool = [Card.fromId(card_id) for card_id in range(config.DECK_SIZE)]
+    for _ in range(5000):
+        action = rng.random()
+        if action < 0.4:
+            card = rng.choice(pool)
+            deck.addCard(card)
+            model.append(card)
+        elif action < 0.7 and model:
+            assert deck.removeTopCard() is model.pop(0)
+        elif action < 0.85 and model:
+            index = rng.randrange(-len(model), len(model))
+            assert deck.removeCard(index) is model.pop(index)
+        elif action < 0.9:
+            cards = rng.sample(pool, rng.randrange(len(pool)))
+            deck.fill(cards)
+            model = list(cards)
+        else:
+            deck.shuffle(rng)
+            assert sorted(card.id for card in deck) == sorted(card.id for card in model)
+            model = list(deck)
+        assert len(deck) == len(model) and list(deck) == model
+        assert deck[0:len(model)] == model
+        if model:
+            assert deck[-1] is model[-1]
+
+
+def test_deck_shuffle_is_a_seeded_fisher_yates():
+    cards = [Card.fromId(card_id) for card_id in range(config.DECK_SIZE)]
+    first, second = Deck(), Deck()
+    first.fill(cards)
+    second.fill(cards)
+    first.shuffle(random.Random(8))
+    second.shuffle(random.Random(8))
+    assert list(first) == list(second) != cards
+
+    # The same permutation, worked out on a list
+    expected, rand = list(cards), random.Random(8).random
+    for i in range(len(expected) - 1, 0, -1):
+        j = int(rand() * (i + 1))
+        expected[i], expected[j] = expected[j], expected[i]
+    assert list(first) == expected
+
+
+def test_deck_errors():
+    deck = Deck()
+    for call in (deck.removeTopCard, lambda: deck.removeCard(0), lambda: deck[0]):
+        with pytest.raises(IndexError):
+            call()
+
+
+def checkHand(hand, model):
+    """The hand holds the cards of model and its indexes agree with them"""
+    assert list(hand) == model
+    assert hand.counts == [sum(card.value == value for card in model) for value in range(NUM_VALUES + 1)]
+    assert hand.mask == valueMask(card.value for card in model)
+    for value in range(1, NUM_VALUES + 1):
+        index = hand.indexOf(value)
+        assert index == -1 if hand.counts[value] == 0 else hand[index].value == value
+
+
+def test_stable_hand_keeps_its_order():
+    rng = random.Random(5)
+    hand, model = Hand(stable=True), []
+    for _ in range(2000):
+        if model and rng.random() < 0.5:
+            index = rng.randrange(len(model))
+            assert hand.removeCard(index) is model.pop(index)
+        else:
+            card = Card(rng.randint(1, NUM_VALUES), "spades")
+            hand.addCard(card)
+            model.append(card)
+        checkHand(hand, model)
+
+
+def test_hand_moves_the_last_card_into_the_gap():
+    rng = random.Random(6)
+    hand, model = Hand(), []
+    for _ in range(2000):
+        if model and rng.random() < 0.5:
+            index = rng.randrange(len(model))
+            assert hand.removeCard(index) is model[index]
+            last = model.pop()
+            if index < len(model):
+                model[index] = last
+        else:
+            card = Card(rng.randint(1, NUM_VALUES), "spades")
+            hand.addCard(card)
+            model.append(card)
+        checkHand(hand, model)
+
+
+def test_card_pool_is_shared_by_every_game():
+    for n_decks in (1, 2):
+        pool = cardPool(n_decks)
+        assert cardPool(n_decks) is pool
+        assert len(pool) == len(set(map(id, pool))) == len(CARD_VALUES) * n_decks
+        assert [(card.value, card.suit) for card in pool] == \
+            [(value, suit) for _ in range(n_decks) for value in range(1, NUM_VALUES + 1) for suit in config.SUITS]
+    games = [Game(verbose=False, rng=random.Random(seed)) for seed in range(2)]
+    for game in games:
+        game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(2)])
+    assert games[0].SHOE is games[1].SHOE is cardPool(games[0].NUM_DECKS)
+
+
+def test_redistributing_reuses_the_pooled_cards_and_storage(monkeypatch):
+    game = Game(verbose=False, rng=random.Random(12))
+    game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(4)])
+    storage = [game.DECK._slots, game.PILE._slots] + [player.cards._cards for player in game.PLAYERS]
+    pooled = set(map(id, game.SHOE))
+
+    created = []
+    original_init = Card.__init__
+
+    def countingInit(card, value, suit):
+        created.append((value, suit))
+        original_init(card, value, suit)
+    monkeypatch.setattr(Card, "__init__", countingInit)
+
+    redistributions = 0
+    while game.REDISTRIBUTIONS < 5 and not game.isGameOver():
+        if redistributions != game.REDISTRIBUTIONS:
+            redistributions = game.REDISTRIBUTIONS
+            cards = list(game.DECK) + list(game.PILE) + [card for player in game.PLAYERS for card in player.cards]
+            assert len(cards) == len(game.SHOE) and set(map(id, cards)) == pooled
+        player = game.getCurrentPlayer()
+        index, value = player.getMove(game.TOTAL, game.MAX)
+        if index == -1 or not game.playTurn(index, value):
+            game.handleNoMoves()
+    assert redistributions >= 3
+    assert created == []
+    assert game.DECK._slots is storage[0] and game.PILE._slots is storage[1]
+    assert all(player.cards._cards is cards for player, cards in zip(game.PLAYERS, storage[2:]))
@@ -0,0 +1,43 @@
+"""Tests of the endgame solver (game/endgame.py)"""
+
+import random
+
+from game.endgame import EndgameAI, Solver, LOSS, UNKNOWN, WIN, playMove
+from game.game import Game
+from game.simulate import playGame
+from game.state import SHOE, legalMoves
+
+
+def minimax(total, hand, other_hand, deck):
+    """Value of a round for the player to move, without a transposition table"""
+    moves = legalMoves(hand, total)
+    if not moves:
+        return LOSS
+    if not deck:
+        return UNKNOWN
+    value = LOSS
+    for move in moves:
+        new_total, new_hand = playMove(total, hand, move, deck[0])
+        value = max(value, WIN - minimax(new_total, other_hand, new_hand, deck[1:]))
+    return value
+
+
+def test_solver_matches_plain_minimax():
+    rng = random.Random(3)
+    solver = Solver()
+    for _ in range(20):
+        cards = list(SHOE)
+        rng.shuffle(cards)
+        for total in range(88, 100):
+            hand, other_hand, deck = cards[0:3], cards[3:6], cards[6:]
+            assert solver.solve(total, hand, other_hand, deck) == minimax(total, hand, other_hand, deck)
+
+
+def test_endgame_ai_plays_whole_games():
+    for seed in range(3):
+        game = Game(verbose=False, rng=random.Random(seed))
+        players = [EndgameAI("Endgame", game.INITAL_TOKEN), EndgameAI("Other", game.INITAL_TOKEN)]
+        game.startGame(players=players)
+        playGame(game)
+        assert game.isGameOver()
+    assert players[0].getType() == "endgame"
@@ -0,0 +1,89 @@
+"""Tests of the game events and their sinks (game/events.py)"""
+
+import io
+import json
+import random
+
+from game.ai import AI
+from game.events import (EventBus, Sink, BufferedSink, JsonLinesSink, GameStarted, CardPlayed,
+                         PlayerEliminated, NoMoves, DeckReshuffled)
+from game.game import Game
+from game.simulate import playGame
+
+
+class ListSink(Sink):
+    """Keeps every event"""
+    def __init__(self):
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+class CountingStream(io.StringIO):
+    """StringIO that counts its writes"""
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return io.StringIO.write(self, text)
+
+
+def playWithSink(sink, seed=3, n_players=3):
+    game = Game(verbose=False, rng=random.Random(seed))
+    game.EVENTS.subscribe(sink)
+    game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(n_players)])
+    return playGame(game)
+
+
+def test_bus_is_falsy_without_sinks():
+    bus = EventBus()
+    assert not bus
+    sink = ListSink()
+    bus.subscribe(sink)
+    assert bus
+    bus.emit(DeckReshuffled())
+    bus.unsubscribe(sink)
+    assert not bus
+    bus.emit(DeckReshuffled())
+    assert len(sink.events) == 1
+    assert not Game(verbose=False).EVENTS
+
+
+def test_a_game_emits_every_event_in_order():
+    sink = ListSink()
+    result = playWithSink(sink)
+    kinds = [type(event) for event in sink.events]
+    assert kinds[0] is GameStarted and sink.events[0].n_players == 3
+    assert kinds.count(CardPlayed) == result.turns
+    assert kinds.count(PlayerEliminated) == len(result.eliminations) == 2
+    assert kinds.count(NoMoves) == result.redistributions
+    assert [event.player.seat for event in sink.events if isinstance(event, PlayerEliminated)] == \
+        result.eliminations
+    assert all(0 <= event.total <= 99 for event in sink.events if isinstance(event, CardPlayed))
+
+
+def test_buffered_sink_writes_in_batches():
+    sink = ListSink()
+    playWithSink(sink)
+    events = sink.events[:7]
+
+    stream = CountingStream()
+    buffered = BufferedSink(stream, batch_size=3)
+    for event in events:
+        buffered.handle(event)
+    assert stream.writes == 2
+    buffered.close()
+    assert stream.writes == 3
+    assert stream.getvalue() == "".join(event.text() + "\n" for event in events)
+
+
+def test_json_lines_sink_writes_one_object_per_event():
+    stream = io.StringIO()
+    sink = JsonLinesSink(stream)
+    playWithSink(sink)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[0] == {"event": "game_started", "players": 3}
+    played = [line for line in lines if line["event"] == "card_played"]
+    assert played and all(set(line) == {"event", "player", "seat", "card", "card_name", "total"}
+                          for line in played)
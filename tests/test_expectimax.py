@@ -0,0 +1,27 @@
+"""Tests of the expectimax AI (game/expectimax.py)"""
+
+from game.ai import AI
+from game.expectimax import ExpectimaxAI, zobristKey
+from game.game import Game
+from game.rng import DealRNG
+from game.simulate import playGame
+
+
+class CheckedExpectimaxAI(ExpectimaxAI):
+    """Checks every incrementally updated key against zobristKey"""
+    checked = 0
+
+    def _value(self, total, turn, direction, n_players, pending, depth, key):
+        assert key == zobristKey(total, turn, direction, n_players, self.hand, self.unseen, pending)
+        CheckedExpectimaxAI.checked += 1
+        return ExpectimaxAI._value(self, total, turn, direction, n_players, pending, depth, key)
+
+
+def test_incremental_keys_match_zobrist_key():
+    for i in range(6):
+        game = Game(verbose=False, rng=DealRNG.fromGameKey(i))
+        n_players = 2 + i % 3
+        game.startGame(players=[CheckedExpectimaxAI("Expectimax", game.INITAL_TOKEN, time_budget=10, max_depth=3)] +
+                               [AI("AI{}".format(seat), game.INITAL_TOKEN) for seat in range(1, n_players)])
+        playGame(game, max_turns=300)
+    assert CheckedExpectimaxAI.checked > 1000
@@ -0,0 +1,45 @@
+"""Tests of the search AI (game/mcts.py)"""
+
+import random
+from collections import Counter
+
+from game.ai import AI
+from game.game import Game
+from game.mcts import MCTSAI
+from game.state import GameState
+
+
+def startGame(n_decks=1, **options):
+    """A started two player game, the search AI to move"""
+    game = Game(verbose=False, rng=random.Random(7))
+    game.NUM_DECKS = n_decks
+    game.startGame(players=[MCTSAI("MCTS", game.INITAL_TOKEN, rng=random.Random(7), **options),
+                            AI("AI", game.INITAL_TOKEN)])
+    while game.PLAYERS.currentPlayer().getType() != "mcts":
+        game.PLAYERS.advance()
+    return game
+
+
+def test_search_without_iterations_plays_a_legal_move():
+    for options in ({"max_iterations": 0}, {"time_budget": 0}):
+        game = startGame(**options)
+        player = game.PLAYERS.currentPlayer()
+        state = GameState.fromGame(game, player.rng)
+        move = player.search(state)
+        assert player.last_iterations == 0
+        assert move in state.legalMoves()
+
+
+def test_determinize_deals_from_the_games_shoe():
+    game = startGame(n_decks=2, max_iterations=10)
+    player = game.PLAYERS.currentPlayer()
+    state = GameState.fromGame(game, player.rng)
+    shoe = Counter(card.value for card in game.SHOE)
+    assert sum(shoe.values()) == 104
+    for _ in range(20):
+        guess = player.determinize(state)
+        cards = Counter(guess.deck + guess.pile)
+        for seat in guess.players:
+            cards.update(guess.hands[seat])
+        assert cards == shoe
+        assert guess.hands[player.seat] == state.hands[player.seat]
@@ -0,0 +1,74 @@
+"""Tests of the instrumentation (game/metrics.py)"""
+
+import json
+import math
+import random
+
+from game.ai import AI
+from game.game import Game
+from game.metrics import Histogram, Metrics, bucketOf, bucketUpper, BUCKETS
+from game.simulate import playGame
+
+
+def test_buckets_cover_every_latency_within_an_eighth():
+    rng = random.Random(4)
+    latencies = list(range(5000)) + [rng.getrandbits(rng.randint(13, 64)) for _ in range(5000)] + [2 ** 64 - 1]
+    for ns in latencies:
+        bucket = bucketOf(ns)
+        assert 0 <= bucket < BUCKETS
+        assert bucketUpper(bucket) >= ns
+        lower = bucketUpper(bucket - 1) + 1 if bucket else 0
+        assert lower <= ns
+        assert bucketUpper(bucket) - lower <= lower / 8
+    assert [bucketUpper(bucket) for bucket in range(BUCKETS)] == \
+        sorted(set(bucketUpper(bucket) for bucket in range(BUCKETS)))
+
+
+def test_quantiles_are_at_most_an_eighth_over_the_exact_value():
+    rng = random.Random(5)
+    latencies = [int(rng.lognormvariate(10, 2)) for _ in range(20000)]
+    histogram = Histogram()
+    for ns in latencies:
+        histogram.record(ns)
+    latencies.sort()
+    assert (histogram.count, histogram.total) == (len(latencies), sum(latencies))
+    assert (histogram.min, histogram.max) == (latencies[0], latencies[-1])
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = latencies[math.ceil(q * len(latencies)) - 1]
+        assert exact <= histogram.quantile(q) <= exact * 1.125
+    assert Histogram().quantile(0.5) == 0 and Histogram().mean() == 0
+
+
+def test_merged_histograms_equal_one_recording_everything():
+    rng = random.Random(6)
+    parts = [Histogram() for _ in range(3)]
+    whole = Histogram()
+    for _ in range(3000):
+        ns = rng.getrandbits(rng.randint(1, 40))
+        rng.choice(parts).record(ns)
+        whole.record(ns)
+    merged = Histogram()
+    for part in parts + [Histogram()]:
+        merged.merge(part)
+    assert merged.snapshot() == whole.snapshot()
+
+
+def test_instrumented_games_count_their_events():
+    metrics = Metrics()
+    results = []
+    for seed in range(3):
+        game = Game(verbose=False, rng=random.Random(seed), metrics=metrics)
+        game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(3)])
+        results.append(playGame(game))
+
+    counters = metrics.counters
+    assert counters["games"] == 3
+    assert counters["turns"] == sum(result.turns for result in results)
+    assert counters["eliminations"] == sum(len(result.eliminations) for result in results)
+    assert counters["redistributions"] == sum(result.redistributions for result in results)
+    assert metrics.histograms["playTurn"].count == counters["turns"] + counters["failed_moves"]
+    assert metrics.histograms["getMove.ai"].count >= counters["turns"]
+
+    snapshot = json.loads(json.dumps(metrics.snapshot()))
+    assert snapshot["counters"] == counters
+    assert sum(snapshot["histograms"]["playTurn"]["buckets"].values()) == metrics.histograms["playTurn"].count
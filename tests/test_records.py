@@ -0,0 +1,69 @@
+"""Tests of the binary game records (game/records.py)"""
+
+import os
+
+import pytest
+
+from game.ai import AI
+from game.game import Game
+from game.records import GameWriter, GameLog, PLAY, DEAL
+from game.simulate import simulate
+
+
+def writeLog(path, n_games=5, seed=11):
+    """Records n_games simulated games to path, returns their results"""
+    with GameWriter(path) as writer:
+        return simulate(n_games, seed=seed, recorder=writer)
+
+
+def test_close_releases_records_still_in_use(tmp_path):
+    path = str(tmp_path / "games.log")
+    writeLog(path)
+    with GameLog(path) as log:
+        records = [log[n] for n in range(len(log))]
+        assert len(records[0]) > 0
+    with pytest.raises(ValueError):  # Released with the log
+        list(records[0].events())
+
+
+def test_replay_matches_the_games_played(tmp_path):
+    path = str(tmp_path / "games.log")
+    results = writeLog(path, n_games=20)
+    with GameLog(path) as log:
+        assert len(log) == len(results)
+        for record, result in zip(log, results):
+            assert record.winner_seat == result.winner_seat
+            plays = 0
+            for event, hands in record.replay():
+                kind, seat, card, drawn, selected_value, total = event
+                if kind == PLAY:
+                    plays += 1
+                    assert drawn in hands[seat] and 0 <= total <= 99
+                if kind in (PLAY, DEAL):
+                    assert len(hands[seat]) <= record.hand_size
+            assert plays == result.turns
+            assert all(not hand for seat, hand in enumerate(hands) if seat != record.winner_seat)
+
+
+@pytest.mark.parametrize("index", ["kept", "missing", "stale"])
+def test_a_log_cut_off_mid_game_ends_at_the_last_finished_game(tmp_path, index):
+    path = str(tmp_path / "games.log")
+    writer = GameWriter(path)
+    results = simulate(3, seed=4, recorder=writer)
+    # The writer is never closed, as if the process crashed during a game
+    game = Game(verbose=False, recorder=writer, seed=99)
+    game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(3)])
+    game.playTurn(*game.getCurrentPlayer().getMove(game.TOTAL, game.MAX))
+    writer.file.flush()
+    writer.index.flush()
+    if index == "missing":
+        os.remove(path + ".idx")
+    elif index == "stale":
+        with open(path + ".idx", "r+b") as f:
+            f.truncate(8)
+
+    with GameLog(path) as log:
+        assert len(log) == 3
+        assert [record.winner_seat for record in log] == [result.winner_seat for result in results]
+    writer.file.close()
+    writer.index.close()
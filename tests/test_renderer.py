@@ -0,0 +1,69 @@
+"""Tests of the paced console output (game/renderer.py)"""
+
+import io
+import time
+
+from game.events import GameStarted, DeckReshuffled, consoleLines
+from game.renderer import PacedRenderer
+
+
+def expectedText(events):
+    lines = []
+    for event in events:
+        lines.extend(text for text, slow in consoleLines(event))
+        if isinstance(event, GameStarted):
+            lines.append("")
+    return "".join(line + "\n" for line in lines)
+
+
+def test_events_are_played_back_in_order():
+    stream = io.StringIO()
+    renderer = PacedRenderer(char_delay=0, turn_delay=0, stream=stream)
+    events = [GameStarted(2), DeckReshuffled(), DeckReshuffled()]
+    for event in events:
+        renderer.handle(event)
+    renderer.close()
+    assert not renderer.thread.is_alive()
+    assert stream.getvalue() == expectedText(events)
+
+
+def test_skip_prints_everything_queued_at_once():
+    stream = io.StringIO()
+    renderer = PacedRenderer(char_delay=1, turn_delay=1, stream=stream)
+    events = [GameStarted(4)] + [DeckReshuffled()] * 5
+    for event in events:
+        renderer.handle(event)
+    start = time.monotonic()
+    renderer.skip()
+    renderer.close()
+    assert time.monotonic() - start < 1
+    assert stream.getvalue().endswith(expectedText(events[1:]))
+
+
+def test_events_are_dropped_and_counted_when_playback_falls_behind():
+    stream = io.StringIO()
+    renderer = PacedRenderer(char_delay=1, turn_delay=1, stream=stream, max_queued=3)
+    for _ in range(10):
+        renderer.handle(DeckReshuffled())
+    assert renderer.pending == 3 and renderer.dropped == 7
+    renderer.skip()
+    renderer.waitIdle()
+    renderer.handle(DeckReshuffled())
+    renderer.handle(DeckReshuffled())
+    renderer.skip()
+    renderer.close()
+
+    lines = stream.getvalue().splitlines()
+    assert lines.count("Shuffling...") == 5
+    assert lines.count("[... 7 events skipped, the game was ahead of the screen ...]") == 1
+    assert lines.index("[... 7 events skipped, the game was ahead of the screen ...]") == 3 * 4
+
+
+def test_dropped_events_are_counted_when_nothing_follows():
+    stream = io.StringIO()
+    renderer = PacedRenderer(char_delay=1, turn_delay=1, stream=stream, max_queued=1)
+    for _ in range(3):
+        renderer.handle(DeckReshuffled())
+    renderer.skip()
+    renderer.close()
+    assert stream.getvalue().splitlines()[-1] == "[... 2 events skipped, the game was ahead of the screen ...]"
@@ -0,0 +1,77 @@
+"""Tests of the turn order ring (game/seats.py), against a plain list model"""
+
+import random
+
+import pytest
+
+from game.seats import SeatRing
+
+
+class Seated(object):
+    """Just enough of a Player for the ring"""
+    def __init__(self, name, role):
+        self.name = name
+        self.role = role
+        self.seat = None
+
+    def getType(self):
+        return self.role
+
+
+def makeRing(n):
+    players = [Seated("P{}".format(i), "human" if i % 3 == 0 else "ai") for i in range(n)]
+    return players, SeatRing(players)
+
+
+def test_ring_matches_a_list_model():
+    rng = random.Random(8)
+    for _ in range(200):
+        n = rng.randint(2, 9)
+        players, ring = makeRing(n)
+        alive, position, direction = list(range(n)), 0, 1
+        while len(alive) > 1:
+            action = rng.choice(["advance", "skip", "reverse", "pass", "eliminate"])
+            if action == "advance":
+                ring.advance()
+                position = (position + direction) % len(alive)
+            elif action == "skip":
+                ring.skip()
+                ring.advance()
+                position = (position + 2 * direction) % len(alive)
+            elif action == "reverse":
+                ring.reverse()
+                direction = -direction
+            elif action == "pass":
+                ring.passForward()
+                position = (position + 1) % len(alive)
+            else:
+                index = rng.randrange(len(alive))
+                ring.eliminate(players[alive.pop(index)])
+                if index < position:
+                    position -= 1
+                elif index == position:  # The turn passes forward
+                    position %= len(alive)
+
+            assert ring.current == alive[position]
+            assert ring.currentPlayer() is players[alive[position]]
+            assert ring.direction == direction
+            assert ring.seats() == alive and len(ring) == len(alive)
+            assert ring.position() == position
+            assert [player.seat for player in (ring[0], ring[-1])] == [alive[0], alive[-1]]
+            assert ring.nextSeat(ring.current, 1) == alive[(position + 1) % len(alive)]
+            assert ring.nextSeat(ring.current, -1) == alive[(position - 1) % len(alive)]
+            humans = [players[seat] for seat in alive if seat % 3 == 0]
+            assert ring.playersOfRole("human") == humans
+            assert ring.firstOfRole("human") is (humans[0] if humans else None)
+
+
+def test_eliminating_a_player_who_is_out_raises():
+    players, ring = makeRing(3)
+    ring.eliminate(players[1])
+    assert not ring.isIn(players[1]) and ring.isIn(players[2])
+    with pytest.raises(ValueError):
+        ring.eliminate(players[1])
+    with pytest.raises(ValueError):
+        ring.eliminate(Seated("stranger", "ai"))
+    with pytest.raises(IndexError):
+        ring[2]
@@ -0,0 +1,99 @@
+"""Tests of the game server (game/server.py)"""
+
+import asyncio
+import logging
+
+import pytest
+
+from game.deck import Card
+from game.server import Connection, GameServer, RemotePlayer
+
+
+class FakeWriter(object):
+    """Collects what is sent to a client"""
+    def __init__(self):
+        self.lines = []
+        self.closed = False
+
+    def write(self, data):
+        self.lines.extend(data.decode().splitlines())
+
+    def close(self):
+        self.closed = True
+
+    async def drain(self):
+        pass
+
+
+def remotePlayer(values):
+    player = RemotePlayer(Connection("P1", None, FakeWriter()), 3)
+    for value in values:
+        player.cards.addCard(Card(value, "hearts"))
+    return player
+
+
+def brokenAI(name, tokens):
+    raise RuntimeError("no AI today")
+
+
+def test_failed_table_is_logged_and_its_players_disconnected(caplog):
+    server = GameServer(players_per_table=2, ai_factory=brokenAI)
+    writer = FakeWriter()
+    connection = Connection("P1", None, writer)
+
+    async def play():
+        server.seat(connection)
+        await asyncio.gather(*server.tables, return_exceptions=True)
+        await asyncio.sleep(0)  # Done callbacks run on the next loop iteration
+
+    with caplog.at_level(logging.ERROR, logger="game.server"):
+        asyncio.run(play())
+    server.executor.shutdown()
+
+    assert not server.tables
+    assert connection.closed and writer.closed
+    assert writer.lines[-1] == "[ERROR] The table stopped: no AI today"
+    assert "Table 1 stopped" in caplog.text
+    assert "no AI today" in caplog.text
+
+
+def test_moves_are_checked_like_the_game_checks_them():
+    player = remotePlayer([11, 12, 8])
+    # Jacks and queens add 10
+    assert player.parseMove("1", 89, 99) == [0, 0]
+    assert player.parseMove("2", 89, 99) == [1, 0]
+    assert player.parseMove("1", 90, 99) is None
+    assert player.parseMove("3 5", 91, 99) == [2, 5]
+    assert player.parseMove("3", 92, 99) is None
+
+    player = remotePlayer([1, 10, 4])
+    assert player.parseMove("1 11", 88, 99) == [0, 11]
+    assert player.parseMove("1 11", 89, 99) is None
+    assert player.parseMove("1 5", 50, 99) is None
+    assert player.parseMove("2 10", 90, 99) is None
+    assert player.parseMove("2 -10", 95, 99) == [1, -10]
+    assert player.parseMove("4", 50, 99) is None
+    assert player.parseMove("one", 50, 99) is None
+
+
+def test_a_jack_or_queen_that_reaches_the_max_is_accepted():
+    player = remotePlayer([11, 12, 11])
+    connection = player.connection
+
+    async def play():
+        connection.moves.put_nowait("1")  # Sent out of turn, dropped
+        request = asyncio.ensure_future(player.requestMove(89, 99, timeout=5))
+        await asyncio.sleep(0)
+        connection.moves.put_nowait("4")
+        connection.moves.put_nowait("2")
+        return await request
+
+    assert asyncio.run(play()) == [1, 0]
+    assert connection.writer.lines.count("You cannot play that card or value!") == 1
+
+
+def test_tables_cannot_seat_more_humans_than_players():
+    with pytest.raises(ValueError):
+        GameServer(players_per_table=2, humans_per_table=3)
+    with pytest.raises(ValueError):
+        GameServer(players_per_table=2, humans_per_table=0)
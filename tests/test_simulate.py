@@ -0,0 +1,14 @@
+"""Tests of headless simulation (game/simulate.py)"""
+
+from game.simulate import simulate
+
+
+def test_same_seed_same_games():
+    first = simulate(40, n_players=4, seed=42)
+    assert repr(first) == repr(simulate(40, n_players=4, seed=42))
+    assert repr(first) != repr(simulate(40, n_players=4, seed=43))
+
+
+def test_any_range_of_games_plays_on_its_own():
+    games = simulate(30, n_players=3, seed=7)
+    assert repr(simulate(10, n_players=3, seed=7, start=20)) == repr(games[20:])
@@ -0,0 +1,47 @@
+"""Tests of the compact game state (game/state.py)"""
+
+import copy
+import random
+
+from game.ai import AI
+from game.game import Game
+from game.state import GameState
+
+
+def snapshot(state):
+    """Everything a move can change, copied"""
+    return copy.deepcopy((state.total, state.turn, state.turn_inc, state.players, state.hands,
+                          state.tokens, state.deck, state.pile))
+
+
+def test_undo_restores_every_state():
+    rng = random.Random(1)
+    kinds = set()
+    for seed in range(30):
+        n_players = 2 + seed % 3
+        game = Game(verbose=False, rng=random.Random(seed))
+        game.startGame(players=[AI("AI{}".format(i), game.INITAL_TOKEN) for i in range(n_players)])
+        state = GameState.fromGame(game, random.Random(seed))
+        if seed % 2:  # Put most of the deck on the pile, so it runs out and is reshuffled
+            state.pile.extend(state.deck[:-2])
+            del state.deck[:-2]
+
+        history = []
+        while not state.isOver():
+            before = snapshot(state)
+            moves = state.legalMoves()
+            if not moves:
+                record = state.applyNoMoves()
+                kinds.add("eliminated" if record.eliminated() else "no moves")
+            else:
+                move = state.heuristicMove() if rng.random() < 0.8 else None
+                record = state.applyMove(*(move or rng.choice(moves)))
+                if record[5] is not None:
+                    kinds.add("reshuffle")
+            history.append((before, record))
+
+        while history:
+            before, record = history.pop()
+            state.undoMove(record)
+            assert snapshot(state) == before
+    assert kinds == {"no moves", "eliminated", "reshuffle"}
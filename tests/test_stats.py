@@ -0,0 +1,82 @@
+"""Tests of the streaming statistics (game/stats.py) against exact values"""
+
+import random
+import statistics
+from fractions import Fraction
+
+import pytest
+
+from game.stats import P2Quantile, RunningStats, StreamingStats, wilsonInterval, zScore
+from game.simulate import simulate
+
+
+def test_welford_matches_the_exact_mean_and_variance():
+    rng = random.Random(1)
+    # A large offset loses every digit if squares are summed in floats
+    values = [1e9 + rng.random() for _ in range(10000)]
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    exact = [Fraction(x) for x in values]
+    assert stats.mean == pytest.approx(float(statistics.mean(exact)), rel=1e-14)
+    assert stats.variance() == pytest.approx(float(statistics.variance(exact)), rel=1e-6)
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+    parts = [RunningStats() for _ in range(4)]
+    for i, x in enumerate(values):
+        parts[i * 7 % 4].add(x)
+    merged = RunningStats()
+    for part in parts + [RunningStats()]:
+        merged.merge(part)
+    assert merged.count == stats.count and (merged.min, merged.max) == (stats.min, stats.max)
+    assert merged.mean == pytest.approx(stats.mean, rel=1e-14)
+    assert merged.variance() == pytest.approx(stats.variance(), rel=1e-6)
+
+
+def test_p2_quantiles_are_close_to_the_exact_quantiles():
+    rng = random.Random(2)
+    for draw in (rng.random, lambda: rng.expovariate(1), lambda: rng.gauss(100, 15)):
+        values = [draw() for _ in range(20000)]
+        exact = sorted(values)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            sketch = P2Quantile(q)
+            for x in values:
+                sketch.add(x)
+            true_value = exact[int(q * len(exact))]
+            spread = exact[int(0.99 * len(exact))] - exact[int(0.01 * len(exact))]
+            assert abs(sketch.value() - true_value) <= 0.01 * spread
+
+
+def test_p2_is_exact_for_five_values_or_fewer():
+    sketch = P2Quantile(0.5)
+    assert sketch.value() is None
+    for x in [5, 1, 4]:
+        sketch.add(x)
+    assert sketch.value() == 4
+    for x in [2, 3]:
+        sketch.add(x)
+    assert sketch.value() == 3
+
+
+def test_wilson_interval_matches_published_values():
+    z = zScore(0.95)
+    assert z == pytest.approx(1.959964, abs=1e-6)
+    # Newcombe (1998), table I
+    assert wilsonInterval(81, 263, z) == pytest.approx((0.2553, 0.3662), abs=1e-4)
+    assert wilsonInterval(15, 148, z) == pytest.approx((0.0624, 0.1605), abs=1e-4)
+    assert wilsonInterval(0, 20, z) == pytest.approx((0.0, 0.1611), abs=1e-4)
+    assert wilsonInterval(1, 29, z) == pytest.approx((0.0061, 0.1718), abs=1e-4)
+    assert wilsonInterval(0, 0, z) == (0.0, 1.0)
+
+
+def test_streaming_stats_match_the_results():
+    results = simulate(200, n_players=3, seed=9)
+    stats = StreamingStats(3)
+    for result in results:
+        stats.addResult(result)
+    turns = [result.turns for result in results]
+    assert stats.games == 200 and sum(stats.wins) + stats.unfinished == 200
+    assert stats.wins == [sum(result.winner_seat == seat for result in results) for seat in range(3)]
+    assert stats.turns.mean == pytest.approx(statistics.mean(turns))
+    assert stats.turns.std() == pytest.approx(statistics.stdev(turns))
+    assert (stats.turns.min, stats.turns.max) == (min(turns), max(turns))
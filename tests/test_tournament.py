@@ -0,0 +1,40 @@
+"""Tests of the multi-core tournament runner (game/tournament.py)"""
+
+import statistics
+
+from game.simulate import simulate, defaultPlayer
+from game.tournament import TournamentReport, makeShards, runShard, runTournament
+
+
+def reportOf(results, n_players):
+    report = TournamentReport(n_players)
+    for result in results:
+        report.addResult(result)
+    return report
+
+
+def test_report_does_not_depend_on_shards_or_workers():
+    expected = reportOf(simulate(300, n_players=3, seed=5), 3).asDict()
+    for workers, shard_size in ((1, 300), (1, 70), (2, 70), (3, 41)):
+        assert runTournament(300, n_players=3, seed=5, workers=workers, shard_size=shard_size).asDict() == expected
+
+
+def test_merge_order_does_not_matter():
+    partials = [runShard(shard) for shard in makeShards(200, 4, 9, defaultPlayer, 30)]
+    forward, backward = TournamentReport(4), TournamentReport(4)
+    for partial in partials:
+        forward.merge(partial)
+    for partial in reversed(partials):
+        backward.merge(partial)
+    assert forward.asDict() == backward.asDict()
+    assert forward.games == 200
+
+
+def test_turn_statistics_are_exact():
+    results = simulate(150, n_players=4, seed=2)
+    report = reportOf(results, 4)
+    turns = [result.turns for result in results]
+    assert report.meanTurns() == statistics.mean(turns)
+    assert abs(report.stdTurns() - statistics.stdev(turns)) < 1e-9
+    assert (report.turns_min, report.turns_max) == (min(turns), max(turns))
+    assert sum(report.wins) + report.unfinished == 150